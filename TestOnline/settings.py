@@ -79,6 +79,15 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Yuklangan fayllar kontent xeshi bo'yicha saqlanadi (bir xil fayl bir marta yoziladi), qarang: users/storage.py
+STORAGES = {
+    'default': {'BACKEND': 'users.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+# Media oqimi (dars videolari, mock audio): production da baytlarni nginx yuborishi uchun
+# MEDIA_STREAM_OFFLOAD = 'x-accel-redirect' va nginx da `internal` location MEDIA_STREAM_INTERNAL_URL -> MEDIA_ROOT
+MEDIA_STREAM_OFFLOAD = None
+MEDIA_STREAM_INTERNAL_URL = '/protected-media/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -154,6 +163,11 @@ LOGGING = {
     'root': { 'handlers': ['console'], 'level': 'INFO', },
 }
 
+# Write-behind buffers (event log, lesson progress pings, download counts): entries are queued after the
+# request transaction commits and written after the response. Tests turn this off with override_settings
+# so writes happen synchronously inside the test transaction.
+WRITE_BEHIND_BUFFERING = True
+
 # DRF-YASG (Swagger)
 SWAGGER_SETTINGS = {
    'SECURITY_DEFINITIONS': { 'Bearer': { 'type': 'apiKey', 'name': 'Authorization', 'in': 'header' } },
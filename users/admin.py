@@ -1,20 +1,22 @@
 # users/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Count
 from .models import (
-    User, Subject, Test, Question, UserTestResult, UserAnswer, Material, Payment,
+    User, Subject, Test, Question, TestQuestion, UserTestResult, UserAnswer, Material, Payment,
     UserRating, MockTest, MockTestResult, MockTestMaterial, University,
     Achievement, UserAchievement, Course, Lesson, UserCourseEnrollment,
-    CourseReview, ScheduleItem, Notification, UserSettings
+    CourseReview, ScheduleItem, Notification, UserSettings, TestStatistics, EventLog, LessonProgress, ChunkedUpload, StoredBlob
 )
 
 # Inlines
-class QuestionInline(admin.TabularInline):
-    model = Question
+class TestQuestionInline(admin.TabularInline):
+    model = TestQuestion
     extra = 1
-    fields = ('order', 'question_text', 'difficulty', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer', 'points')
+    fields = ('order', 'question')
+    raw_id_fields = ('question',) # Savollar bankdan tanlanadi
     ordering = ('order',)
-    fk_name = 'test' # Explicitly set foreign key name
+    fk_name = 'test'
 
 class LessonInline(admin.TabularInline):
     model = Lesson
@@ -73,7 +75,7 @@ class TestAdmin(admin.ModelAdmin):
     list_display = ('title', 'subject', 'test_type', 'question_count', 'difficulty', 'status', 'price', 'created_at', 'created_by')
     list_filter = ('subject', 'test_type', 'difficulty', 'status') # Removed created_by as it might be null
     search_fields = ('title', 'subject__name', 'description')
-    inlines = [QuestionInline]
+    inlines = [TestQuestionInline]
     readonly_fields = ('created_at', 'updated_at', 'question_count') # question_count is updated via inline save
     list_editable = ('status', 'test_type', 'difficulty')
     list_select_related = ('subject', 'created_by')
@@ -97,20 +99,23 @@ class TestAdmin(admin.ModelAdmin):
         # Update the question count on the Test instance
         test_instance = form.instance
         test_instance.question_count = test_instance.questions.count()
-        test_instance.save(update_fields=['question_count'])
+        test_instance.save(update_fields=['question_count', 'content_version'])
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'test_title', 'question_text_short', 'difficulty', 'correct_answer', 'order')
-    list_filter = ('test__subject', 'difficulty', 'test__title') # Filter by test title
-    search_fields = ('question_text', 'test__title')
-    raw_id_fields = ('test',)
-    list_select_related = ('test',)
+    list_display = ('id', 'question_text_short', 'subject', 'difficulty', 'correct_answer', 'tests_count')
+    list_filter = ('subject', 'difficulty')
+    search_fields = ('question_text', 'content_hash', 'tests__title')
+    readonly_fields = ('content_hash',)
+    list_select_related = ('subject',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(tests_count=Count('test_links'))
 
-    def test_title(self, obj):
-        return obj.test.title
-    test_title.short_description = 'Test'
-    test_title.admin_order_field = 'test__title'
+    def tests_count(self, obj):
+        return obj.tests_count
+    tests_count.short_description = 'Testlar soni'
+    tests_count.admin_order_field = 'tests_count'
 
     def question_text_short(self, obj):
         return obj.question_text[:80] + '...' if len(obj.question_text) > 80 else obj.question_text
@@ -133,6 +138,19 @@ class UserTestResultAdmin(admin.ModelAdmin):
         return format_html('<a href="{}">Ko\'rish</a>', url)
     user_answers_link.short_description = 'Javoblar'
 
+@admin.register(TestStatistics)
+class TestStatisticsAdmin(admin.ModelAdmin):
+    list_display = ('test', 'completed_count', 'average_percentage', 'best_percentage', 'best_score', 'income_sum', 'last_updated')
+    search_fields = ('test__title',)
+    readonly_fields = ('test', 'completed_count', 'percentage_sum', 'percentage_sq_sum', 'best_percentage', 'best_score', 'income_sum', 'last_updated')
+    list_select_related = ('test',)
+    actions = ['rebuild_statistics']
+
+    def rebuild_statistics(self, request, queryset):
+        count = TestStatistics.rebuild(test_ids=list(queryset.values_list('test_id', flat=True)))
+        self.message_user(request, f"{count} ta test statistikasi qayta hisoblandi.")
+    rebuild_statistics.short_description = "Tanlangan statistikani qayta hisoblash"
+
 @admin.register(UserAnswer)
 class UserAnswerAdmin(admin.ModelAdmin):
     list_display = ('result_id', 'question_short', 'selected_answer', 'is_correct')
@@ -155,7 +173,7 @@ class MaterialAdmin(admin.ModelAdmin):
     list_display = ('title', 'subject', 'material_type', 'file_format', 'status', 'is_free', 'price', 'downloads_count', 'uploaded_at')
     list_filter = ('subject', 'material_type', 'file_format', 'status', 'is_free')
     search_fields = ('title', 'subject__name', 'description')
-    readonly_fields = ('uploaded_at', 'uploaded_by', 'downloads_count')
+    readonly_fields = ('uploaded_at', 'uploaded_by', 'downloads_count', 'file_size', 'checksum', 'mime_type', 'page_count', 'duration_seconds')
     list_editable = ('status', 'is_free')
     list_select_related = ('subject', 'uploaded_by')
 
@@ -265,15 +283,23 @@ class CourseAdmin(admin.ModelAdmin):
     list_filter = ('subject', 'teacher', 'status', 'difficulty', 'language', 'has_certificate')
     search_fields = ('title', 'subject__name', 'teacher__full_name', 'description')
     inlines = [LessonInline]
-    readonly_fields = ('created_at', 'last_updated', 'lessons_count', 'rating', 'enrolled_students_count')
+    readonly_fields = ('created_at', 'last_updated', 'lessons_count', 'rating', 'enrolled_students_count',
+                       'rating_sum', 'rating_count', 'rating_1_count', 'rating_2_count', 'rating_3_count',
+                       'rating_4_count', 'rating_5_count')
     list_editable = ('status', 'price', 'difficulty')
     raw_id_fields = ('teacher',)
     list_select_related = ('subject', 'teacher')
+    actions = ['reconcile_counters']
 
     def save_formset(self, request, form, formset, change):
         instances = formset.save()
         form.instance.update_lessons_count()
 
+    def reconcile_counters(self, request, queryset):
+        count = Course.reconcile_counters(course_ids=list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f"{count} ta kurs hisoblagichlari tuzatildi.")
+    reconcile_counters.short_description = "Tanlangan kurslar hisoblagichlarini tekshirish"
+
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
     list_display = ('title', 'course', 'order', 'duration_minutes', 'is_free_preview')
@@ -288,7 +314,7 @@ class UserCourseEnrollmentAdmin(admin.ModelAdmin):
     list_display = ('user', 'course', 'enrolled_at', 'progress', 'completed_at')
     list_filter = ('course__subject', 'course__title')
     search_fields = ('user__email', 'user__full_name', 'course__title')
-    readonly_fields = ('user', 'course', 'enrolled_at', 'completed_at', 'last_accessed_lesson')
+    readonly_fields = ('user', 'course', 'enrolled_at', 'completed_at', 'last_accessed_lesson', 'completed_lessons_count')
     date_hierarchy = 'enrolled_at'
     list_select_related = ('user', 'course')
 
@@ -333,4 +359,36 @@ class UserSettingsAdmin(admin.ModelAdmin):
         ('Notifications', {'fields': ('notify_email', 'notify_sms', 'notify_push', 'notify_test_updates', 'notify_course_updates', 'notify_payments', 'notify_reminders')}),
         ('Security', {'fields': ('two_factor_enabled',)}),
         ('Statistics', {'fields': ('weekly_reports', 'personalized_recommendations')}),
-    )
\ No newline at end of file
+    )
+
+@admin.register(EventLog)
+class EventLogAdmin(admin.ModelAdmin):
+    list_display = ('event_type', 'user', 'test', 'material', 'day', 'created_at')
+    list_filter = ('event_type', 'day')
+    search_fields = ('user__email', 'test__title', 'material__title')
+    readonly_fields = ('event_type', 'user', 'test', 'material', 'day', 'created_at') # Append-only
+    date_hierarchy = 'created_at'
+    list_select_related = ('user', 'test', 'material')
+
+@admin.register(LessonProgress)
+class LessonProgressAdmin(admin.ModelAdmin):
+    list_display = ('enrollment', 'lesson', 'position_seconds', 'completed', 'completed_at', 'last_watched_at')
+    list_filter = ('completed', 'lesson__course')
+    search_fields = ('enrollment__user__email', 'lesson__title')
+    raw_id_fields = ('enrollment', 'lesson')
+    list_select_related = ('enrollment__user', 'enrollment__course', 'lesson')
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'target', 'object_id', 'user', 'received_bytes', 'total_size', 'status', 'updated_at')
+    list_filter = ('target', 'status')
+    search_fields = ('filename', 'user__email')
+    readonly_fields = ('id', 'user', 'target', 'object_id', 'filename', 'file_name', 'total_size', 'chunk_size',
+                       'received_bytes', 'next_chunk', 'checksum', 'status', 'created_at', 'updated_at')
+    list_select_related = ('user',)
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'mime_type', 'ref_count', 'created_at')
+    search_fields = ('name', 'sha256')
+    readonly_fields = ('name', 'sha256', 'size', 'mime_type', 'ref_count', 'created_at')
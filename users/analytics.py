@@ -0,0 +1,178 @@
+from django.core.cache import cache
+from django.db.models import Min, Count
+from django.db.models.functions import ExtractYear, ExtractMonth
+from django.utils import timezone
+
+from .models import User, UserTestResult, Payment, EventLog
+
+try:
+    import numpy as np # Optional: pip install numpy (kogorta tahlili uchun)
+except ImportError:
+    np = None
+
+
+COHORT_CACHE_TIMEOUT = 60 * 60 # 1 soat
+COHORT_CACHE_KEY = 'analytics:cohorts:{months}'
+
+
+def _month_index(field):
+    """Sanani butun son oy indeksiga aylantiruvchi DB ifodasi: yil * 12 + (oy - 1)."""
+    return ExtractYear(field) * 12 + ExtractMonth(field) - 1
+
+
+def _month_label(index):
+    year, month = divmod(int(index), 12)
+    return f"{year}-{month + 1:02d}"
+
+
+def _load_arrays():
+    """
+    Kogorta hisoblash uchun ixcham massivlarni oladi (har biri bitta so'rov):
+    - studentlar: (user_id, qo'shilgan oy)
+    - faollik: takrorlanmas (user_id, test topshirgan oy) juftliklari
+    - to'lov: har bir user uchun birinchi muvaffaqiyatli depozit oyi
+    """
+    users = User.objects.filter(role='student').annotate(month=_month_index('date_joined'))
+    user_rows = list(users.order_by().values_list('id', 'month'))
+    activity_rows = list(
+        UserTestResult.objects.annotate(month=_month_index('start_time'))
+        .order_by().values_list('user_id', 'month').distinct()
+    )
+    payment_rows = list(
+        Payment.objects.filter(status='successful', payment_type='deposit', amount__gt=0)
+        .annotate(month=_month_index('created_at'))
+        .order_by().values('user_id').annotate(first_month=Min('month'))
+        .values_list('user_id', 'first_month')
+    )
+    user_array = np.array(user_rows, dtype=np.int64).reshape(-1, 2)
+    activity_array = np.array(activity_rows, dtype=np.int64).reshape(-1, 2)
+    payment_array = np.array(payment_rows, dtype=np.int64).reshape(-1, 2)
+    return user_array, activity_array, payment_array
+
+
+def _user_positions(sorted_ids, ids):
+    """ids ni sorted_ids dagi indekslarga moslaydi; topilmaganlar uchun mask False bo'ladi."""
+    positions = np.clip(np.searchsorted(sorted_ids, ids), 0, len(sorted_ids) - 1)
+    return positions, sorted_ids[positions] == ids
+
+
+def build_cohort_matrices(user_array, activity_array, payment_array, months, current_month):
+    """
+    Retention va konversiya matritsalarini NumPy bilan hisoblaydi.
+    Qator - qo'shilish oyi (kogorta), ustun - qo'shilgandan keyingi k-oy (0..months-1).
+    Kelajakka tushadigan kataklar NaN bo'ladi.
+    """
+    if not len(user_array):
+        return []
+
+    order = np.argsort(user_array[:, 0], kind='stable')
+    user_ids = user_array[order, 0]
+    join_months = user_array[order, 1]
+    cohort_months, cohort_idx = np.unique(join_months, return_inverse=True)
+    sizes = np.bincount(cohort_idx, minlength=len(cohort_months))
+
+    # Retention: k-oyda kamida bitta test topshirgan takrorlanmas studentlar soni
+    retention = np.zeros((len(cohort_months), months), dtype=np.int64)
+    if len(activity_array):
+        positions, found = _user_positions(user_ids, activity_array[:, 0])
+        offsets = activity_array[:, 1] - join_months[positions]
+        valid = found & (offsets >= 0) & (offsets < months)
+        np.add.at(retention, (cohort_idx[positions[valid]], offsets[valid]), 1)
+
+    # Konversiya: k-oygacha (shu oy ham) birinchi marta to'lov qilganlar soni (kumulyativ)
+    conversion = np.zeros((len(cohort_months), months), dtype=np.int64)
+    if len(payment_array):
+        positions, found = _user_positions(user_ids, payment_array[:, 0])
+        offsets = np.maximum(payment_array[:, 1] - join_months[positions], 0)
+        valid = found & (offsets < months)
+        np.add.at(conversion, (cohort_idx[positions[valid]], offsets[valid]), 1)
+    conversion = np.cumsum(conversion, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention_rate = retention / sizes[:, None] * 100
+        conversion_rate = conversion / sizes[:, None] * 100
+    future = (cohort_months[:, None] + np.arange(months)[None, :]) > current_month
+    retention_rate[future] = np.nan
+    conversion_rate[future] = np.nan
+
+    def to_list(row):
+        return [None if np.isnan(value) else round(float(value), 2) for value in row]
+
+    return [
+        {
+            'cohort': _month_label(cohort_months[i]),
+            'size': int(sizes[i]),
+            'retention': to_list(retention_rate[i]),
+            'retention_counts': [int(value) for value in retention[i]],
+            'conversion': to_list(conversion_rate[i]),
+            'conversion_counts': [int(value) for value in conversion[i]],
+        }
+        for i in range(len(cohort_months))
+    ]
+
+
+def get_cohort_analytics(months=12, refresh=False):
+    """Kogorta retention/konversiya natijasini keshdan qaytaradi yoki qayta hisoblaydi."""
+    cache_key = COHORT_CACHE_KEY.format(months=months)
+    if not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    now = timezone.localtime()
+    current_month = now.year * 12 + now.month - 1
+    user_array, activity_array, payment_array = _load_arrays()
+    data = {
+        'generated_at': now,
+        'months': months,
+        'cohorts': build_cohort_matrices(user_array, activity_array, payment_array, months, current_month),
+    }
+    cache.set(cache_key, data, COHORT_CACHE_TIMEOUT)
+    return data
+
+
+FUNNEL_STAGES = ['test_viewed', 'purchase_attempted', 'submitted'] # insufficient_funds - voronkadan chiqish nuqtasi
+
+
+def get_purchase_funnel(date_from, date_to, test_id=None):
+    """
+    Sotib olish voronkasi: kun bo'limlari (EventLog.day) bo'yicha guruhlangan hodisalar soni
+    va har bir bosqichdagi takrorlanmas foydalanuvchilar. Barcha hisoblar DB da GROUP BY bilan.
+    """
+    events = EventLog.objects.filter(day__gte=date_from, day__lte=date_to)
+    if test_id:
+        events = events.filter(test_id=test_id)
+    events = events.order_by()
+
+    daily = {}
+    for row in events.values('day', 'event_type').annotate(events=Count('id'), users=Count('user', distinct=True)):
+        day = daily.setdefault(row['day'], {'day': row['day']})
+        day[row['event_type']] = {'events': row['events'], 'users': row['users']}
+
+    totals = {
+        row['event_type']: {'events': row['events'], 'users': row['users']}
+        for row in events.values('event_type').annotate(events=Count('id'), users=Count('user', distinct=True))
+    }
+    stages = []
+    previous_users = None
+    for stage in FUNNEL_STAGES:
+        users = totals.get(stage, {}).get('users', 0)
+        rate = round(users / previous_users * 100, 2) if previous_users else None
+        stages.append({'stage': stage, 'events': totals.get(stage, {}).get('events', 0), 'users': users, 'rate_from_previous': rate})
+        previous_users = users
+
+    # Mablag' yetmagan va shu davrda testni umuman topshirmagan (voz kechgan) foydalanuvchilar
+    submitted_users = events.filter(event_type='submitted', user__isnull=False).values('user_id')
+    gave_up = (events.filter(event_type='insufficient_funds', user__isnull=False)
+               .exclude(user_id__in=submitted_users).values('user_id').distinct().count())
+
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'test': test_id,
+        'stages': stages,
+        'insufficient_funds': totals.get('insufficient_funds', {'events': 0, 'users': 0}),
+        'gave_up_users': gave_up,
+        'material_downloads': totals.get('material_downloaded', {'events': 0, 'users': 0}),
+        'daily': [daily[key] for key in sorted(daily)],
+    }
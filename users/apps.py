@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from . import thumbnails # noqa: F401 - yuklangan rasmlar uchun variant yaratish signallari
+        from . import search # noqa: F401 - qidiruv indeksini sinxron saqlash signallari
+        from .storage import connect_blob_signals
+        connect_blob_signals(self.get_models()) # Almashtirilgan/o'chirilgan fayllar blob havolasini bo'shatadi
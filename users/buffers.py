@@ -0,0 +1,113 @@
+"""
+Write-behind buferlar uchun umumiy yordamchi (hodisalar jurnali, video pinglari, yuklab olishlar soni).
+
+- Yozuv faqat joriy tranzaksiya commit bo'lgandan keyin buferga tushadi (transaction.on_commit):
+  bekor qilingan so'rovning yozuvlari bazaga yetib bormaydi.
+- Bufer javob yuborilgandan keyin (request_finished) hajm yoki vaqt bo'yicha, jarayon tugashida esa majburan yoziladi.
+- Yozib bo'lmasa yozuvlar buferga qaytariladi va keyingi flush da qayta yoziladi; WRITE_BEHIND_MAX_RETRIES
+  ketma-ket xatodan keyin ular logga yozilib tashlab yuboriladi (jim yo'qolmaydi).
+- settings.WRITE_BEHIND_BUFFERING=False bo'lsa (testlarda) bufer ishlatilmaydi: yozuv darhol, joriy tranzaksiya ichida.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import transaction
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_MAX_RETRIES = getattr(settings, 'WRITE_BEHIND_MAX_RETRIES', 3)
+
+_buffers = []
+
+
+def buffering_enabled():
+    # Har chaqiriqda o'qiladi: testlarda override_settings bilan yoqish/o'chirish mumkin
+    return getattr(settings, 'WRITE_BEHIND_BUFFERING', True)
+
+
+class WriteBehindBuffer:
+    """
+    Kalit bo'yicha birlashtiriladigan jarayon ichidagi bufer. `write(items)` {kalit: qiymat} ni bazaga yozadi,
+    `merge(eski, yangi)` bir kalitga kelgan qiymatlarni birlashtiradi (standart: oxirgisi qoladi).
+    """
+
+    def __init__(self, name, write, max_size, flush_interval, merge=None):
+        self.name = name
+        self.write = write
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.merge = merge or (lambda old, new: new)
+        self._items = {}
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        _buffers.append(self)
+
+    def add(self, key, value):
+        if not buffering_enabled():
+            self.write({key: value})
+            return
+        transaction.on_commit(lambda: self._put({key: value}))
+
+    def _put(self, items):
+        with self._lock:
+            for key, value in items.items():
+                self._items[key] = self.merge(self._items[key], value) if key in self._items else value
+
+    def snapshot(self):
+        """Hali yozilmagan yozuvlar nusxasi."""
+        with self._lock:
+            return dict(self._items)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._items.get(key, default)
+
+    def discard(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def flush(self, force=True):
+        """Yig'ilganlarni yozadi (force=False bo'lsa faqat hajm yoki vaqt bo'yicha kerak bo'lganda). Yozilganlar sonini qaytaradi."""
+        with self._lock:
+            due = len(self._items) >= self.max_size or time.monotonic() - self._last_flush >= self.flush_interval
+            if not self._items or not (force or due):
+                return 0
+            items, self._items = self._items, {}
+            self._last_flush = time.monotonic()
+        try:
+            self.write(items)
+        except Exception:
+            self._failures += 1
+            if self._failures >= WRITE_BEHIND_MAX_RETRIES:
+                self._failures = 0
+                logger.exception("%s: %d ta yozuv %d urinishdan keyin tashlab yuborildi", self.name, len(items), WRITE_BEHIND_MAX_RETRIES)
+            else:
+                logger.exception("%s: %d ta yozuvni yozib bo'lmadi, keyingi flush da qayta uriniladi", self.name, len(items))
+                with self._lock:
+                    # Eski yozuvlar oldin, flush davomida kelganlari ustidan birlashtiriladi
+                    newer, self._items = self._items, items
+                self._put(newer)
+            return 0
+        self._failures = 0
+        return len(items)
+
+
+def flush_all(force=True):
+    for buffer in _buffers:
+        buffer.flush(force=force)
+
+
+@receiver(request_finished)
+def _flush_after_request(sender, **kwargs):
+    # Javob mijozga yuborilgandan keyin ishlaydi, shuning uchun so'rov kechikishiga ta'sir qilmaydi
+    flush_all(force=False)
+
+
+atexit.register(flush_all)
@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
+
+from .buffers import WriteBehindBuffer
+
+
+# Write-behind hisoblagichlar (Material.downloads_count): deltalar shu hajmga yetganda yoki shuncha soniya o'tganda
+# bazaga yoziladi. Aniq bo'lishi kerak bo'lgan hisoblagichlar (statistika, daromad) F() bilan darhol yangilanadi.
+COUNTER_BUFFER_SIZE = getattr(settings, 'COUNTER_BUFFER_SIZE', 1000)
+COUNTER_FLUSH_INTERVAL = getattr(settings, 'COUNTER_FLUSH_INTERVAL', 5)
+COUNTER_UPDATE_BATCH_SIZE = 500
+
+
+def _update_model(model, rows):
+    """Bir model uchun barcha deltalarni pk bo'yicha CASE ifodasi bilan batch UPDATE larga aylantiradi."""
+    pks = list(rows)
+    for start in range(0, len(pks), COUNTER_UPDATE_BATCH_SIZE):
+        batch = pks[start:start + COUNTER_UPDATE_BATCH_SIZE]
+        fields = {field for pk in batch for field in rows[pk]}
+        updates = {}
+        for field in fields:
+            output_field = model._meta.get_field(field)
+            whens = [models.When(pk=pk, then=models.Value(rows[pk][field], output_field=output_field))
+                     for pk in batch if field in rows[pk]]
+            updates[field] = models.F(field) + models.Case(
+                *whens, default=models.Value(0, output_field=output_field), output_field=output_field
+            )
+        model.objects.filter(pk__in=batch).update(**updates)
+
+
+def _write_counters(items):
+    """{(model, pk, field): delta} ni model bo'yicha guruhlab bitta tranzaksiyada yozadi."""
+    by_model = defaultdict(lambda: defaultdict(dict))
+    for (model, pk, field), delta in items.items():
+        by_model[model][pk][field] = delta
+    with transaction.atomic():
+        for model, rows in by_model.items():
+            _update_model(model, rows)
+
+
+counter_buffer = WriteBehindBuffer(
+    'counters', _write_counters, COUNTER_BUFFER_SIZE, COUNTER_FLUSH_INTERVAL, merge=lambda old, new: old + new
+)
+
+
+def increment_counter(model, pk, field, amount=1):
+    """
+    Hisoblagich deltasini buferga qo'shadi (bazaga so'rov yo'q). Bir xil qatorga kelgan ko'p sonli oshirishlar
+    bitta deltaga birlashadi va keyingi flush da bitta UPDATE bilan yoziladi.
+    """
+    counter_buffer.add((model, pk, field), amount)
+
+
+def pending_delta(model, pk, field):
+    """Shu jarayonda hali bazaga yozilmagan delta (javoblarda qiymatni to'g'rilash uchun)."""
+    return counter_buffer.get((model, pk, field), 0)
+
+
+def flush_counters(force=True):
+    """Yig'ilgan deltalarni yozadi. force=False bo'lsa faqat vaqti kelganda."""
+    return counter_buffer.flush(force=force)
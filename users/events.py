@@ -0,0 +1,43 @@
+import itertools
+
+from django.conf import settings
+from django.utils import timezone
+
+from .buffers import WriteBehindBuffer
+from .models import EventLog
+
+
+# Bufer shu hajmga yetganda yoki shuncha soniya o'tganda bazaga yoziladi
+EVENT_BUFFER_SIZE = getattr(settings, 'EVENT_LOG_BUFFER_SIZE', 200)
+EVENT_FLUSH_INTERVAL = getattr(settings, 'EVENT_LOG_FLUSH_INTERVAL', 10)
+
+_event_keys = itertools.count() # Hodisalar birlashtirilmaydi: har biriga alohida kalit
+
+
+def _write_events(items):
+    EventLog.objects.bulk_create(items.values(), batch_size=500)
+
+
+event_buffer = WriteBehindBuffer('event log', _write_events, EVENT_BUFFER_SIZE, EVENT_FLUSH_INTERVAL)
+
+
+def log_event(event_type, user=None, test=None, material=None):
+    """
+    Hodisani buferga qo'shadi (bazaga so'rov yo'q). Hodisa faqat so'rov tranzaksiyasi commit bo'lsa
+    buferga tushadi va javob yuborilgandan keyin (request_finished) bulk_create bilan yoziladi.
+    """
+    now = timezone.now()
+    event = EventLog(
+        event_type=event_type,
+        user_id=getattr(user, 'pk', None) if user is not None and user.is_authenticated else None,
+        test_id=getattr(test, 'pk', None),
+        material_id=getattr(material, 'pk', None),
+        created_at=now,
+        day=timezone.localdate(now),
+    )
+    event_buffer.add(next(_event_keys), event)
+
+
+def flush_events(force=True):
+    """Buferdagi hodisalarni bitta bulk_create bilan yozadi. force=False bo'lsa faqat vaqti kelganda."""
+    return event_buffer.flush(force=force)
@@ -0,0 +1,144 @@
+import csv
+import datetime
+import decimal
+import tempfile
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils import timezone
+
+from .models import UserTestResult, UserAnswer, Payment
+
+try:
+    import openpyxl # Optional: pip install openpyxl (XLSX eksport uchun)
+except ImportError:
+    openpyxl = None
+
+
+EXPORT_CHUNK_SIZE = 2000 # iterator() bilan bir martada o'qiladigan qatorlar soni
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """csv.writer uchun psevdo-bufer: yozilgan qatorni saqlamasdan qaytaradi."""
+    def write(self, value):
+        return value
+
+
+def format_export_value(value):
+    """Qiymatni CSV/XLSX katagi uchun oddiy turga keltiradi."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime.timedelta):
+        total_seconds = int(value.total_seconds())
+        minutes, seconds = divmod(total_seconds, 60)
+        return f"{minutes:02d}:{seconds:02d}"
+    return value
+
+
+def csv_stream_response(rows, filename):
+    """
+    Qatorlarni CSV ko'rinishida oqim (streaming) bilan qaytaradi.
+    Xotira qatorlar soniga bog'liq emas, birinchi bayt darhol jo'natiladi.
+    """
+    writer = csv.writer(Echo())
+
+    def generate():
+        yield '\ufeff' # Excel UTF-8 ni to'g'ri ochishi uchun BOM
+        for row in rows:
+            yield writer.writerow([format_export_value(value) for value in row])
+
+    response = StreamingHttpResponse(generate(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_file_response(rows, filename, sheet_title='Sheet1'):
+    """
+    Qatorlarni openpyxl write-only rejimida vaqtinchalik faylga yozib, fayl sifatida oqim bilan qaytaradi.
+    XLSX zip format bo'lgani uchun fayl to'liq yozilgandan keyin jo'natiladi, lekin xotira doimiy qoladi.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=str(sheet_title)[:31])
+    for row in rows:
+        sheet.append([format_export_value(value) for value in row])
+    tmp_file = tempfile.TemporaryFile()
+    workbook.save(tmp_file)
+    tmp_file.seek(0)
+    return FileResponse(tmp_file, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def test_result_rows(test, include_answers=False, status=None):
+    """
+    Test natijalarini eksport uchun qatorma-qator qaytaruvchi generator (birinchi qator - sarlavha).
+    include_answers=True bo'lsa har bir savol uchun tanlangan javob ustuni qo'shiladi.
+    """
+    question_ids = list(test.question_links.order_by('order', 'id').values_list('question_id', flat=True))
+    header = ['ID', 'F.I.Sh.', 'Email', 'Telefon', 'Holat', 'Ball', 'Savollar soni', 'Foiz',
+              'Boshlangan vaqt', 'Tugagan vaqt', 'Sarflangan vaqt']
+    if include_answers:
+        header += [f"Q{index}" for index in range(1, len(question_ids) + 1)]
+    yield header
+
+    results = (
+        UserTestResult.objects.filter(test=test).select_related('user')
+        .only('id', 'status', 'score', 'total_questions', 'percentage', 'start_time', 'end_time',
+              'time_spent', 'user__full_name', 'user__email', 'user__phone_number')
+        .order_by('-start_time', '-id')
+    )
+    if status:
+        results = results.filter(status=status)
+    if include_answers:
+        results = results.prefetch_related(Prefetch(
+            'user_answers', queryset=UserAnswer.objects.only('id', 'result_id', 'question_id', 'selected_answer')
+        ))
+
+    for result in results.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = [
+            result.id, result.user.full_name, result.user.email, result.user.phone_number,
+            result.get_status_display(), result.score, result.total_questions, result.percentage,
+            result.start_time, result.end_time, result.time_spent,
+        ]
+        if include_answers:
+            answers = {answer.question_id: answer.selected_answer for answer in result.user_answers.all()}
+            row += [answers.get(question_id) or '' for question_id in question_ids]
+        yield row
+
+
+def payment_ledger_rows(payments):
+    """
+    To'lovlar reestri uchun generator: avval sarlavha, keyin har bir to'lov qatori,
+    oxirida shu o'tishning o'zida yig'ilgan to'lov turi bo'yicha jami summalar.
+    """
+    type_labels = dict(Payment.TYPE_CHOICES)
+    status_labels = dict(Payment.STATUS_CHOICES)
+    method_labels = dict(Payment.PAYMENT_METHOD_CHOICES)
+    yield ['ID', 'Sana', 'Email', 'F.I.Sh.', 'Summa', "To'lov turi", 'Holat', "To'lov usuli",
+           'Tranzaksiya ID', 'Izoh']
+
+    totals = {} # payment_type -> [soni, summa]
+    rows = payments.order_by('created_at', 'id').values_list(
+        'id', 'created_at', 'user__email', 'user__full_name', 'amount', 'payment_type',
+        'status', 'payment_method', 'transaction_id', 'description',
+    )
+    for (payment_id, created_at, email, full_name, amount, payment_type,
+         status, payment_method, transaction_id, description) in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        type_total = totals.setdefault(payment_type, [0, decimal.Decimal('0.00')])
+        type_total[0] += 1
+        type_total[1] += amount or 0
+        yield [payment_id, created_at, email, full_name, amount, type_labels.get(payment_type, payment_type),
+               status_labels.get(status, status), method_labels.get(payment_method, payment_method or ''),
+               transaction_id, description]
+
+    yield []
+    yield ["Jami (to'lov turi bo'yicha)", 'Soni', 'Summa']
+    grand_count, grand_amount = 0, decimal.Decimal('0.00')
+    for payment_type, (count, amount) in sorted(totals.items()):
+        grand_count += count
+        grand_amount += amount
+        yield [type_labels.get(payment_type, payment_type), count, amount]
+    yield ['Jami', grand_count, grand_amount]
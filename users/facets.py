@@ -0,0 +1,94 @@
+"""
+Katalog ro'yxatlari uchun filtr variantlari soni (?facets=subject,difficulty yoki ?facets=all).
+Har bir facet uchun bitta GROUP BY so'rov: joriy filtrlarning shu facetdan boshqa hammasi qo'llanadi
+(tanlangan fan bo'yicha filtrda ham boshqa fanlar soni ko'rinib turadi). Natija filtr imzosi bo'yicha keshlanadi.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Count
+from django.utils import translation
+from django.utils.translation import gettext_lazy as _
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.exceptions import ValidationError
+
+
+FACET_CACHE_TIMEOUT = getattr(settings, 'FACET_CACHE_TIMEOUT', 5 * 60) # 5 daqiqa: yangi yozuvlar shu vaqtda ko'rinadi
+FACET_CACHE_KEY = 'facets:{name}:{signature}'
+# Natijaga ta'sir qilmaydigan parametrlar imzoga kirmaydi
+FACET_IGNORED_PARAMS = ('page', 'page_size', 'ordering', 'facets', 'format')
+BOOLEAN_LABELS = {True: _('Ha'), False: _("Yo'q")}
+
+
+def parse_facets(value, available):
+    """?facets= qiymatidan facet nomlari ro'yxati; 'all' - viewdagi barcha facetlar."""
+    if value.strip().lower() == 'all':
+        return list(available)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValidationError({'facets': _("Noma'lum facet(lar): %(unknown)s. Mavjudlari: %(available)s.") % {
+            'unknown': ', '.join(unknown), 'available': ', '.join(available)}})
+    return names
+
+
+def facet_signature(params, names):
+    """Filtr parametrlari (tartibsiz), so'ralgan facetlar va til bo'yicha barqaror xesh."""
+    items = sorted((key, sorted(params.getlist(key))) for key in params if key not in FACET_IGNORED_PARAMS)
+    raw = json.dumps([items, sorted(names), translation.get_language()], ensure_ascii=False, default=str)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def _choice_label(choices, value):
+    # choices siz maydonlar (masalan, narx) uchun qiymatning o'zi yorliq bo'ladi
+    if value in choices:
+        return choices[value]
+    return str(value) if value is not None else None
+
+
+def count_facets(view, request, names):
+    """
+    {facet: [{'value': ..., 'label': ..., 'count': n}, ...]} ko'p sonlisi birinchi.
+    view.facet_fields: {facet nomi (filterset maydoni): yorliq uchun lookup yoki None (choices dan, choices
+    bo'lmasa qiymatning o'zi)}.
+    """
+    queryset = view.get_queryset()
+    filterset = None
+    for backend_class in view.filter_backends:
+        backend = backend_class()
+        if isinstance(backend, DjangoFilterBackend):
+            filterset = backend.get_filterset(request, queryset, view)
+        else:
+            queryset = backend.filter_queryset(request, queryset, view) # Qidiruv bir marta qo'llanadi
+    # Forma bir marta tekshiriladi (ModelChoiceFilter lar har facet uchun qayta so'rov qilmasligi uchun)
+    cleaned_data = filterset.form.cleaned_data if filterset is not None and filterset.is_valid() else {}
+    model = queryset.model
+
+    facets = {}
+    for name in names:
+        facet_queryset = queryset
+        for filter_name, value in cleaned_data.items():
+            if filter_name != name:
+                facet_queryset = filterset.filters[filter_name].filter(facet_queryset, value)
+        label_lookup = view.facet_fields[name]
+        columns = [name, label_lookup] if label_lookup else [name]
+        rows = facet_queryset.order_by().values(*columns).annotate(count=Count('pk')).order_by('-count', name)
+        field = model._meta.get_field(name)
+        choices = BOOLEAN_LABELS if isinstance(field, BooleanField) else dict(field.flatchoices)
+        choices = {key: str(label) for key, label in choices.items()}
+        facets[name] = [
+            {'value': row[name], 'label': row[label_lookup] if label_lookup else _choice_label(choices, row[name]), 'count': row['count']}
+            for row in rows
+        ]
+    return facets
+
+
+def get_facet_counts(view, request, names):
+    cache_key = FACET_CACHE_KEY.format(name=view.basename, signature=facet_signature(request.query_params, names))
+    facets = cache.get(cache_key)
+    if facets is None:
+        facets = count_facets(view, request, names)
+        cache.set(cache_key, facets, FACET_CACHE_TIMEOUT)
+    return facets
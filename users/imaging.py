@@ -0,0 +1,74 @@
+"""
+Rasm/PDF variantlarini yaratuvchi sof funksiyalar. Django ga bog'liq emas, shuning uchun
+ProcessPoolExecutor ishchi jarayonlarida (spawn/forkserver bo'lsa ham) xavfsiz import qilinadi.
+"""
+import os
+
+try:
+    from PIL import Image, ImageOps
+except ImportError: # ImageField uchun Pillow odatda o'rnatilgan bo'ladi
+    Image = None
+
+try:
+    import pymupdf # Optional: pip install pymupdf (PDF birinchi sahifa preview uchun)
+except ImportError:
+    pymupdf = None
+
+
+VARIANT_DIR = 'variants'
+PDF_PREVIEW_WIDTH = 600
+
+
+def variant_base_name(source_name):
+    """Manba fayl nomidan kelib chiqadigan barqaror papka: variants/<manba yo'li, kengaytmasiz>/."""
+    return f"{VARIANT_DIR}/{os.path.splitext(source_name)[0]}"
+
+
+def _save_image(image, path, fmt):
+    if fmt == 'jpg':
+        if image.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.convert('RGBA').split()[-1])
+            image = background
+        image.save(path, 'JPEG', quality=82, optimize=True, progressive=True)
+    else:
+        image.save(path, 'WEBP', quality=80, method=4)
+
+
+def build_image_variants(root, source_name, specs):
+    """
+    Ishchi jarayonda bajariladi: rasmni EXIF bo'yicha aylantirib, har bir o'lcham va format uchun
+    kichraytirilgan nusxa yozadi. {variant_nomi: fayl_nomi} qaytaradi.
+    """
+    variants = {'source': source_name}
+    with Image.open(os.path.join(root, source_name)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA')
+        base = variant_base_name(source_name)
+        os.makedirs(os.path.join(root, base), exist_ok=True)
+        for size_name, (max_size, formats) in specs.items():
+            resized = image.copy()
+            resized.thumbnail((max_size, max_size), Image.LANCZOS)
+            for fmt in formats:
+                name = f"{base}/{size_name}.{fmt}"
+                _save_image(resized, os.path.join(root, name), fmt)
+                variants[f"{size_name}_{fmt}"] = name
+    return variants
+
+
+def build_pdf_preview(root, source_name):
+    """Ishchi jarayonda bajariladi: PDF ning birinchi sahifasini PNG ga chizadi."""
+    variants = {'source': source_name}
+    with pymupdf.open(os.path.join(root, source_name)) as document:
+        if not document.page_count:
+            return variants
+        page = document.load_page(0)
+        zoom = PDF_PREVIEW_WIDTH / page.rect.width if page.rect.width else 1
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+        base = variant_base_name(source_name)
+        os.makedirs(os.path.join(root, base), exist_ok=True)
+        name = f"{base}/preview.png"
+        pixmap.save(os.path.join(root, name))
+        variants['preview_png'] = name
+    return variants
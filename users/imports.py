@@ -0,0 +1,196 @@
+"""
+Savollarni fayldan (CSV/XLSX/JSON) ommaviy import qilish.
+Fayl qatorma-qator o'qiladi, barcha qatorlar oldindan tekshiriladi; xato bo'lmasa savollar bitta
+tranzaksiyada bulk_create qilinadi va Test.question_count bir marta yangilanadi.
+Savollar kontent xeshi bo'yicha bankdan qayta ishlatiladi: faqat bankda yo'q savollar yaratiladi.
+"""
+import csv
+import io
+import json
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+
+from .models import Test, Question, TestQuestion
+from .serializers import AdminQuestionSerializer
+
+try:
+    import openpyxl # Optional: pip install openpyxl (XLSX import uchun)
+except ImportError:
+    openpyxl = None
+
+
+QUESTION_IMPORT_MAX_ROWS = getattr(settings, 'QUESTION_IMPORT_MAX_ROWS', 2000)
+QUESTION_IMPORT_FORMATS = ('csv', 'xlsx', 'json')
+QUESTION_IMPORT_BATCH_SIZE = 500
+
+QUESTION_IMPORT_FIELDS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d',
+                          'correct_answer', 'difficulty', 'explanation', 'points')
+# Sarlavhadagi muqobil nomlar (kichik harflarda) -> Question maydoni
+QUESTION_COLUMN_ALIASES = {
+    'savol': 'question_text', 'question': 'question_text', 'text': 'question_text',
+    'a': 'option_a', 'b': 'option_b', 'c': 'option_c', 'd': 'option_d',
+    'javob': 'correct_answer', 'answer': 'correct_answer', 'correct': 'correct_answer',
+    'qiyinlik': 'difficulty', 'izoh': 'explanation', 'ball': 'points',
+}
+
+
+class QuestionImportError(Exception):
+    """Fayl umuman o'qib bo'lmaganda (format, sarlavha, hajm). Qator xatolari `errors` da qaytariladi."""
+
+
+def normalize_column(name):
+    key = str(name or '').strip().lower().replace(' ', '_')
+    return key if key in QUESTION_IMPORT_FIELDS else QUESTION_COLUMN_ALIASES.get(key)
+
+
+def detect_import_format(filename, file_format=None):
+    file_format = (file_format or os.path.splitext(filename or '')[1].lstrip('.')).lower()
+    if file_format not in QUESTION_IMPORT_FORMATS:
+        raise QuestionImportError("Faqat 'csv', 'xlsx' yoki 'json' formatlari qo'llab-quvvatlanadi.")
+    if file_format == 'xlsx' and openpyxl is None:
+        raise QuestionImportError("XLSX import uchun serverda openpyxl o'rnatilmagan.")
+    return file_format
+
+
+def _rows_from_table(rows):
+    """
+    Birinchi qator sarlavha; qolganlari (fayldagi qator raqami, {maydon: qiymat}) sifatida qaytariladi.
+    Bo'sh qatorlar tashlanadi, lekin raqamlash fayl bo'yicha qoladi (xato xabarlari to'g'ri qatorni ko'rsatadi).
+    """
+    header = next(rows, None)
+    if header is None:
+        raise QuestionImportError("Fayl bo'sh.")
+    columns = [normalize_column(name) for name in header]
+    if 'question_text' not in columns:
+        raise QuestionImportError("Sarlavha qatorida 'question_text' (yoki 'savol') ustuni topilmadi.")
+    for row_number, values in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield row_number, {column: value for column, value in zip(columns, values) if column}
+
+
+def iter_csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from _rows_from_table(iter(csv.reader(text)))
+    finally:
+        text.detach() # Asl faylni yopmaslik uchun
+
+
+def iter_xlsx_rows(file):
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from _rows_from_table(workbook.active.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def iter_json_rows(file):
+    # JSON ro'yxat yoki {"questions": [...]} ko'rinishida
+    data = json.load(file)
+    if isinstance(data, dict):
+        data = data.get('questions')
+    if not isinstance(data, list):
+        raise QuestionImportError("JSON ro'yxat yoki {\"questions\": [...]} ko'rinishida bo'lishi kerak.")
+    for row_number, item in enumerate(data, start=1):
+        if not isinstance(item, dict):
+            yield row_number, {}
+            continue
+        yield row_number, {normalize_column(key): value for key, value in item.items() if normalize_column(key)}
+
+
+ROW_READERS = {'csv': iter_csv_rows, 'xlsx': iter_xlsx_rows, 'json': iter_json_rows}
+
+
+def clean_question_row(row):
+    """Katak qiymatlarini serializer uchun tozalaydi (XLSX raqamlari, bo'sh kataklar, kichik harfli javob)."""
+    data = {}
+    for field, value in row.items():
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        data[field] = value.strip() if isinstance(value, str) else value
+    if isinstance(data.get('correct_answer'), str):
+        data['correct_answer'] = data['correct_answer'].upper()
+    if isinstance(data.get('difficulty'), str):
+        data['difficulty'] = data['difficulty'].lower()
+    return data
+
+
+def validate_question_rows(rows):
+    """
+    (qator raqami, qator) juftliklarini AdminQuestionSerializer bilan tekshiradi (bazaga so'rov yo'q).
+    (tekshirilgan ma'lumotlar ro'yxati, [{'row': n, 'errors': {...}}]) qaytaradi.
+    """
+    valid, errors = [], []
+    for row_number, row in rows:
+        if len(valid) + len(errors) >= QUESTION_IMPORT_MAX_ROWS:
+            raise QuestionImportError(f"Bir martada ko'pi bilan {QUESTION_IMPORT_MAX_ROWS} ta savol import qilinadi.")
+        serializer = AdminQuestionSerializer(data=clean_question_row(row))
+        if serializer.is_valid():
+            valid.append(serializer.validated_data)
+        else:
+            errors.append({'row': row_number, 'errors': serializer.errors})
+    return valid, errors
+
+
+def import_questions(test, file, file_format, dry_run=False):
+    """
+    Faylni o'qib, tekshirib, savollarni testning oxiriga qo'shadi.
+    Natija: {'created': testga qo'shilganlar, 'reused': bankdan olinganlar, 'skipped': testda allaqachon borlar,
+    'errors': [...]}; birorta qatorda xato bo'lsa hech narsa yozilmaydi.
+    """
+    reader = ROW_READERS[file_format]
+    try:
+        valid, errors = validate_question_rows(reader(file))
+    except (UnicodeDecodeError, csv.Error, json.JSONDecodeError) as e:
+        raise QuestionImportError(f"Faylni o'qib bo'lmadi: {e}")
+    except QuestionImportError:
+        raise
+    except Exception as e: # openpyxl buzilgan fayl uchun turli xatolar chiqaradi
+        raise QuestionImportError(f"Faylni o'qib bo'lmadi: {e}")
+    if not valid and not errors:
+        raise QuestionImportError("Faylda savollar topilmadi.")
+    result = {'created': 0, 'reused': 0, 'skipped': 0, 'errors': errors, 'valid': len(valid)}
+    if errors or dry_run:
+        return result
+
+    result.update(add_questions_to_test(test, valid))
+    return result
+
+
+def add_questions_to_test(test, questions):
+    """
+    Tekshirilgan savollarni (lug'atlar) testning oxiriga qo'shadi: bankda bor savollar qayta ishlatiladi,
+    yo'qlari bitta bulk_create bilan yaratiladi, bog'lanishlar ham bitta bulk_create. Import va paketlar uchun umumiy.
+    """
+    hashes = [Question.compute_content_hash(data) for data in questions]
+    with transaction.atomic():
+        # Parallel importlar bir xil order raqamlarini olmasligi uchun testni qulflaymiz
+        list(Test.objects.select_for_update().filter(pk=test.pk).values_list('pk', flat=True))
+        existing = set(Question.objects.filter(content_hash__in=set(hashes)).values_list('content_hash', flat=True))
+        new_questions = {}
+        for data, content_hash in zip(questions, hashes):
+            if content_hash not in existing and content_hash not in new_questions:
+                new_questions[content_hash] = Question(subject=test.subject, content_hash=content_hash, **data)
+        # ignore_conflicts: parallel import shu savolni birinchi yaratgan bo'lsa ham xato bermaydi
+        Question.objects.bulk_create(new_questions.values(), batch_size=QUESTION_IMPORT_BATCH_SIZE, ignore_conflicts=True)
+        question_ids = dict(Question.objects.filter(content_hash__in=set(hashes)).values_list('content_hash', 'pk'))
+
+        linked = set(test.question_links.values_list('question_id', flat=True))
+        last_order = test.question_links.aggregate(max_order=Max('order'))['max_order'] or 0
+        links, skipped = [], 0
+        for content_hash in hashes:
+            question_id = question_ids[content_hash]
+            if question_id in linked: # Testda allaqachon bor yoki faylda takrorlangan
+                skipped += 1
+                continue
+            linked.add(question_id)
+            links.append(TestQuestion(test=test, question_id=question_id, order=last_order + len(links) + 1))
+        TestQuestion.objects.bulk_create(links, batch_size=QUESTION_IMPORT_BATCH_SIZE)
+        Test.bump_content_version([test.pk], question_count=F('question_count') + len(links))
+    return {'created': len(links), 'reused': len(links) - len(new_questions), 'skipped': skipped}
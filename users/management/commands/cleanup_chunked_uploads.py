@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import ChunkedUpload
+from users.uploads import abort_upload
+
+
+class Command(BaseCommand):
+    help = "Uzoq vaqt davomida yakunlanmagan bo'lakli yuklash sessiyalarini va yarim yozilgan fayllarni o'chiradi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=48,
+                            help="Shuncha soatdan beri yangilanmagan sessiyalar o'chiriladi (standart: 48)")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        count = 0
+        for upload in ChunkedUpload.objects.filter(status='uploading', updated_at__lt=cutoff).iterator():
+            abort_upload(upload)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"{count} ta yakunlanmagan yuklash o'chirildi."))
@@ -0,0 +1,113 @@
+import os
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from users.models import StoredBlob
+from users.imaging import VARIANT_DIR
+from users.storage import BLOB_DIR, TMP_DIR, blob_name_for, hash_file, sniff_file
+
+
+class Command(BaseCommand):
+    help = ("media/ dagi bir xil fayllarni bitta kontent-manzilli blobga birlashtiradi, FileField havolalarini yangilaydi "
+            "va StoredBlob havola sonlarini qayta hisoblaydi.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help="MEDIA_ROOT ichidagi papkalar (standart: butun MEDIA_ROOT)")
+        parser.add_argument('--dry-run', action='store_true', help="Hech narsani o'zgartirmasdan hisobot chiqarish")
+        parser.add_argument('--prune', action='store_true', help="Hech qaysi yozuv havola qilmaydigan bloblarni o'chirish")
+
+    def file_fields(self):
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if isinstance(field, models.FileField):
+                    yield model, field.name
+
+    def reference_index(self):
+        """Fayl nomi -> uni saqlovchi (model, maydon) lar (har bir maydon uchun bitta so'rov)."""
+        index = defaultdict(set)
+        for model, field_name in self.file_fields():
+            names = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for name in names.values_list(field_name, flat=True).distinct():
+                index[name].add((model, field_name))
+        return index
+
+    def scan(self, root, paths):
+        """Fayllarni avval hajm bo'yicha guruhlaydi, faqat hajmi bir xil bo'lganlarini xeshlaydi."""
+        by_size = defaultdict(list)
+        for base in paths or ['']:
+            for dirpath, dirnames, filenames in os.walk(os.path.join(root, base)):
+                # variants/ hosilaviy fayllar (image_variants JSON da), ularni ko'chirib bo'lmaydi
+                dirnames[:] = [d for d in dirnames if d not in (TMP_DIR, VARIANT_DIR)]
+                for filename in filenames:
+                    full_path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(full_path, root).replace(os.sep, '/')
+                    by_size[os.path.getsize(full_path)].append(name)
+
+        groups = defaultdict(list)
+        for size, names in by_size.items():
+            if len(names) < 2:
+                continue
+            for name in names:
+                digest = hash_file(os.path.join(root, name))
+                groups[(digest, os.path.splitext(name)[1].lower(), size)].append(name)
+        return {key: sorted(names) for key, names in groups.items() if len(names) > 1}
+
+    def handle(self, *args, **options):
+        root = default_storage.path('')
+        dry_run = options['dry_run']
+        index = self.reference_index()
+        groups = self.scan(root, options['paths'])
+
+        removed_files, reclaimed = 0, 0
+        for (digest, ext, size), names in groups.items():
+            blob_name = blob_name_for(digest, ext)
+            duplicates = [name for name in names if name != blob_name]
+            self.stdout.write(f"{blob_name}: {', '.join(names)}")
+            removed_files += len(names) - 1
+            reclaimed += size * (len(names) - 1)
+            if dry_run:
+                continue
+
+            blob_path = os.path.join(root, blob_name)
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(os.path.join(root, duplicates[0]), blob_path)
+            with transaction.atomic():
+                for name in duplicates:
+                    for model, field_name in index.pop(name, ()):
+                        model._default_manager.filter(**{field_name: name}).update(**{field_name: blob_name})
+                        index[blob_name].add((model, field_name))
+                StoredBlob.objects.get_or_create(name=blob_name, defaults={
+                    'sha256': digest, 'size': size, 'mime_type': sniff_file(blob_path, blob_name),
+                })
+            for name in duplicates:
+                if os.path.exists(os.path.join(root, name)):
+                    os.remove(os.path.join(root, name))
+
+        if not dry_run:
+            self.recount(root, options['prune'])
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{len(groups)} ta guruh, {removed_files} ta nusxa, {reclaimed / (1024 * 1024):.2f} MB bo'shatildi."
+        ))
+
+    def recount(self, root, prune):
+        """Har bir blob uchun ref_count ni barcha FileField lardagi haqiqiy havolalar sonidan qayta hisoblaydi."""
+        counts = defaultdict(int)
+        for model, field_name in self.file_fields():
+            rows = (model._default_manager.filter(**{f'{field_name}__startswith': BLOB_DIR + '/'})
+                    .values(field_name).annotate(n=models.Count('pk')).values_list(field_name, 'n'))
+            for name, count in rows:
+                counts[name] += count
+
+        blobs = list(StoredBlob.objects.all())
+        for blob in blobs:
+            blob.ref_count = counts.get(blob.name, 0)
+        StoredBlob.objects.bulk_update(blobs, ['ref_count'], batch_size=500)
+        if prune:
+            for blob in [blob for blob in blobs if not blob.ref_count]:
+                default_storage.delete(blob.name)
@@ -0,0 +1,25 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from users.packages import PACKAGE_KINDS, build_package
+
+
+class Command(BaseCommand):
+    help = "Test, kurs yoki mock testni zip paketga (manifest.json + media) eksport qiladi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=PACKAGE_KINDS, help="Paket turi")
+        parser.add_argument('id', type=int, help="Obyekt ID si")
+        parser.add_argument('path', help="Yoziladigan .zip fayl yo'li")
+
+    def handle(self, *args, **options):
+        try:
+            builder = build_package(options['kind'], options['id'])
+        except ObjectDoesNotExist:
+            raise CommandError(f"{options['kind']} #{options['id']} topilmadi.")
+        with open(options['path'], 'wb') as file:
+            for chunk in builder.stream():
+                file.write(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['path']} yozildi ({len(builder.files)} ta media fayl)."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from users.models import Material
+
+
+class Command(BaseCommand):
+    help = ("Mavjud materiallar uchun fayl metama'lumotlarini (hajm, SHA-256, MIME turi, sahifalar soni, davomiylik) "
+            "to'ldiradi. Standart holatda faqat metama'lumoti yo'q yozuvlar qayta ishlanadi.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Metama'lumoti bor materiallarni ham qayta hisoblash")
+        parser.add_argument('--batch-size', type=int, default=200, help="Bitta bulk_update dagi yozuvlar soni")
+
+    def handle(self, *args, **options):
+        queryset = Material.objects.exclude(file='').exclude(file__isnull=True).order_by('pk')
+        if not options['force']:
+            queryset = queryset.filter(checksum='')
+
+        updated, missing, batch = 0, 0, []
+        for material in queryset.iterator(chunk_size=options['batch_size']):
+            try:
+                metadata = material.get_file_metadata()
+            except OSError:
+                missing += 1
+                self.stderr.write(f"Fayl topilmadi: {material.file.name} (material #{material.pk})")
+                continue
+            for field_name, value in metadata.items():
+                setattr(material, field_name, value)
+            batch.append(material)
+            if len(batch) >= options['batch_size']:
+                updated += Material.objects.bulk_update(batch, Material.METADATA_FIELDS)
+                batch = []
+        if batch:
+            updated += Material.objects.bulk_update(batch, Material.METADATA_FIELDS)
+        self.stdout.write(self.style.SUCCESS(f"{updated} ta material yangilandi, {missing} ta fayl topilmadi."))
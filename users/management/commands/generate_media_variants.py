@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from users.models import Material
+from users.thumbnails import IMAGE_SOURCE_FIELDS, generate_variants
+
+
+class Command(BaseCommand):
+    help = "Rasmlar (kurs, universitet, fan, profil) uchun kichik variantlarni va PDF materiallar uchun preview ni yaratadi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Variantlari bor yozuvlarni ham qayta yaratish")
+
+    def handle(self, *args, **options):
+        sources = {**IMAGE_SOURCE_FIELDS, Material: 'file'}
+        total = 0
+        for model, field_name in sources.items():
+            queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for instance in queryset.iterator():
+                if not options['force'] and (instance.image_variants or {}).get('source') == getattr(instance, field_name).name:
+                    continue
+                try:
+                    if generate_variants(instance, sync=True):
+                        total += 1
+                except Exception as e:
+                    self.stderr.write(f"{model.__name__} {instance.pk}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"{total} ta yozuv uchun variantlar yaratildi."))
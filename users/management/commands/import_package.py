@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.packages import PackageError, import_package
+
+
+class Command(BaseCommand):
+    help = "export_package (yoki admin API) bilan olingan zip paketni import qiladi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Paket (.zip) fayl yo'li")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                instance, report = import_package(file)
+        except (OSError, PackageError) as e:
+            raise CommandError(str(e))
+        details = ', '.join(f"{key}={value}" for key, value in report.items())
+        self.stdout.write(self.style.SUCCESS(f"Import qilindi: {details}"))
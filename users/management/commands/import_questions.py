@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.imports import QuestionImportError, detect_import_format, import_questions
+from users.models import Test
+
+
+class Command(BaseCommand):
+    help = ("Savollarni CSV/XLSX/JSON fayldan testga ommaviy import qiladi. Barcha qatorlar oldindan tekshiriladi, "
+            "xato bo'lsa hech narsa saqlanmaydi.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int, help="Savollar qo'shiladigan test ID si")
+        parser.add_argument('path', help="Fayl yo'li (.csv, .xlsx yoki .json)")
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'xlsx', 'json'],
+                            help="Fayl formati (standart: kengaytmadan aniqlanadi)")
+        parser.add_argument('--dry-run', action='store_true', help="Faqat tekshirish, saqlamaslik")
+
+    def handle(self, *args, **options):
+        test = Test.objects.filter(pk=options['test_id']).first()
+        if test is None:
+            raise CommandError(f"Test #{options['test_id']} topilmadi.")
+        try:
+            file_format = detect_import_format(options['path'], options['file_format'])
+            with open(options['path'], 'rb') as file:
+                result = import_questions(test, file, file_format, dry_run=options['dry_run'])
+        except (OSError, QuestionImportError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            details = '; '.join(f"{field}: {' '.join(map(str, messages))}" for field, messages in error['errors'].items())
+            self.stderr.write(f"{error['row']}-qator: {details}")
+        if result['errors']:
+            raise CommandError(f"{len(result['errors'])} ta qatorda xato, savollar saqlanmadi.")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"[dry-run] {result['valid']} ta savol to'g'ri."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{result['created']} ta savol '{test.title}' testiga qo'shildi "
+                f"({result['reused']} tasi bankdan, {result['skipped']} tasi testda allaqachon bor edi)."
+            ))
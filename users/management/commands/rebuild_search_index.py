@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.search import SEARCH_SOURCES, SEARCH_INDEX_BATCH_SIZE, rebuild_search_index, search_backend
+
+
+class Command(BaseCommand):
+    help = ("To'liq matnli qidiruv indeksini (SearchDocument) mavjud testlar, kurslar, materiallar, mock testlar va "
+            "foydalanuvchilardan qayta quradi. Indeks saqlashda avtomatik yangilanadi va migratsiyada bir marta "
+            "to'ldiriladi; buyruq ommaviy .update() lardan keyin kerak.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=list(SEARCH_SOURCES),
+                            help="Faqat shu tur(lar)ni qayta qurish (bir necha marta berish mumkin)")
+        parser.add_argument('--batch-size', type=int, default=SEARCH_INDEX_BATCH_SIZE, help="Bitta upsert dagi yozuvlar soni")
+
+    def handle(self, *args, **options):
+        with transaction.atomic(): # Qayta qurish davomida qidiruv eski indeksni ko'radi
+            counts = rebuild_search_index(options['kind'], batch_size=options['batch_size'])
+        summary = ', '.join(f"{kind}: {count}" for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Indeks qayta qurildi ({search_backend()}): {summary}"))
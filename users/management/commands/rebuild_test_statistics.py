@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.models import TestStatistics
+
+
+class Command(BaseCommand):
+    help = "Test statistikasi hisoblagichlarini UserTestResult va Payment jadvallaridan qayta hisoblaydi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, action='append', dest='test_ids',
+                            help="Faqat shu test(lar) uchun qayta hisoblash (bir necha marta berish mumkin)")
+
+    def handle(self, *args, **options):
+        count = TestStatistics.rebuild(test_ids=options.get('test_ids'))
+        self.stdout.write(self.style.SUCCESS(f"{count} ta test statistikasi qayta hisoblandi."))
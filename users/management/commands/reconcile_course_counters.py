@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.models import Course
+
+
+class Command(BaseCommand):
+    help = "Kurs hisoblagichlarini (darslar, yozilganlar, reyting va gistogramma) asosiy jadvallardan qayta hisoblaydi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help="Faqat shu kurs(lar) uchun tekshirish (bir necha marta berish mumkin)")
+
+    def handle(self, *args, **options):
+        count = Course.reconcile_counters(course_ids=options.get('course_ids'))
+        self.stdout.write(self.style.SUCCESS(f"{count} ta kurs hisoblagichlari tuzatildi."))
@@ -0,0 +1,113 @@
+"""
+Fayl metama'lumotlari (hajm, SHA-256, MIME turi, sahifalar soni, davomiylik).
+Hajm, xesh va MIME fayl oqim bilan yozilayotganda bir o'tishda hisoblanadi (StreamingMetadata),
+sahifa/davomiylik esa faqat yuklashdan keyin bir marta o'qiladi.
+"""
+import hashlib
+import mimetypes
+
+try:
+    import pymupdf # Optional: pip install pymupdf (PDF sahifalar soni uchun)
+except ImportError:
+    pymupdf = None
+
+try:
+    import mutagen # Optional: pip install mutagen (audio/video davomiyligi uchun)
+except ImportError:
+    mutagen = None
+
+
+SNIFF_BYTES = 512
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Fayl boshidagi baytlar bo'yicha aniqlanadigan turlar
+MAGIC_SIGNATURES = [
+    (b'%PDF', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'ID3', 'audio/mpeg'),
+    (b'\xff\xfb', 'audio/mpeg'),
+    (b'PK\x03\x04', 'application/zip'),
+]
+
+
+def sniff_mime_type(head, name=''):
+    """MIME turini fayl boshidagi baytlardan, kerak bo'lsa kengaytmadan aniqlaydi."""
+    guessed = mimetypes.guess_type(name)[0] if name else None
+    if head[4:8] == b'ftyp':
+        return guessed if guessed and guessed.startswith(('video/', 'audio/')) else 'video/mp4'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mime_type in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            # DOCX/PPTX/XLSX ham ZIP: kengaytma aniqroq tur beradi
+            if mime_type == 'application/zip' and guessed and guessed != 'application/zip':
+                return guessed
+            return mime_type
+    return guessed or 'application/octet-stream'
+
+
+class StreamingMetadata:
+    """Yozilayotgan bo'laklardan hajm, SHA-256 va fayl boshini (MIME uchun) yig'adi."""
+
+    def __init__(self):
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+
+    def update(self, chunk):
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+
+    @property
+    def checksum(self):
+        return self.hasher.hexdigest()
+
+    def as_dict(self, name=''):
+        return {'file_size': self.size, 'checksum': self.checksum, 'mime_type': sniff_mime_type(self.head, name)}
+
+
+def read_media_details(path, mime_type):
+    """PDF sahifalar sonini va audio/video davomiyligini (soniya) o'qiydi; kutubxona bo'lmasa None."""
+    details = {'page_count': None, 'duration_seconds': None}
+    try:
+        if mime_type == 'application/pdf' and pymupdf is not None:
+            with pymupdf.open(path) as document:
+                details['page_count'] = document.page_count
+        elif mime_type.startswith(('audio/', 'video/')) and mutagen is not None:
+            media = mutagen.File(path)
+            if media is not None and getattr(media, 'info', None) is not None:
+                details['duration_seconds'] = int(round(media.info.length))
+    except Exception:
+        pass # Buzilgan fayl metama'lumotsiz qoladi
+    return details
+
+
+def extract_file_metadata(field_file, known=None):
+    """
+    FieldFile uchun to'liq metama'lumot. `known` (masalan, StoredBlob dan hajm/xesh/MIME) berilsa
+    fayl qayta o'qilmaydi, aks holda bir marta oqim bilan o'qiladi.
+    """
+    if known:
+        metadata = dict(known)
+        if not metadata.get('mime_type'): # Eski yozuvlar: faqat fayl boshini o'qiymiz
+            with field_file.storage.open(field_file.name, 'rb') as file:
+                metadata['mime_type'] = sniff_mime_type(file.read(SNIFF_BYTES), field_file.name)
+    else:
+        stream = StreamingMetadata()
+        with field_file.storage.open(field_file.name, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                stream.update(block)
+        metadata = stream.as_dict(field_file.name)
+    try:
+        path = field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        path = None
+    if path:
+        metadata.update(read_media_details(path, metadata['mime_type']))
+    else:
+        metadata.update({'page_count': None, 'duration_seconds': None})
+    return metadata
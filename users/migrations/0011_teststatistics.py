@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:26
+
+import decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_test_statistics(apps, schema_editor):
+    # Mavjud natijalar va to'lovlardan hisoblagichlarni to'ldirish (TestStatistics.rebuild() ning tarixiy modellardagi nusxasi)
+    Test = apps.get_model('users', 'Test')
+    TestStatistics = apps.get_model('users', 'TestStatistics')
+    UserTestResult = apps.get_model('users', 'UserTestResult')
+    Payment = apps.get_model('users', 'Payment')
+    result_rows = {
+        row['test']: row for row in UserTestResult.objects.filter(status='completed').order_by().values('test').annotate(
+            count=models.Count('id'),
+            total=models.Sum('percentage'),
+            sq_total=models.Sum(models.F('percentage') * models.F('percentage')),
+            best=models.Max('percentage'),
+            best_score=models.Max('score'),
+        )
+    }
+    income_rows = {
+        row['test']: row['total'] for row in Payment.objects.filter(
+            status='successful', payment_type='test_purchase', test__isnull=False,
+        ).order_by().values('test').annotate(total=models.Sum('amount'))
+    }
+    stats = []
+    for test_id in Test.objects.values_list('pk', flat=True):
+        row = result_rows.get(test_id, {})
+        stats.append(TestStatistics(
+            test_id=test_id,
+            completed_count=row.get('count') or 0,
+            percentage_sum=row.get('total') or 0.0,
+            percentage_sq_sum=row.get('sq_total') or 0.0,
+            best_percentage=row.get('best') or 0.0,
+            best_score=row.get('best_score') or 0,
+            income_sum=income_rows.get(test_id) or decimal.Decimal('0.00'),
+        ))
+    TestStatistics.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_achievement_course_coursereview_lesson_material_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestStatistics',
+            fields=[
+                ('test', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='users.test', verbose_name='test')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='completed attempts')),
+                ('percentage_sum', models.FloatField(default=0.0, verbose_name='sum of percentages')),
+                ('percentage_sq_sum', models.FloatField(default=0.0, verbose_name='sum of squared percentages')),
+                ('best_percentage', models.FloatField(default=0.0, verbose_name='best percentage')),
+                ('best_score', models.IntegerField(default=0, verbose_name='best score')),
+                ('income_sum', models.DecimalField(decimal_places=2, default=0.0, help_text="Test sotib olish to'lovlari yig'indisi (manfiy)", max_digits=14, verbose_name='income sum')),
+                ('last_updated', models.DateTimeField(auto_now=True, verbose_name='last updated')),
+            ],
+            options={
+                'verbose_name': 'test statistics',
+                'verbose_name_plural': 'test statistics',
+            },
+        ),
+        migrations.RunPython(backfill_test_statistics, migrations.RunPython.noop),
+    ]
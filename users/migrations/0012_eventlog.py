@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_teststatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('test_viewed', "Test ko'rildi"), ('purchase_attempted', 'Sotib olishga urinish'), ('insufficient_funds', "Mablag' yetarli emas"), ('submitted', 'Test topshirildi'), ('material_downloaded', 'Material yuklab olindi')], max_length=30, verbose_name='event type')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('day', models.DateField(db_index=True, verbose_name='day')),
+                ('material', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='users.material')),
+                ('test', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='users.test')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'event',
+                'verbose_name_plural': 'events',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['day', 'event_type'], name='users_event_day_d1a16d_idx')],
+            },
+        ),
+    ]
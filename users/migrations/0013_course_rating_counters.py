@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:33
+
+from django.db import migrations, models
+
+
+def backfill_course_counters(apps, schema_editor):
+    # Mavjud sharhlar va yozilishlardan hisoblagichlarni to'ldirish (enroll() ikki marta oshirgan qiymatlar ham tuzatiladi)
+    Course = apps.get_model('users', 'Course')
+    CourseReview = apps.get_model('users', 'CourseReview')
+    UserCourseEnrollment = apps.get_model('users', 'UserCourseEnrollment')
+    histogram = {f'rating_{star}_count': models.Count('id', filter=models.Q(rating=star)) for star in range(1, 6)}
+    rating_rows = {
+        row.pop('course_id'): row
+        for row in CourseReview.objects.order_by().values('course_id').annotate(
+            rating_sum=models.Sum('rating'), rating_count=models.Count('id'), **histogram
+        )
+    }
+    enrollment_counts = dict(
+        UserCourseEnrollment.objects.order_by().values('course_id').annotate(n=models.Count('id')).values_list('course_id', 'n')
+    )
+    courses = list(Course.objects.all())
+    for course in courses:
+        row = rating_rows.get(course.pk, {})
+        course.rating_sum = row.get('rating_sum') or 0
+        course.rating_count = row.get('rating_count', 0)
+        for field in histogram:
+            setattr(course, field, row.get(field, 0))
+        course.rating = round(course.rating_sum / course.rating_count, 1) if course.rating_count else 0.0
+        course.enrolled_students_count = enrollment_counts.get(course.pk, 0)
+    Course.objects.bulk_update(
+        courses, ['rating', 'rating_sum', 'rating_count', 'enrolled_students_count', *histogram], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_eventlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='1 star ratings'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='2 star ratings'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='3 star ratings'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='4 star ratings'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='5 star ratings'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='rating count'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='rating sum'),
+        ),
+        migrations.RunPython(backfill_course_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_course_rating_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercourseenrollment',
+            name='completed_lessons_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='completed lessons count'),
+        ),
+        migrations.CreateModel(
+            name='LessonProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position_seconds', models.PositiveIntegerField(default=0, verbose_name='position (seconds)')),
+                ('completed', models.BooleanField(default=False, verbose_name='completed')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='completed at')),
+                ('last_watched_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='last watched at')),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_progress', to='users.usercourseenrollment')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_records', to='users.lesson')),
+            ],
+            options={
+                'verbose_name': 'lesson progress',
+                'verbose_name_plural': 'lesson progress',
+                'unique_together': {('enrollment', 'lesson')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:38
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_lessonprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('target', models.CharField(choices=[('material', 'Material fayli'), ('lesson_video', 'Dars videosi')], max_length=20, verbose_name='target')),
+                ('object_id', models.PositiveIntegerField(verbose_name='target object id')),
+                ('filename', models.CharField(max_length=255, verbose_name='original filename')),
+                ('file_name', models.CharField(max_length=255, verbose_name='storage path')),
+                ('total_size', models.PositiveBigIntegerField(verbose_name='total size (bytes)')),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='chunk size (bytes)')),
+                ('received_bytes', models.PositiveBigIntegerField(default=0, verbose_name='received bytes')),
+                ('next_chunk', models.PositiveIntegerField(default=0, verbose_name='next chunk number')),
+                ('checksum', models.CharField(blank=True, max_length=64, verbose_name='SHA-256 checksum')),
+                ('status', models.CharField(choices=[('uploading', 'Yuklanmoqda'), ('completed', 'Yakunlangan')], db_index=True, default='uploading', max_length=10, verbose_name='status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunked_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'chunked upload',
+                'verbose_name_plural': 'chunked uploads',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_storedblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='image variants'),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='image variants'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='image variants'),
+        ),
+        migrations.AddField(
+            model_name='university',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='image variants'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='image variants'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='checksum',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='duration_seconds',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='duration (seconds)'),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='file size (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='mime_type',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='MIME type'),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='page count'),
+        ),
+        migrations.AddField(
+            model_name='storedblob',
+            name='mime_type',
+            field=models.CharField(blank=True, max_length=100, verbose_name='MIME type'),
+        ),
+    ]
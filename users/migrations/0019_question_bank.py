@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_material_file_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, null=True, verbose_name='content hash'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='subject',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_questions', to='users.subject', verbose_name='subject'),
+        ),
+        migrations.CreateModel(
+            name='TestQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveIntegerField(default=0, help_text='Test ichidagi tartib raqami', verbose_name='order')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_links', to='users.question', verbose_name='question')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_links', to='users.test', verbose_name='test')),
+            ],
+            options={
+                'verbose_name': 'test question',
+                'verbose_name_plural': 'test questions',
+                'ordering': ['test', 'order', 'id'],
+                'unique_together': {('test', 'question')},
+            },
+        ),
+    ]
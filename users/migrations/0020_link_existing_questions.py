@@ -0,0 +1,89 @@
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Question.compute_content_hash bilan bir xil (migratsiya model kodiga bog'lanmasligi uchun nusxa)
+HASH_FIELDS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer', 'points')
+
+
+def content_hash(question):
+    parts = []
+    for field in HASH_FIELDS:
+        value = unicodedata.normalize('NFKC', str(getattr(question, field) or ''))
+        parts.append(' '.join(value.split()))
+    parts[HASH_FIELDS.index('correct_answer')] = parts[HASH_FIELDS.index('correct_answer')].upper()
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def link_existing_questions(apps, schema_editor):
+    """
+    Har bir testdagi savolni bankka ko'chiradi: bir xil kontentli savollardan bittasi (eng kichik id) qoladi,
+    testlar unga TestQuestion orqali (eski tartib bilan) bog'lanadi, foydalanuvchi javoblari ham unga o'tkaziladi.
+    """
+    Test = apps.get_model('users', 'Test')
+    Question = apps.get_model('users', 'Question')
+    TestQuestion = apps.get_model('users', 'TestQuestion')
+    UserAnswer = apps.get_model('users', 'UserAnswer')
+
+    canonical = {} # hash -> saqlanadigan savol id si
+    duplicates = {} # takroriy savol id si -> canonical id
+    links, linked = [], set()
+    updated = []
+    for question in Question.objects.select_related('test').order_by('id').iterator(chunk_size=2000):
+        digest = content_hash(question)
+        keep_id = canonical.setdefault(digest, question.pk)
+        if keep_id == question.pk:
+            question.content_hash = digest
+            question.subject_id = question.test.subject_id
+            updated.append(question)
+        else:
+            duplicates[question.pk] = keep_id
+        if (question.test_id, keep_id) not in linked: # Bir testda ikki marta bo'lgan savol bitta bog'lanish bo'ladi
+            linked.add((question.test_id, keep_id))
+            links.append(TestQuestion(test_id=question.test_id, question_id=keep_id, order=question.order))
+    Question.objects.bulk_update(updated, ['content_hash', 'subject'], batch_size=500)
+    TestQuestion.objects.bulk_create(links, batch_size=500)
+
+    for duplicate_id, keep_id in duplicates.items():
+        answers = UserAnswer.objects.filter(question_id=duplicate_id)
+        # Natijada canonical savolga javob allaqachon bo'lsa takroriy javob o'chiriladi (unique result+question)
+        answers.filter(result__user_answers__question_id=keep_id).delete()
+        answers.update(question_id=keep_id)
+    for start in range(0, len(duplicates), 500):
+        Question.objects.filter(pk__in=list(duplicates)[start:start + 500]).delete()
+
+    # question_count ni haqiqiy bog'lanishlar sonidan qayta hisoblash
+    counts = dict(TestQuestion.objects.order_by().values('test_id').annotate(n=models.Count('id')).values_list('test_id', 'n'))
+    tests = list(Test.objects.only('id', 'question_count'))
+    for test in tests:
+        test.question_count = counts.get(test.pk, 0)
+    Test.objects.bulk_update(tests, ['question_count'], batch_size=500)
+
+
+def unlink_questions(apps, schema_editor):
+    # Orqaga: har bir bog'lanish uchun testga tegishli savol nusxasi (birinchisi asl savolning o'zi)
+    Question = apps.get_model('users', 'Question')
+    TestQuestion = apps.get_model('users', 'TestQuestion')
+    seen = set()
+    for link in TestQuestion.objects.select_related('question').order_by('question_id', 'id').iterator(chunk_size=2000):
+        question = link.question
+        if question.pk in seen:
+            question.pk = None
+            question.content_hash = None
+        seen.add(link.question_id)
+        question.test_id = link.test_id
+        question.order = link.order
+        question.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_question_bank'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_existing_questions, unlink_questions),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_link_existing_questions'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='question',
+            options={'ordering': ['id'], 'verbose_name': 'question', 'verbose_name_plural': 'questions'},
+        ),
+        migrations.RemoveField(
+            model_name='question',
+            name='order',
+        ),
+        migrations.RemoveField(
+            model_name='question',
+            name='test',
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='questions',
+            field=models.ManyToManyField(blank=True, related_name='tests', through='users.TestQuestion', to='users.question', verbose_name='questions'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True, verbose_name='content hash'),
+        ),
+    ]
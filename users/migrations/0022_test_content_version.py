@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_question_bank_links'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='content version'),
+        ),
+    ]
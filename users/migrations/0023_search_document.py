@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+# users/search.py shu obyektlarga tayanadi (nomlar o'zgarsa u yerda ham o'zgartirish kerak)
+SQLITE_FTS_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_searchdocument_fts USING fts5(
+        title, body, content='users_searchdocument', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS users_searchdocument_ai AFTER INSERT ON users_searchdocument BEGIN
+        INSERT INTO users_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_searchdocument_ad AFTER DELETE ON users_searchdocument BEGIN
+        INSERT INTO users_searchdocument_fts(users_searchdocument_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_searchdocument_au AFTER UPDATE ON users_searchdocument BEGIN
+        INSERT INTO users_searchdocument_fts(users_searchdocument_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO users_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    "INSERT INTO users_searchdocument_fts(users_searchdocument_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP_SQL = [
+    'DROP TRIGGER IF EXISTS users_searchdocument_ai',
+    'DROP TRIGGER IF EXISTS users_searchdocument_ad',
+    'DROP TRIGGER IF EXISTS users_searchdocument_au',
+    'DROP TABLE IF EXISTS users_searchdocument_fts',
+]
+# 'simple' konfiguratsiya: o'zbek tili uchun stemmer yo'q, normalizatsiyani search.py qiladi
+POSTGRES_SQL = [
+    """ALTER TABLE users_searchdocument ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')
+    ) STORED""",
+    'CREATE INDEX IF NOT EXISTS users_searchdocument_vector_idx ON users_searchdocument USING GIN (search_vector)',
+]
+POSTGRES_DROP_SQL = [
+    'DROP INDEX IF EXISTS users_searchdocument_vector_idx',
+    'ALTER TABLE users_searchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_SQL)
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return # FTS5 siz SQLite: search.py LIKE bo'yicha ishlaydi
+        _execute(schema_editor, SQLITE_FTS_SQL)
+
+
+def drop_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_DROP_SQL)
+    elif vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0022_test_content_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('test', 'Test'), ('course', 'Course'), ('material', 'Material'), ('mock_test', 'Mock test'), ('user', 'User')], max_length=20, verbose_name='kind')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='object id')),
+                ('label', models.CharField(blank=True, max_length=255, verbose_name='label')),
+                ('title', models.TextField(blank=True, verbose_name='normalized title')),
+                ('body', models.TextField(blank=True, verbose_name='normalized body')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'search document',
+                'verbose_name_plural': 'search documents',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0023_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchdocument',
+            name='visible_from',
+            field=models.DateField(blank=True, null=True, verbose_name='visible from'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0024_search_document_visible_from'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertestresult',
+            name='test_version',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='test version'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+import unicodedata
+
+from django.db import migrations
+
+
+# users/search.py dagi normalizatsiya va hujjat tuzilishining shu migratsiya paytidagi nusxasi:
+# migratsiya jonli koddan import qilmaydi, faqat tarixiy modellar bilan ishlaydi
+APOSTROPHES = "'`´ʻʼʹʽ‘’′"
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j', 'з': 'z', 'и': 'i',
+    'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't',
+    'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'i', 'ь': '',
+    'э': 'e', 'ю': 'yu', 'я': 'ya', 'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+NORMALIZE_TABLE = str.maketrans({**{char: None for char in APOSTROPHES}, **CYRILLIC_TO_LATIN})
+BATCH_SIZE = 500
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKC', str(text or '')).lower()
+    return ' '.join(text.translate(NORMALIZE_TABLE).split())
+
+
+def join(*parts):
+    return normalize(' '.join(str(part) for part in parts if part))
+
+
+def subject_name(obj):
+    return obj.subject.name if obj.subject_id else ''
+
+
+# kind -> (model nomi, select_related, ommaviymi, (sarlavha, matn), ko'rinish sanasi)
+SOURCES = {
+    'test': (
+        'Test', ['subject'], lambda obj: obj.status == 'active',
+        lambda obj: (obj.title, join(subject_name(obj), obj.description)), None,
+    ),
+    'course': (
+        'Course', ['subject', 'teacher'], lambda obj: obj.status == 'active',
+        lambda obj: (obj.title, join(subject_name(obj), obj.teacher.full_name if obj.teacher_id else '', obj.description)), None,
+    ),
+    'material': (
+        'Material', ['subject'], lambda obj: obj.status == 'active',
+        lambda obj: (obj.title, join(subject_name(obj), obj.description)), None,
+    ),
+    'mock_test': (
+        'MockTest', [], lambda obj: obj.status == 'active',
+        lambda obj: (obj.title, join(obj.get_mock_type_display(), obj.description)), lambda obj: obj.available_from,
+    ),
+    'user': (
+        'User', [], lambda obj: obj.is_active and not obj.is_blocked,
+        lambda obj: (obj.full_name, join(obj.study_place, obj.region)), None,
+    ),
+}
+
+
+def populate_search_index(apps, schema_editor):
+    # 0023 bo'sh indeks yaratadi: mavjud obyektlar bir marta indekslanadi (keyin signallar sinxron ushlab turadi)
+    SearchDocument = apps.get_model('users', 'SearchDocument')
+    for kind, (model_name, related, is_public, build, visible_from) in SOURCES.items():
+        SearchDocument.objects.filter(kind=kind).delete()
+        queryset = apps.get_model('users', model_name).objects.select_related(*related).order_by('pk')
+        documents = []
+        for obj in queryset.iterator(chunk_size=BATCH_SIZE):
+            if not is_public(obj):
+                continue
+            title, body = build(obj)
+            documents.append(SearchDocument(
+                kind=kind, object_id=obj.pk, label=title[:255], title=normalize(title), body=body,
+                visible_from=visible_from(obj) if visible_from else None,
+            ))
+            if len(documents) >= BATCH_SIZE:
+                SearchDocument.objects.bulk_create(documents)
+                documents = []
+        SearchDocument.objects.bulk_create(documents)
+
+
+def clear_search_index(apps, schema_editor):
+    apps.get_model('users', 'SearchDocument').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0025_usertestresult_test_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_search_index, clear_search_index),
+    ]
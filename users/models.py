@@ -1,11 +1,19 @@
 import os
+import uuid
 import decimal
+import hashlib
+import unicodedata
 from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Cast, Greatest, Least, Round
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .counters import increment_counter, pending_delta
+from .metadata import extract_file_metadata
+from .shuffling import answer_map, shuffle_seed
 
 def user_profile_picture_path(instance, filename):
     # Fayl nomini xavfsiz holga keltirish va unikal ID qo'shish
@@ -76,6 +84,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     about_me = models.TextField(_('about me'), blank=True, null=True)
 
     profile_picture = models.ImageField(_('profile picture'), upload_to=user_profile_picture_path, blank=True, null=True)
+    image_variants = models.JSONField(_('image variants'), default=dict, blank=True, editable=False) # thumbnails.py to'ldiradi
     balance = models.DecimalField(_('balance'), max_digits=12, decimal_places=2, default=0.00)
     role = models.CharField(_('role'), max_length=10, choices=ROLE_CHOICES, default='student')
     agreetoterms = models.BooleanField(_('agreed to terms'), default=False)
@@ -131,6 +140,7 @@ class User(AbstractBaseUser, PermissionsMixin):
 class Subject(models.Model):
     name = models.CharField(_('subject name'), max_length=100, unique=True)
     icon = models.ImageField(_('icon'), upload_to='subject_icons/', blank=True, null=True)
+    image_variants = models.JSONField(_('image variants'), default=dict, blank=True, editable=False) # thumbnails.py to'ldiradi
 
     class Meta:
         verbose_name = _('subject')
@@ -171,6 +181,9 @@ class Test(models.Model):
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
     status = models.CharField(_('status'), max_length=10, choices=STATUS_CHOICES, default='draft')
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='created_tests', on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('created by'))
+    questions = models.ManyToManyField('Question', through='TestQuestion', related_name='tests', blank=True, verbose_name=_('questions'))
+    # Bumped on every change to the test or its questions; keys the rendered payload cache (see payloads.py)
+    content_version = models.PositiveIntegerField(_('content version'), default=1, editable=False)
 
     class Meta:
         verbose_name = _('test')
@@ -188,13 +201,44 @@ class Test(models.Model):
         # Consider updating count only when questions are added/removed.
         # if self.pk: # Only if the test already exists
         #    self.question_count = self.questions.count()
+        update_fields = kwargs.get('update_fields')
+        bump = not self._state.adding and (update_fields is None or 'content_version' in update_fields)
+        if bump:
+            # Atomic bump: an in-memory +1 would overwrite a concurrent bump_content_version()
+            self.content_version = models.F('content_version') + 1
         super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['content_version'])
+
+    @classmethod
+    def bump_content_version(cls, test_ids, **updates):
+        """Invalidate cached payloads of the given tests (optionally applying other updates in the same UPDATE)."""
+        return cls.objects.filter(pk__in=test_ids).update(content_version=models.F('content_version') + 1, **updates)
+
+    def get_ordered_questions(self):
+        """Bank questions in test order, each with `order` set from its link. Uses prefetched question_links if present."""
+        if 'question_links' in getattr(self, '_prefetched_objects_cache', {}):
+            links = self.question_links.all()
+        else:
+            links = self.question_links.select_related('question').order_by('order', 'id')
+        questions = []
+        for link in links:
+            link.question.order = link.order
+            questions.append(link.question)
+        return questions
 
 class Question(models.Model):
+    """
+    A question in the shared question bank. Tests reference questions through TestQuestion (which holds the order),
+    so the same question used in many tests is stored - and cached - once. Rows are deduplicated by content_hash.
+    """
     DIFFICULTY_CHOICES = Test.DIFFICULTY_CHOICES
     ANSWER_CHOICES = [('A', 'A'), ('B', 'B'), ('C', 'C'), ('D', 'D')]
+    CONTENT_FIELDS = ('question_text', 'difficulty', 'option_a', 'option_b', 'option_c', 'option_d',
+                      'correct_answer', 'explanation', 'points')
+    # Fields that define "the same question"; explanation and difficulty are editorial and may differ
+    HASH_FIELDS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer', 'points')
 
-    test = models.ForeignKey(Test, related_name='questions', on_delete=models.CASCADE, verbose_name=_('test'))
     question_text = models.TextField(_('question text'))
     # image = models.ImageField(upload_to='question_images/', blank=True, null=True)
     difficulty = models.CharField(_('difficulty'), max_length=10, choices=DIFFICULTY_CHOICES, default='orta')
@@ -205,18 +249,74 @@ class Question(models.Model):
     correct_answer = models.CharField(_('correct answer'), max_length=1, choices=ANSWER_CHOICES)
     explanation = models.TextField(_('explanation'), blank=True, null=True, help_text=_("To'g'ri javob uchun izoh"))
     points = models.PositiveSmallIntegerField(_('points'), default=1, help_text=_("Ushbu savol uchun ball"))
-    order = models.PositiveIntegerField(_('order'), default=0, help_text=_("Test ichidagi tartib raqami"))
+    subject = models.ForeignKey(Subject, related_name='bank_questions', on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('subject'))
+    content_hash = models.CharField(_('content hash'), max_length=64, unique=True, editable=False)
 
     class Meta:
         verbose_name = _('question')
         verbose_name_plural = _('questions')
+        ordering = ['id']
+
+    def __str__(self):
+        text = self.question_text
+        return f"Q {self.id}: {text[:50] + '...' if len(text) > 50 else text}"
+
+    @classmethod
+    def compute_content_hash(cls, data):
+        """SHA-256 of the normalized content (NFKC, collapsed whitespace, upper-case answer) from a dict of field values."""
+        parts = []
+        for field in cls.HASH_FIELDS:
+            value = data.get(field)
+            if value is None:
+                value = cls._meta.get_field(field).get_default()
+            value = ' '.join(unicodedata.normalize('NFKC', str(value or '')).split())
+            parts.append(value.upper() if field == 'correct_answer' else value)
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def get_content(self):
+        return {field: getattr(self, field) for field in self.CONTENT_FIELDS}
+
+    @classmethod
+    def get_or_create_from_content(cls, data, subject=None):
+        """Returns (question, created): an existing bank question with the same content, or a new one."""
+        content_hash = cls.compute_content_hash(data)
+        question = cls.objects.filter(content_hash=content_hash).first()
+        if question is not None:
+            return question, False
+        try:
+            with transaction.atomic():
+                content = {field: data[field] for field in cls.CONTENT_FIELDS if field in data}
+                return cls.objects.create(subject=subject, **content), True
+        except IntegrityError: # Created concurrently by another request
+            return cls.objects.get(content_hash=content_hash), False
+
+    def clean(self):
+        content_hash = self.compute_content_hash(self.get_content())
+        if Question.objects.filter(content_hash=content_hash).exclude(pk=self.pk).exists():
+            raise ValidationError(_("Bankda aynan shunday savol allaqachon mavjud."))
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        self.content_hash = self.compute_content_hash(self.get_content())
+        super().save(*args, **kwargs)
+        if not adding: # Shared row: every test that links to it would serve a stale payload otherwise
+            Test.bump_content_version(self.test_links.values('test_id'))
+
+class TestQuestion(models.Model):
+    """Ordered link between a test and a question in the shared question bank."""
+    test = models.ForeignKey(Test, related_name='question_links', on_delete=models.CASCADE, verbose_name=_('test'))
+    question = models.ForeignKey(Question, related_name='test_links', on_delete=models.CASCADE, verbose_name=_('question'))
+    order = models.PositiveIntegerField(_('order'), default=0, help_text=_("Test ichidagi tartib raqami"))
+
+    class Meta:
+        verbose_name = _('test question')
+        verbose_name_plural = _('test questions')
         ordering = ['test', 'order', 'id']
+        unique_together = ('test', 'question')
 
     def __str__(self):
-        return f"{self.test.title} - Q {self.order or self.id}"
+        return f"{self.test_id} - Q {self.order}: {self.question_id}"
 
-    # Update Test question_count on save/delete using signals or overriding save/delete
-    # For simplicity, we'll handle this in the admin/view logic for now.
 
 class UserTestResult(models.Model):
     STATUS_CHOICES = [
@@ -233,6 +333,8 @@ class UserTestResult(models.Model):
     end_time = models.DateTimeField(_('end time'), null=True, blank=True)
     time_spent = models.DurationField(_('time spent'), null=True, blank=True)
     status = models.CharField(_('status'), max_length=20, default='in_progress', choices=STATUS_CHOICES)
+    # Test.content_version the questions were shuffled for (see users/shuffling.py); null = fixed order
+    test_version = models.PositiveIntegerField(_('test version'), null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = _('user test result')
@@ -242,15 +344,27 @@ class UserTestResult(models.Model):
     def __str__(self):
         return f"{self.user.full_name} - {self.test.title} ({self.score}/{self.total_questions})"
 
+    @property
+    def shuffle_seed(self):
+        return shuffle_seed(self.pk, self.test_version) if self.test_version is not None else None
+
     def calculate_result(self, user_answers):
+        """
+        Grades the submitted answers ({question_id: letter}). For shuffled attempts the letters are the ones
+        the student saw and are mapped back to the original options before comparison and storage.
+        """
+        was_completed = self.status == 'completed'
         correct_count = 0
         questions = self.test.questions.all()
         self.total_questions = questions.count()
         # Clear previous answers for this result if recalculating
         self.user_answers.all().delete()
+        seed = self.shuffle_seed
 
         for question in questions:
             user_answer = user_answers.get(str(question.id)) # Ensure key is string
+            if seed is not None and user_answer:
+                user_answer = answer_map(seed, question.id).get(user_answer, user_answer)
             is_correct = user_answer is not None and user_answer == question.correct_answer
             if is_correct:
                 correct_count += question.points # Use question points
@@ -274,6 +388,10 @@ class UserTestResult(models.Model):
         self.status = 'completed'
         self.save()
 
+        # Recalculation of an already completed result must not be counted twice
+        if not was_completed:
+            TestStatistics.record_result(self.test_id, self.percentage, self.score)
+
         # Update UserRating
         try:
             user_rating = UserRating.objects.get(user=self.user)
@@ -303,6 +421,110 @@ class UserAnswer(models.Model):
         return f"Result {self.result.id} - Q {self.question.id}: {self.selected_answer or '-'} ({status})"
 
 
+class TestStatistics(models.Model):
+    """
+    Materialized per-test counters, updated at grading and purchase time.
+    Keeps AdminTestViewSet.statistics an O(1) read instead of COUNT/AVG/SUM scans.
+    Drift can be fixed with `manage.py rebuild_test_statistics`.
+    """
+    test = models.OneToOneField(Test, related_name='statistics', on_delete=models.CASCADE, verbose_name=_('test'), primary_key=True)
+    completed_count = models.PositiveIntegerField(_('completed attempts'), default=0)
+    percentage_sum = models.FloatField(_('sum of percentages'), default=0.0)
+    percentage_sq_sum = models.FloatField(_('sum of squared percentages'), default=0.0)
+    best_percentage = models.FloatField(_('best percentage'), default=0.0)
+    best_score = models.IntegerField(_('best score'), default=0)
+    income_sum = models.DecimalField(_('income sum'), max_digits=14, decimal_places=2, default=0.00, help_text=_("Test sotib olish to'lovlari yig'indisi (manfiy)"))
+    last_updated = models.DateTimeField(_('last updated'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('test statistics')
+        verbose_name_plural = _('test statistics')
+
+    def __str__(self):
+        return f"Stats for test {self.test_id}: {self.completed_count} attempts"
+
+    @property
+    def average_percentage(self):
+        if not self.completed_count:
+            return 0.0
+        return self.percentage_sum / self.completed_count
+
+    @property
+    def percentage_stddev(self):
+        """Population standard deviation from the running sums."""
+        if not self.completed_count:
+            return 0.0
+        mean = self.average_percentage
+        variance = self.percentage_sq_sum / self.completed_count - mean * mean
+        return max(variance, 0.0) ** 0.5
+
+    @classmethod
+    def _apply_deltas(cls, test_id, **updates):
+        """Atomic F() update; the row is created only for the first result or purchase of a test."""
+        if not cls.objects.filter(pk=test_id).update(**updates):
+            cls.objects.get_or_create(test_id=test_id)
+            cls.objects.filter(pk=test_id).update(**updates)
+
+    @classmethod
+    def record_result(cls, test_id, percentage, score):
+        """Adds one completed attempt to the counters in a single atomic UPDATE."""
+        percentage = float(percentage or 0)
+        cls._apply_deltas(
+            test_id,
+            completed_count=models.F('completed_count') + 1,
+            percentage_sum=models.F('percentage_sum') + percentage,
+            percentage_sq_sum=models.F('percentage_sq_sum') + percentage * percentage,
+            best_percentage=Greatest('best_percentage', models.Value(percentage)),
+            best_score=Greatest('best_score', models.Value(score or 0)),
+        )
+
+    @classmethod
+    def record_income(cls, test_id, amount):
+        """Adds a successful test purchase amount to the income counter."""
+        cls._apply_deltas(test_id, income_sum=models.F('income_sum') + amount)
+
+    @classmethod
+    def rebuild(cls, test_ids=None):
+        """Recomputes counters from UserTestResult and Payment rows (one grouped query each)."""
+        results = UserTestResult.objects.filter(status='completed')
+        payments = Payment.objects.filter(status='successful', payment_type='test_purchase', test__isnull=False)
+        tests = Test.objects.all()
+        if test_ids is not None:
+            results = results.filter(test_id__in=test_ids)
+            payments = payments.filter(test_id__in=test_ids)
+            tests = tests.filter(pk__in=test_ids)
+
+        result_rows = {
+            row['test']: row for row in results.values('test').annotate(
+                count=models.Count('id'),
+                total=models.Sum('percentage'),
+                sq_total=models.Sum(models.F('percentage') * models.F('percentage')),
+                best=models.Max('percentage'),
+                best_score=models.Max('score'),
+            )
+        }
+        income_rows = {
+            row['test']: row['total'] for row in payments.values('test').annotate(total=models.Sum('amount'))
+        }
+
+        stats = []
+        for test_id in tests.values_list('pk', flat=True):
+            row = result_rows.get(test_id, {})
+            stats.append(cls(
+                test_id=test_id,
+                completed_count=row.get('count') or 0,
+                percentage_sum=row.get('total') or 0.0,
+                percentage_sq_sum=row.get('sq_total') or 0.0,
+                best_percentage=row.get('best') or 0.0,
+                best_score=row.get('best_score') or 0,
+                income_sum=income_rows.get(test_id) or decimal.Decimal('0.00'),
+            ))
+        with transaction.atomic():
+            cls.objects.filter(test_id__in=[s.test_id for s in stats]).delete()
+            cls.objects.bulk_create(stats)
+        return len(stats)
+
+
 class Material(models.Model):
     TYPE_CHOICES = [
         ('book', 'Kitob'), ('video', 'Video dars'), ('guide', "Qo'llanma"),
@@ -321,8 +543,15 @@ class Material(models.Model):
     material_type = models.CharField(_('material type'), max_length=20, choices=TYPE_CHOICES, default='book')
     file_format = models.CharField(_('file format'), max_length=10, choices=FORMAT_CHOICES, default='pdf')
     file = models.FileField(_('file'), upload_to='materials/', blank=True, null=True, help_text=_("Format 'link' bo'lmasa yuklang"))
+    image_variants = models.JSONField(_('image variants'), default=dict, blank=True, editable=False) # thumbnails.py to'ldiradi
     link = models.URLField(_('link'), blank=True, null=True, help_text=_("Format 'link' bo'lsa kiriting"))
     size_mb = models.FloatField(_('size (MB)'), blank=True, null=True, validators=[MinValueValidator(0)])
+    # File metadata, extracted once when the file is uploaded (see metadata.py) so reads never stat storage
+    file_size = models.PositiveBigIntegerField(_('file size (bytes)'), blank=True, null=True, editable=False)
+    checksum = models.CharField(_('SHA-256'), max_length=64, blank=True, editable=False)
+    mime_type = models.CharField(_('MIME type'), max_length=100, blank=True, editable=False)
+    page_count = models.PositiveIntegerField(_('page count'), blank=True, null=True, editable=False)
+    duration_seconds = models.PositiveIntegerField(_('duration (seconds)'), blank=True, null=True, editable=False)
     downloads_count = models.PositiveIntegerField(_('downloads count'), default=0)
     status = models.CharField(_('status'), max_length=10, choices=STATUS_CHOICES, default='draft')
     uploaded_at = models.DateTimeField(_('uploaded at'), auto_now_add=True)
@@ -339,20 +568,58 @@ class Material(models.Model):
         return f"{self.title} ({self.subject.name})"
 
     def increment_download_count(self):
-        # Use F expression to avoid race conditions
-        Material.objects.filter(pk=self.pk).update(downloads_count=models.F('downloads_count') + 1)
-        self.refresh_from_db(fields=['downloads_count']) # Update instance
+        # Write-behind: the delta is buffered in memory and flushed in batched UPDATEs (see counters.py)
+        increment_counter(Material, self.pk, 'downloads_count')
+
+    def get_downloads_count(self):
+        """Stored count plus downloads not yet flushed to the database."""
+        return self.downloads_count + pending_delta(Material, self.pk, 'downloads_count')
+
+    METADATA_FIELDS = ['file_size', 'checksum', 'mime_type', 'page_count', 'duration_seconds', 'size_mb']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored file name so save() only extracts metadata when the file actually changes
+        stored = instance.__dict__.get('file')
+        instance._stored_file_name = getattr(stored, 'name', stored) or None
+        return instance
+
+    def get_file_metadata(self, known=None):
+        """
+        Metadata for the current file. Content-addressed blobs already carry size/hash/MIME type
+        computed while the upload was streamed, so only the page count or duration is read from disk.
+        """
+        if known is None:
+            known = (StoredBlob.objects.filter(pk=self.file.name)
+                     .values('size', 'sha256', 'mime_type').first())
+            if known is not None:
+                known = {'file_size': known['size'], 'checksum': known['sha256'], 'mime_type': known['mime_type']}
+        metadata = extract_file_metadata(self.file, known=known)
+        metadata['size_mb'] = round(metadata['file_size'] / (1024 * 1024), 2)
+        return metadata
 
     def save(self, *args, **kwargs):
         if self.is_free:
             self.price = 0.00
-        # Optionally calculate size_mb if file exists and size_mb is not set
-        if self.file and self.size_mb is None:
-            try:
-                self.size_mb = round(self.file.size / (1024 * 1024), 2)
-            except Exception:
-                pass # Might happen if file is not saved yet
+        stored_name = getattr(self, '_stored_file_name', None)
+        file_changed = (self.file.name or None) != stored_name if not self._state.adding else bool(self.file)
+        if file_changed and not self.file:
+            self.file_size = self.page_count = self.duration_seconds = None
+            self.checksum = self.mime_type = ''
         super().save(*args, **kwargs)
+        if file_changed and self.file:
+            # Upload code may pass metadata it already computed while streaming (see uploads.complete_upload)
+            try:
+                metadata = self.get_file_metadata(known=getattr(self, '_known_file_metadata', None))
+            except OSError:
+                metadata = None # File missing from storage; extract_material_metadata can fill it in later
+            if metadata:
+                for field_name, value in metadata.items():
+                    setattr(self, field_name, value)
+                Material.objects.filter(pk=self.pk).update(**metadata)
+        self._stored_file_name = self.file.name or None
+        self._known_file_metadata = None
 
 
 class Payment(models.Model):
@@ -419,6 +686,9 @@ class Payment(models.Model):
             except Exception as e:
                  print(f"Error updating balance for user {self.user.pk} on payment {self.pk}: {e}")
 
+            if self.payment_type == 'test_purchase' and self.test_id:
+                TestStatistics.record_income(self.test_id, self.amount)
+
 
 class UserRating(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, related_name='rating', on_delete=models.CASCADE, verbose_name=_('user'), primary_key=True)
@@ -633,6 +903,7 @@ class University(models.Model):
     name = models.CharField(_('university name'), max_length=255)
     short_name = models.CharField(_('short name'), max_length=20, blank=True, null=True)
     logo = models.ImageField(_('logo'), upload_to='university_logos/', blank=True, null=True)
+    image_variants = models.JSONField(_('image variants'), default=dict, blank=True, editable=False) # thumbnails.py to'ldiradi
     region = models.CharField(_('region'), max_length=50, choices=REGION_CHOICES, db_index=True)
     website = models.URLField(_('website'), blank=True, null=True)
     description = models.TextField(_('description'), blank=True, null=True)
@@ -711,6 +982,23 @@ class UserAchievement(models.Model):
     #     self.save()
 
 
+class CourseQuerySet(models.QuerySet):
+    def with_detail_relations(self, reviews_limit=None):
+        """
+        Prefetches lessons in display order and only the latest N reviews per course
+        (window-limited Prefetch), so courses with thousands of reviews stay constant-cost.
+        """
+        reviews_limit = reviews_limit or Course.LATEST_REVIEWS_LIMIT
+        return self.prefetch_related(
+            models.Prefetch('lessons', queryset=Lesson.objects.order_by('order', 'id'), to_attr='ordered_lessons'),
+            models.Prefetch(
+                'reviews',
+                queryset=CourseReview.objects.select_related('user').order_by('-created_at', '-id')[:reviews_limit],
+                to_attr='latest_reviews',
+            ),
+        )
+
+
 class Course(models.Model):
     STATUS_CHOICES = Test.STATUS_CHOICES
     DIFFICULTY_CHOICES = Test.DIFFICULTY_CHOICES
@@ -726,6 +1014,7 @@ class Course(models.Model):
     difficulty = models.CharField(_('difficulty'), max_length=10, choices=DIFFICULTY_CHOICES, default='orta')
     language = models.CharField(_('language'), max_length=20, choices=LANGUAGE_CHOICES, default='uz')
     thumbnail = models.ImageField(_('thumbnail'), upload_to='course_thumbnails/', blank=True, null=True)
+    image_variants = models.JSONField(_('image variants'), default=dict, blank=True, editable=False) # thumbnails.py to'ldiradi
     requirements = models.TextField(_('requirements'), blank=True, null=True)
     what_you_learn = models.TextField(_('what you learn'), blank=True, null=True)
     has_certificate = models.BooleanField(_('certificate provided'), default=False)
@@ -734,6 +1023,18 @@ class Course(models.Model):
     last_updated = models.DateTimeField(_('last updated'), auto_now=True)
     rating = models.FloatField(_('average rating'), default=0.0, validators=[MinValueValidator(0.0), MaxValueValidator(5.0)])
     enrolled_students_count = models.PositiveIntegerField(_('enrolled students count'), default=0)
+    # Reyting hisoblagichlari (counter cache): sharh yozilganda F() deltalar bilan yangilanadi
+    rating_sum = models.PositiveIntegerField(_('rating sum'), default=0)
+    rating_count = models.PositiveIntegerField(_('rating count'), default=0)
+    rating_1_count = models.PositiveIntegerField(_('1 star ratings'), default=0)
+    rating_2_count = models.PositiveIntegerField(_('2 star ratings'), default=0)
+    rating_3_count = models.PositiveIntegerField(_('3 star ratings'), default=0)
+    rating_4_count = models.PositiveIntegerField(_('4 star ratings'), default=0)
+    rating_5_count = models.PositiveIntegerField(_('5 star ratings'), default=0)
+
+    LATEST_REVIEWS_LIMIT = 5 # Kurs sahifasida ko'rsatiladigan oxirgi sharhlar soni
+
+    objects = CourseQuerySet.as_manager()
 
     class Meta:
         verbose_name = _('course')
@@ -743,18 +1044,117 @@ class Course(models.Model):
     def __str__(self):
         return f"{self.title} ({self.subject.name})"
 
+    def get_ordered_lessons(self):
+        """Lessons in display order; uses the `ordered_lessons` prefetch when available."""
+        if hasattr(self, 'ordered_lessons'):
+            return self.ordered_lessons
+        return self.lessons.order_by('order', 'id')
+
+    def get_latest_reviews(self):
+        """Latest reviews; uses the window-limited `latest_reviews` prefetch when available."""
+        if hasattr(self, 'latest_reviews'):
+            return self.latest_reviews
+        return self.reviews.select_related('user').order_by('-created_at', '-id')[:self.LATEST_REVIEWS_LIMIT]
+
     def update_lessons_count(self):
         self.lessons_count = self.lessons.count()
         self.save(update_fields=['lessons_count'])
 
-    def update_rating(self):
-        avg = self.reviews.aggregate(avg_rating=models.Avg('rating'))['avg_rating']
-        self.rating = round(avg, 1) if avg else 0.0
-        self.save(update_fields=['rating'])
-
-    def update_enrollment_count(self):
-        self.enrolled_students_count = self.enrollments.count()
-        self.save(update_fields=['enrolled_students_count'])
+    RATING_STARS = range(1, 6)
+
+    @classmethod
+    def rating_histogram_field(cls, star):
+        if star not in cls.RATING_STARS:
+            raise ValueError(f"Rating must be between 1 and 5, got {star!r}")
+        return f'rating_{star}_count'
+
+    def get_rating_histogram(self):
+        return {star: getattr(self, self.rating_histogram_field(star)) for star in self.RATING_STARS}
+
+    @classmethod
+    def apply_rating_delta(cls, course_id, added=None, removed=None):
+        """
+        Atomically applies a review change to the rating counters: `added` is the new star value,
+        `removed` the old one (both set when a review is edited). Two single-row UPDATEs in one transaction,
+        no aggregation. Raises ValueError for a star value outside 1-5.
+        """
+        if added == removed:
+            return
+        updates = {}
+        sum_delta = (added or 0) - (removed or 0)
+        count_delta = (1 if added else 0) - (1 if removed else 0)
+        if sum_delta:
+            updates['rating_sum'] = models.F('rating_sum') + sum_delta
+        if count_delta:
+            updates['rating_count'] = models.F('rating_count') + count_delta
+        if added:
+            field = cls.rating_histogram_field(added)
+            updates[field] = models.F(field) + 1
+        if removed:
+            field = cls.rating_histogram_field(removed)
+            updates[field] = models.F(field) - 1
+        with transaction.atomic():
+            cls.objects.filter(pk=course_id).update(**updates)
+            # O'rtacha yangilangan hisoblagichlardan olinadi (ba'zi DB larda bir UPDATE ichida eski qiymat o'qiladi)
+            cls.objects.filter(pk=course_id).update(rating=models.Case(
+                models.When(rating_count__gt=0, then=Round(Cast('rating_sum', models.FloatField()) / models.F('rating_count'), 1)),
+                default=models.Value(0.0), output_field=models.FloatField(),
+            ))
+
+    @classmethod
+    def apply_enrollment_delta(cls, course_id, delta):
+        courses = cls.objects.filter(pk=course_id)
+        if delta < 0:
+            courses = courses.filter(enrolled_students_count__gte=-delta)
+        courses.update(enrolled_students_count=models.F('enrolled_students_count') + delta)
+
+    @classmethod
+    def reconcile_counters(cls, course_ids=None):
+        """
+        Recomputes lessons, enrollment and rating counters from the source tables with grouped
+        aggregates (one query per table) and writes them back with bulk_update.
+        Returns the number of courses whose counters had drifted.
+        """
+        courses = cls.objects.order_by('pk')
+        reviews = CourseReview.objects.order_by()
+        enrollments = UserCourseEnrollment.objects.order_by()
+        lessons = Lesson.objects.order_by()
+        if course_ids is not None:
+            courses = courses.filter(pk__in=course_ids)
+            reviews = reviews.filter(course_id__in=course_ids)
+            enrollments = enrollments.filter(course_id__in=course_ids)
+            lessons = lessons.filter(course_id__in=course_ids)
+
+        histogram = {
+            cls.rating_histogram_field(star): models.Count('id', filter=models.Q(rating=star)) for star in cls.RATING_STARS
+        }
+        rating_rows = {
+            row.pop('course_id'): row
+            for row in reviews.values('course_id').annotate(
+                rating_sum=models.Sum('rating'), rating_count=models.Count('id'), **histogram
+            )
+        }
+        enrollment_counts = dict(enrollments.values('course_id').annotate(n=models.Count('id')).values_list('course_id', 'n'))
+        lesson_counts = dict(lessons.values('course_id').annotate(n=models.Count('id')).values_list('course_id', 'n'))
+
+        counter_fields = ['lessons_count', 'enrolled_students_count', 'rating', 'rating_sum', 'rating_count'] + list(histogram)
+        changed = []
+        for course in courses.only('pk', *counter_fields):
+            row = rating_rows.get(course.pk, {})
+            values = {
+                'lessons_count': lesson_counts.get(course.pk, 0),
+                'enrolled_students_count': enrollment_counts.get(course.pk, 0),
+                'rating_sum': row.get('rating_sum') or 0,
+                'rating_count': row.get('rating_count', 0),
+                **{field: row.get(field, 0) for field in histogram},
+            }
+            values['rating'] = round(values['rating_sum'] / values['rating_count'], 1) if values['rating_count'] else 0.0
+            if any(getattr(course, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(course, field, value)
+                changed.append(course)
+        cls.objects.bulk_update(changed, counter_fields, batch_size=500)
+        return len(changed)
 
 
 class Lesson(models.Model):
@@ -786,6 +1186,7 @@ class UserCourseEnrollment(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     progress = models.FloatField(_('progress percentage'), default=0.0, validators=[MinValueValidator(0.0), MaxValueValidator(100.0)])
     last_accessed_lesson = models.ForeignKey(Lesson, on_delete=models.SET_NULL, null=True, blank=True)
+    completed_lessons_count = models.PositiveIntegerField(_('completed lessons count'), default=0)
 
     class Meta:
         verbose_name = _('course enrollment')
@@ -800,12 +1201,63 @@ class UserCourseEnrollment(models.Model):
          is_new = self._state.adding
          super().save(*args, **kwargs)
          if is_new:
-             self.course.update_enrollment_count()
+             Course.apply_enrollment_delta(self.course_id, 1)
 
     def delete(self, *args, **kwargs):
-         course = self.course
+         course_id = self.course_id
          super().delete(*args, **kwargs)
-         course.update_enrollment_count()
+         Course.apply_enrollment_delta(course_id, -1)
+
+    def complete_lesson(self, lesson, position_seconds=0):
+        """
+        Marks the lesson as completed (idempotent) and recalculates progress from the
+        completed_lessons_count / Course.lessons_count counters in a single UPDATE.
+        """
+        now = timezone.now()
+        lesson_progress, created = LessonProgress.objects.get_or_create(
+            enrollment=self, lesson=lesson,
+            defaults={'completed': True, 'completed_at': now, 'position_seconds': position_seconds, 'last_watched_at': now},
+        )
+        if created:
+            newly_completed = True
+        else:
+            newly_completed = bool(LessonProgress.objects.filter(pk=lesson_progress.pk, completed=False).update(
+                completed=True, completed_at=now, position_seconds=position_seconds, last_watched_at=now
+            ))
+
+        updates = {'last_accessed_lesson': lesson}
+        if newly_completed:
+            updates['completed_lessons_count'] = models.F('completed_lessons_count') + 1
+            total = self.course.lessons_count
+            if total:
+                updates['progress'] = Least(
+                    Cast(models.F('completed_lessons_count') + 1, models.FloatField()) * 100.0 / total,
+                    models.Value(100.0),
+                )
+        UserCourseEnrollment.objects.filter(pk=self.pk).update(**updates)
+        self.refresh_from_db(fields=['completed_lessons_count', 'progress', 'last_accessed_lesson', 'completed_at'])
+        if self.progress >= 100 and self.completed_at is None:
+            UserCourseEnrollment.objects.filter(pk=self.pk, completed_at__isnull=True).update(completed_at=now)
+            self.completed_at = now
+        return newly_completed
+
+
+class LessonProgress(models.Model):
+    """Per-lesson watch position and completion of an enrolled student."""
+    enrollment = models.ForeignKey(UserCourseEnrollment, related_name='lesson_progress', on_delete=models.CASCADE)
+    lesson = models.ForeignKey(Lesson, related_name='progress_records', on_delete=models.CASCADE)
+    position_seconds = models.PositiveIntegerField(_('position (seconds)'), default=0)
+    completed = models.BooleanField(_('completed'), default=False)
+    completed_at = models.DateTimeField(_('completed at'), null=True, blank=True)
+    last_watched_at = models.DateTimeField(_('last watched at'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('lesson progress')
+        verbose_name_plural = _('lesson progress')
+        unique_together = ('enrollment', 'lesson')
+
+    def __str__(self):
+        return f"{self.enrollment_id} - {self.lesson_id}: {self.position_seconds}s{' (completed)' if self.completed else ''}"
 
 
 class CourseReview(models.Model):
@@ -824,14 +1276,32 @@ class CourseReview(models.Model):
     def __str__(self):
         return f"Review for {self.course.title} by {self.user.full_name} ({self.rating} stars)"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Tahrirlashda reyting deltasini hisoblash uchun bazadagi qiymatni eslab qolamiz
+        instance._stored_rating = instance.__dict__.get('rating')
+        return instance
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.course.update_rating()
+        if self._state.adding:
+            old_rating = None
+        elif getattr(self, '_stored_rating', None) is not None:
+            old_rating = self._stored_rating
+        else:
+            old_rating = CourseReview.objects.filter(pk=self.pk).values_list('rating', flat=True).first()
+        with transaction.atomic(): # An invalid star value rolls the review back with the counters
+            super().save(*args, **kwargs)
+            Course.apply_rating_delta(self.course_id, added=self.rating, removed=old_rating)
+        self._stored_rating = self.rating
 
     def delete(self, *args, **kwargs):
-        course = self.course
-        super().delete(*args, **kwargs)
-        course.update_rating()
+        course_id = self.course_id
+        rating = getattr(self, '_stored_rating', None) or self.rating
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Course.apply_rating_delta(course_id, removed=rating)
+        return result
 
 
 class ScheduleItem(models.Model):
@@ -890,6 +1360,103 @@ class Notification(models.Model):
         return f"Notification for {self.user.email}: {self.message[:50]}"
 
 
+class EventLog(models.Model):
+    """
+    Append-only log of funnel events. Rows are buffered in-process and bulk-inserted
+    (see users/events.py); `day` is the local date partition used by funnel aggregation.
+    """
+    TYPE_CHOICES = [
+        ('test_viewed', "Test ko'rildi"), ('purchase_attempted', 'Sotib olishga urinish'),
+        ('insufficient_funds', "Mablag' yetarli emas"), ('submitted', 'Test topshirildi'),
+        ('material_downloaded', 'Material yuklab olindi'),
+    ]
+
+    event_type = models.CharField(_('event type'), max_length=30, choices=TYPE_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='events', on_delete=models.SET_NULL, null=True, blank=True)
+    test = models.ForeignKey(Test, related_name='events', on_delete=models.SET_NULL, null=True, blank=True)
+    material = models.ForeignKey(Material, related_name='events', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(_('created at'), default=timezone.now)
+    day = models.DateField(_('day'), db_index=True)
+
+    class Meta:
+        verbose_name = _('event')
+        verbose_name_plural = _('events')
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['day', 'event_type'])]
+
+    def __str__(self):
+        return f"{self.get_event_type_display()} ({self.day})"
+
+
+class StoredBlob(models.Model):
+    """
+    A content-addressed file in media storage (see storage.ContentAddressedStorage).
+    ref_count is the number of FileField values pointing at the blob; the file is removed when it drops to zero.
+    """
+    name = models.CharField(_('storage path'), max_length=255, primary_key=True)
+    sha256 = models.CharField(_('SHA-256'), max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(_('size (bytes)'), default=0)
+    mime_type = models.CharField(_('MIME type'), max_length=100, blank=True)
+    ref_count = models.PositiveIntegerField(_('reference count'), default=0)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('stored blob')
+        verbose_name_plural = _('stored blobs')
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class ChunkedUpload(models.Model):
+    """Resumable upload session: chunks are appended in order directly to `file_name` in storage."""
+    TARGET_CHOICES = [
+        ('material', 'Material fayli'),
+        ('lesson_video', 'Dars videosi'),
+    ]
+    STATUS_CHOICES = [
+        ('uploading', 'Yuklanmoqda'),
+        ('completed', 'Yakunlangan'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='chunked_uploads', on_delete=models.CASCADE)
+    target = models.CharField(_('target'), max_length=20, choices=TARGET_CHOICES)
+    object_id = models.PositiveIntegerField(_('target object id'))
+    filename = models.CharField(_('original filename'), max_length=255)
+    file_name = models.CharField(_('storage path'), max_length=255)
+    total_size = models.PositiveBigIntegerField(_('total size (bytes)'))
+    chunk_size = models.PositiveIntegerField(_('chunk size (bytes)'))
+    received_bytes = models.PositiveBigIntegerField(_('received bytes'), default=0)
+    next_chunk = models.PositiveIntegerField(_('next chunk number'), default=0)
+    checksum = models.CharField(_('SHA-256 checksum'), max_length=64, blank=True)
+    status = models.CharField(_('status'), max_length=10, choices=STATUS_CHOICES, default='uploading', db_index=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
+    # target -> (model, FileField name)
+    TARGET_FIELDS = {
+        'material': (Material, 'file'),
+        'lesson_video': (Lesson, 'video_file'),
+    }
+
+    class Meta:
+        verbose_name = _('chunked upload')
+        verbose_name_plural = _('chunked uploads')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
+
+    @property
+    def total_chunks(self):
+        return -(-self.total_size // self.chunk_size) if self.total_size else 1
+
+    def get_target_field(self):
+        model, field_name = self.TARGET_FIELDS[self.target]
+        return model, model._meta.get_field(field_name)
+
+
 class UserSettings(models.Model):
     THEME_CHOICES = [('light', "Yorug'"), ('dark', 'Tungi')]
     LANGUAGE_CHOICES = [('uz', "O'zbek"), ('ru', 'Русский'), ('en', 'English')]
@@ -919,3 +1486,34 @@ class UserSettings(models.Model):
 
     def __str__(self):
         return f"Settings for {self.user.email}"
+
+
+class SearchDocument(models.Model):
+    """
+    One normalized full-text entry per public catalog object (see users/search.py).
+    The backend index is built from this table: an FTS5 virtual table kept in sync by triggers on SQLite,
+    a generated tsvector column with a GIN index on PostgreSQL.
+    """
+    KIND_CHOICES = [
+        ('test', _('Test')),
+        ('course', _('Course')),
+        ('material', _('Material')),
+        ('mock_test', _('Mock test')),
+        ('user', _('User')),
+    ]
+
+    kind = models.CharField(_('kind'), max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField(_('object id'))
+    label = models.CharField(_('label'), max_length=255, blank=True) # Original title for display
+    title = models.TextField(_('normalized title'), blank=True)
+    body = models.TextField(_('normalized body'), blank=True)
+    visible_from = models.DateField(_('visible from'), null=True, blank=True) # Hidden from search before this date (mock test availability)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('search document')
+        verbose_name_plural = _('search documents')
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.label}"
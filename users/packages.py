@@ -0,0 +1,333 @@
+"""
+Test, Course va MockTest ni boshqa serverga ko'chirish uchun paketlar (zip: manifest.json + media/).
+Media fayllar kontent xeshi (SHA-256) bo'yicha nomlanadi: paket ichida va import qilinadigan serverda
+bir xil fayl bir marta saqlanadi. Eksport oqim bilan yuboriladi, import bulk_create bilan yoziladi.
+"""
+import json
+import os
+import re
+import zipfile
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .imports import QuestionImportError, add_questions_to_test, validate_question_rows
+from .models import Subject, Test, Question, Course, Lesson, MockTest, MockTestMaterial, StoredBlob
+from .storage import BLOB_DIR, add_blob_reference, blob_name_for, hash_file
+
+
+PACKAGE_FORMAT = 'testonline-package'
+PACKAGE_VERSION = 1
+PACKAGE_KINDS = ('test', 'course', 'mock_test')
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_MAX_SIZE = 50 * 1024 * 1024
+MEDIA_DIR = 'media'
+STREAM_BLOCK_SIZE = 1024 * 1024
+MEDIA_KEY_RE = re.compile(r'^[0-9a-f]{64}(\.[0-9a-z]{1,10})?$')
+
+# Paketga yoziladigan maydonlar (id, hisoblagichlar, muallif va sanalar server-ga xos, ko'chirilmaydi)
+TEST_FIELDS = ('title', 'description', 'difficulty', 'test_type', 'price', 'reward_points', 'time_limit', 'status')
+COURSE_FIELDS = ('title', 'description', 'price', 'duration_weeks', 'difficulty', 'language',
+                 'requirements', 'what_you_learn', 'has_certificate', 'status')
+LESSON_FIELDS = ('title', 'description', 'video_url', 'duration_minutes', 'order', 'is_free_preview')
+MOCK_TEST_FIELDS = ('title', 'mock_type', 'language', 'description', 'price', 'duration_minutes',
+                    'sections_info', 'rules', 'status', 'available_from')
+MOCK_MATERIAL_FIELDS = ('mock_test_type', 'language', 'title', 'description', 'link', 'material_format', 'is_free')
+
+
+class PackageError(Exception):
+    """Paketni o'qib yoki import qilib bo'lmaganda (xabar foydalanuvchiga ko'rsatiladi)."""
+
+
+# --- Eksport ---
+
+class _ZipStream:
+    """
+    zipfile uchun seek qilinmaydigan yozish buferi: zipfile data descriptor rejimida yozadi,
+    generator har bir blokdan keyin to'plangan baytlarni olib ketadi.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def media_key(field_file):
+    """Fayl uchun paketdagi nom: <sha256><kengaytma>. CAS blob nomida xesh tayyor, boshqalarida hisoblanadi."""
+    name = field_file.name
+    base, ext = os.path.splitext(os.path.basename(name))
+    if name.startswith(BLOB_DIR + '/'):
+        return base + ext.lower()
+    return hash_file(field_file.storage.path(name)) + ext.lower()
+
+
+class PackageBuilder:
+    """Manifest va unga kerakli media fayllar ro'yxatini yig'adi."""
+
+    def __init__(self, kind):
+        self.manifest = {
+            'format': PACKAGE_FORMAT, 'version': PACKAGE_VERSION, 'kind': kind,
+            'exported_at': timezone.now(), 'media': {},
+        }
+        self.files = {} # media kaliti -> FieldFile
+
+    def add_media(self, field_file):
+        if not field_file:
+            return None
+        key = media_key(field_file)
+        if key not in self.files:
+            self.files[key] = field_file
+            self.manifest['media'][key] = {'size': field_file.size}
+        return key
+
+    def stream(self):
+        """Zip ni bloklab yuboruvchi generator (xotira fayl hajmiga bog'liq emas)."""
+        buffer = _ZipStream()
+        with zipfile.ZipFile(buffer, 'w', allowZip64=True) as archive:
+            manifest = json.dumps(self.manifest, cls=DjangoJSONEncoder, ensure_ascii=False, indent=1)
+            archive.writestr(MANIFEST_NAME, manifest, compress_type=zipfile.ZIP_DEFLATED)
+            yield buffer.pop()
+            for key, field_file in self.files.items():
+                info = zipfile.ZipInfo(f"{MEDIA_DIR}/{key}", date_time=timezone.now().timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED # Rasm/video allaqachon siqilgan
+                with archive.open(info, 'w', force_zip64=True) as entry, field_file.storage.open(field_file.name, 'rb') as source:
+                    for block in iter(lambda: source.read(STREAM_BLOCK_SIZE), b''):
+                        entry.write(block)
+                        yield buffer.pop()
+        yield buffer.pop()
+
+
+def _field_values(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def build_package(kind, pk):
+    """Obyekt uchun PackageBuilder qaytaradi. Obyekt topilmasa Model.DoesNotExist."""
+    builder = PackageBuilder(kind)
+    manifest = builder.manifest
+    if kind == 'test':
+        test = Test.objects.select_related('subject').get(pk=pk)
+        manifest['subject'] = test.subject.name
+        manifest['object'] = _field_values(test, TEST_FIELDS)
+        manifest['questions'] = [
+            {field: getattr(question, field) for field in Question.CONTENT_FIELDS} for question in test.get_ordered_questions()
+        ]
+    elif kind == 'course':
+        course = Course.objects.select_related('subject').get(pk=pk)
+        manifest['subject'] = course.subject.name
+        manifest['object'] = {**_field_values(course, COURSE_FIELDS), 'thumbnail': builder.add_media(course.thumbnail)}
+        manifest['lessons'] = [
+            {**_field_values(lesson, LESSON_FIELDS), 'video_file': builder.add_media(lesson.video_file)}
+            for lesson in course.lessons.order_by('order', 'id')
+        ]
+    elif kind == 'mock_test':
+        mock_test = MockTest.objects.get(pk=pk)
+        manifest['object'] = _field_values(mock_test, MOCK_TEST_FIELDS)
+        # Mock test materiallari tur va til bo'yicha bog'langan
+        materials = MockTestMaterial.objects.filter(mock_test_type=mock_test.mock_type, language=mock_test.language)
+        manifest['materials'] = [
+            {**_field_values(material, MOCK_MATERIAL_FIELDS), 'file': builder.add_media(material.file)}
+            for material in materials.order_by('id')
+        ]
+    else:
+        raise PackageError(f"Noma'lum paket turi: {kind}")
+    return builder
+
+
+# --- Import ---
+
+class MediaImporter:
+    """
+    Paketdagi media fayllarni storage ga yozadi. CAS storage da bunday blob bo'lsa fayl yozilmaydi,
+    faqat havola soni oshadi (kontent xeshi bo'yicha dedup).
+    """
+
+    def __init__(self, archive, manifest, storage=default_storage):
+        self.archive = archive
+        self.media = manifest.get('media') or {}
+        self.storage = storage
+        self.content_addressed = hasattr(storage, 'adopt_file')
+        self.saved = {} # kalit -> saqlangan nom (CAS bo'lmagan storage uchun bitta nusxa)
+        self.written = [] # Shu import diskka yozgan fayllar (import bekor qilinsa o'chiriladi)
+        self.stats = {'stored': 0, 'reused': 0}
+
+    def store(self, key, upload_to):
+        if not key:
+            return None
+        if not isinstance(key, str) or not MEDIA_KEY_RE.match(key) or key not in self.media:
+            raise PackageError(f"Noto'g'ri media havolasi: {key}")
+        digest, ext = key[:64], key[64:]
+        if self.content_addressed:
+            name = blob_name_for(digest, ext)
+            if StoredBlob.objects.filter(pk=name).exists():
+                add_blob_reference(name, digest, self.media[key].get('size') or 0)
+                self.stats['reused'] += 1
+                return name
+        elif key in self.saved:
+            self.stats['reused'] += 1
+            return self.saved[key]
+        try:
+            source = self.archive.open(f"{MEDIA_DIR}/{key}")
+        except KeyError:
+            raise PackageError(f"Paketda media fayl yo'q: {key}")
+        with source:
+            name = self.storage.save(f"{upload_to}{key}", File(source, name=key))
+        if self.content_addressed and name != blob_name_for(digest, ext):
+            self.storage.delete(name)
+            raise PackageError(f"Media fayl buzilgan (xesh mos emas): {key}")
+        self.saved[key] = name
+        self.written.append(name)
+        self.stats['stored'] += 1
+        return name
+
+    def discard(self):
+        """Import tranzaksiyasi bekor qilingandan keyin shu import yozgan fayllarni o'chiradi."""
+        for name in self.written:
+            if self.content_addressed and StoredBlob.objects.filter(pk=name).exists():
+                continue # Parallel import shu blobni saqlab, commit qilib ulgurgan
+            self.storage.delete(name)
+        self.written = []
+
+
+def read_manifest(archive):
+    try:
+        info = archive.getinfo(MANIFEST_NAME)
+    except KeyError:
+        raise PackageError("Paketda manifest.json topilmadi.")
+    if info.file_size > MANIFEST_MAX_SIZE:
+        raise PackageError("manifest.json juda katta.")
+    try:
+        manifest = json.loads(archive.read(info).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise PackageError(f"manifest.json ni o'qib bo'lmadi: {e}")
+    if not isinstance(manifest, dict) or manifest.get('format') != PACKAGE_FORMAT:
+        raise PackageError("Bu TestOnline paketi emas.")
+    if manifest.get('version') != PACKAGE_VERSION:
+        raise PackageError(f"Paket versiyasi qo'llab-quvvatlanmaydi: {manifest.get('version')}")
+    if manifest.get('kind') not in PACKAGE_KINDS:
+        raise PackageError(f"Noma'lum paket turi: {manifest.get('kind')}")
+    if not isinstance(manifest.get('object'), dict):
+        raise PackageError("Manifestda 'object' yo'q.")
+    return manifest
+
+
+def _build_instance(model, data, fields, exclude=(), **extra):
+    """Manifest qatoridan model obyektini yasab, maydonlarini tekshiradi (bazaga so'rov yo'q)."""
+    instance = model(**{field: data[field] for field in fields if field in data}, **extra)
+    try:
+        instance.full_clean(exclude=list(exclude), validate_unique=False)
+    except DjangoValidationError as e:
+        raise PackageError(f"{model._meta.verbose_name}: {e.message_dict}")
+    return instance
+
+
+def _get_subject(manifest):
+    name = manifest.get('subject')
+    if not name or not isinstance(name, str):
+        raise PackageError("Manifestda fan (subject) ko'rsatilmagan.")
+    return Subject.objects.get_or_create(name=name[:100])[0]
+
+
+def _import_test(manifest, media, user):
+    rows = manifest.get('questions') or []
+    if not isinstance(rows, list):
+        raise PackageError("'questions' ro'yxat bo'lishi kerak.")
+    try:
+        questions, errors = validate_question_rows(
+            (number, row if isinstance(row, dict) else {}) for number, row in enumerate(rows, start=1))
+    except QuestionImportError as e:
+        raise PackageError(str(e))
+    if errors:
+        raise PackageError(f"Savollarda xatolar: {errors[:20]}")
+    test = _build_instance(Test, manifest['object'], TEST_FIELDS, exclude=['subject'], created_by=user)
+    test.subject = _get_subject(manifest)
+    test.save()
+    result = add_questions_to_test(test, questions)
+    return test, {'questions': result['created'], 'questions_reused': result['reused']}
+
+
+def _import_course(manifest, media, user):
+    rows = manifest.get('lessons') or []
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise PackageError("'lessons' lug'atlar ro'yxati bo'lishi kerak.")
+    course = _build_instance(Course, manifest['object'], COURSE_FIELDS, exclude=['subject', 'teacher', 'thumbnail'])
+    lessons = [_build_instance(Lesson, row, LESSON_FIELDS, exclude=['course', 'video_file']) for row in rows]
+    course.subject = _get_subject(manifest)
+    course.thumbnail = media.store(manifest['object'].get('thumbnail'), Course._meta.get_field('thumbnail').upload_to)
+    course.lessons_count = len(lessons)
+    course.save()
+    upload_to = Lesson._meta.get_field('video_file').upload_to
+    for lesson, row in zip(lessons, rows):
+        lesson.course = course
+        lesson.video_file = media.store(row.get('video_file'), upload_to)
+    Lesson.objects.bulk_create(lessons, batch_size=500)
+    return course, {'lessons': len(lessons)}
+
+
+def _import_mock_test(manifest, media, user):
+    rows = manifest.get('materials') or []
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise PackageError("'materials' lug'atlar ro'yxati bo'lishi kerak.")
+    mock_test = _build_instance(MockTest, manifest['object'], MOCK_TEST_FIELDS, created_by=user)
+    materials = [_build_instance(MockTestMaterial, row, MOCK_MATERIAL_FIELDS, exclude=['file']) for row in rows]
+    mock_test.save()
+    # Materiallar tur/til bo'yicha umumiy: serverda shu nomli material bo'lsa qayta yaratilmaydi
+    existing = set(MockTestMaterial.objects.filter(
+        mock_test_type=mock_test.mock_type, language=mock_test.language
+    ).values_list('mock_test_type', 'language', 'title'))
+    new_materials = []
+    upload_to = MockTestMaterial._meta.get_field('file').upload_to
+    for material, row in zip(materials, rows):
+        key = (material.mock_test_type, material.language, material.title)
+        if key in existing:
+            continue
+        existing.add(key)
+        material.file = media.store(row.get('file'), upload_to)
+        new_materials.append(material)
+    MockTestMaterial.objects.bulk_create(new_materials, batch_size=500)
+    return mock_test, {'materials': len(new_materials), 'materials_skipped': len(materials) - len(new_materials)}
+
+
+PACKAGE_IMPORTERS = {'test': _import_test, 'course': _import_course, 'mock_test': _import_mock_test}
+
+
+def import_package(file, user=None):
+    """
+    Zip paketni import qiladi (bitta tranzaksiya). Natija: (yaratilgan obyekt, hisobot lug'ati).
+    Xato bo'lsa baza o'zgarmaydi va shu import yozib ulgurgan media fayllar diskdan o'chiriladi.
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise PackageError(f"Zip faylni o'qib bo'lmadi: {e}")
+    with archive:
+        manifest = read_manifest(archive)
+        media = MediaImporter(archive, manifest)
+        try:
+            with transaction.atomic():
+                instance, report = PACKAGE_IMPORTERS[manifest['kind']](manifest, media, user)
+        except BaseException:
+            media.discard()
+            raise
+    report.update(kind=manifest['kind'], id=instance.pk, title=str(getattr(instance, 'title', instance)),
+                  media_stored=media.stats['stored'], media_reused=media.stats['reused'])
+    return instance, report
@@ -0,0 +1,96 @@
+"""
+Test sahifasi (TestDetailSerializer) uchun tayyor JSON javoblar keshi.
+Kalit Test.content_version ga bog'langan: test yoki uning savollari o'zgarganda versiya oshadi va eski
+yozuvlar ishlatilmay qoladi (TTL bilan tushib ketadi). ETag javob baytlaridan olinadi (strong).
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import translation
+from rest_framework.renderers import JSONRenderer
+
+from .models import TestQuestion
+from .shuffling import shuffle_payload
+
+
+TEST_PAYLOAD_CACHE_TIMEOUT = getattr(settings, 'TEST_PAYLOAD_CACHE_TIMEOUT', 60 * 60) # 1 soat
+TEST_PAYLOAD_CACHE_KEY = 'payload:test:{pk}:v{version}:{variant}'
+# Student ning /start/ bilan boshlangan tugallanmagan urinishi: (result_id, urug') yoki () - urinish yo'q
+TEST_ATTEMPT_CACHE_KEY = 'payload:attempt:{test_id}:{user_id}'
+
+
+def _payload_variant(request):
+    # Javobda absolyut URL lar (host) va tarjima qilingan matnlar (til) bor
+    return hashlib.md5(f"{request.get_host()}|{translation.get_language()}".encode('utf-8')).hexdigest()[:12]
+
+
+def test_payload_cache_key(test, request):
+    return TEST_PAYLOAD_CACHE_KEY.format(pk=test.pk, version=test.content_version, variant=_payload_variant(request))
+
+
+def render_payload(data):
+    """(JSON baytlar, strong ETag)."""
+    body = JSONRenderer().render(data)
+    return body, f'"{hashlib.sha256(body).hexdigest()[:40]}"'
+
+
+def get_test_payload(test, request, serializer_class):
+    """
+    (JSON baytlar, ETag) qaytaradi. Keshda bo'lsa savollar bazadan umuman o'qilmaydi,
+    aks holda bir marta serializatsiya qilinib keshga yoziladi.
+    """
+    cache_key = test_payload_cache_key(test, request)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    prefetch_related_objects([test], Prefetch(
+        'question_links', queryset=TestQuestion.objects.select_related('question').order_by('order', 'id')
+    ))
+    payload = render_payload(serializer_class(test, context={'request': request}).data)
+    cache.set(cache_key, payload, TEST_PAYLOAD_CACHE_TIMEOUT)
+    return payload
+
+
+def get_shuffled_test_payload(test, request, serializer_class, seed):
+    """Keshdagi umumiy javob ustida shu urinish uchun aralashtirilgan nusxa (lug'at); bazaga qo'shimcha so'rov yo'q."""
+    body, _etag = get_test_payload(test, request, serializer_class)
+    return shuffle_payload(json.loads(body), seed)
+
+
+def _attempt_cache_key(test, user):
+    return TEST_ATTEMPT_CACHE_KEY.format(test_id=test.pk, user_id=user.pk)
+
+
+def remember_attempt(test, user, result):
+    """/start/ dagi urinishni keshga yozadi (result None bo'lsa "urinish yo'q" deb). (result_id, urug') yoki () qaytaradi."""
+    attempt = (result.pk, result.shuffle_seed) if result is not None else ()
+    cache.set(_attempt_cache_key(test, user), attempt, TEST_PAYLOAD_CACHE_TIMEOUT)
+    return attempt
+
+
+def get_cached_attempt(test, user, load):
+    """
+    Keshdagi urinish: keshlangan retrieve yo'lida bazaga so'rov yo'q. Kesh bo'sh bo'lsa `load()` (UserTestResult
+    yoki None) bir marta chaqiriladi va natija (urinish yo'qligi ham) keshga yoziladi.
+    """
+    attempt = cache.get(_attempt_cache_key(test, user))
+    if attempt is None:
+        attempt = remember_attempt(test, user, load())
+    return attempt
+
+
+def forget_attempt(test, user):
+    """Urinish yakunlanganda: keyingi retrieve yana asl tartibni oladi."""
+    cache.delete(_attempt_cache_key(test, user))
+
+
+def etag_matches(request, etag):
+    """If-None-Match sarlavhasida shu ETag (yoki *) bormi."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .buffers import WriteBehindBuffer, buffering_enabled
+from .models import LessonProgress, UserCourseEnrollment, Lesson
+
+
+# "Hali ko'ryapman" pinglari shuncha yozuv yig'ilganda yoki shuncha soniya o'tganda bazaga yoziladi
+PROGRESS_BUFFER_SIZE = getattr(settings, 'LESSON_PROGRESS_BUFFER_SIZE', 500)
+PROGRESS_FLUSH_INTERVAL = getattr(settings, 'LESSON_PROGRESS_FLUSH_INTERVAL', 30)
+# Buferdagi pozitsiyalar keshda ham saqlanadi: umumiy kesh (Redis/Memcached) bilan boshqa worker ga
+# kelgan GET so'rovi ham hali yozilmagan pozitsiyani ko'radi. Har bir dars alohida kalit: bitta cache.set,
+# parallel pinglar bir-birining o'zgarishini yo'qotmaydi (umumiy lug'atni o'qib-yozish kerak emas)
+PENDING_CACHE_KEY = 'progress:pending:{enrollment_id}:{lesson_id}'
+PENDING_CACHE_TIMEOUT = getattr(settings, 'LESSON_PROGRESS_PENDING_CACHE_TIMEOUT', 60 * 60)
+
+
+def _pending_key(enrollment_id, lesson_id):
+    return PENDING_CACHE_KEY.format(enrollment_id=enrollment_id, lesson_id=lesson_id)
+
+
+def _clear_cached_positions(pending):
+    """
+    Yozilgan pozitsiyalar keshdan o'chiriladi: aks holda ular bazadagi yangiroq qiymat ustidan timeout gacha ko'rinadi.
+    Flush dan keyin kelgan (yangiroq) ping kalitiga tegilmaydi.
+    """
+    keys = {_pending_key(*key): watched_at for key, (_, watched_at) in pending.items()}
+    cached = cache.get_many(list(keys))
+    cache.delete_many([key for key, (_, watched_at) in cached.items() if watched_at <= keys[key]])
+
+
+def _write_progress(pending):
+    """
+    {(enrollment_id, lesson_id): (position_seconds, watched_at)} ni batch bilan yozadi: mavjud LessonProgress lar
+    bulk_update, yangilari bulk_create, har bir enrollment ning last_accessed_lesson i bitta bulk_update.
+    Commit dan keyin bu pozitsiyalarning kesh kalitlari o'chiriladi.
+    """
+    # Ping va flush orasida o'chirilgan yozuvlarni tashlab yuboramiz
+    enrollment_ids = set(UserCourseEnrollment.objects.filter(
+        pk__in={enrollment_id for enrollment_id, _ in pending}).values_list('pk', flat=True))
+    lesson_ids = set(Lesson.objects.filter(
+        pk__in={lesson_id for _, lesson_id in pending}).values_list('pk', flat=True))
+    written = pending
+    pending = {key: value for key, value in pending.items() if key[0] in enrollment_ids and key[1] in lesson_ids}
+    if not pending:
+        transaction.on_commit(lambda: _clear_cached_positions(written))
+        return
+
+    existing = {
+        (record.enrollment_id, record.lesson_id): record
+        for record in LessonProgress.objects.filter(enrollment_id__in=enrollment_ids, lesson_id__in=lesson_ids)
+        .only('id', 'enrollment_id', 'lesson_id', 'position_seconds', 'last_watched_at')
+        if (record.enrollment_id, record.lesson_id) in pending
+    }
+    to_update, to_create = [], []
+    last_accessed = {} # enrollment_id -> (watched_at, lesson_id)
+    for (enrollment_id, lesson_id), (position, watched_at) in pending.items():
+        record = existing.get((enrollment_id, lesson_id))
+        if record is not None:
+            record.position_seconds = position
+            record.last_watched_at = watched_at
+            to_update.append(record)
+        else:
+            to_create.append(LessonProgress(
+                enrollment_id=enrollment_id, lesson_id=lesson_id, position_seconds=position, last_watched_at=watched_at
+            ))
+        if enrollment_id not in last_accessed or watched_at > last_accessed[enrollment_id][0]:
+            last_accessed[enrollment_id] = (watched_at, lesson_id)
+
+    with transaction.atomic():
+        LessonProgress.objects.bulk_update(to_update, ['position_seconds', 'last_watched_at'], batch_size=500)
+        LessonProgress.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+        UserCourseEnrollment.objects.bulk_update(
+            [UserCourseEnrollment(pk=enrollment_id, last_accessed_lesson_id=lesson_id)
+             for enrollment_id, (_, lesson_id) in last_accessed.items()],
+            ['last_accessed_lesson'], batch_size=500,
+        )
+        transaction.on_commit(lambda: _clear_cached_positions(written))
+
+
+# Bir xil (enrollment, dars) uchun takroriy pinglar bitta yozuvga birlashadi - oxirgisi qoladi
+progress_buffer = WriteBehindBuffer('lesson progress', _write_progress, PROGRESS_BUFFER_SIZE, PROGRESS_FLUSH_INTERVAL)
+
+
+def record_ping(enrollment, lesson, position_seconds):
+    """Video pozitsiyasini buferga yozadi (bazaga so'rov yo'q); so'rov tranzaksiyasi commit bo'lgandan keyin."""
+    value = (position_seconds, timezone.now())
+    progress_buffer.add((enrollment.pk, lesson.pk), value)
+    if buffering_enabled():
+        key = _pending_key(enrollment.pk, lesson.pk)
+        transaction.on_commit(lambda: cache.set(key, value, PENDING_CACHE_TIMEOUT))
+
+
+def discard_pending(enrollment, lesson):
+    """Dars tugatilganda buferdagi eski pozitsiya complete_lesson natijasi ustidan ko'rsatilmasligi uchun."""
+    progress_buffer.discard((enrollment.pk, lesson.pk))
+    if buffering_enabled():
+        key = _pending_key(enrollment.pk, lesson.pk)
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+def get_pending_positions(enrollment_id, lesson_ids):
+    """
+    Kursning shu darslari bo'yicha hali bazaga yozilmagan pozitsiyalar: {lesson_id: position_seconds}.
+    Keshdagi qiymat (istalgan worker yozgan) ustun, kesh tozalangan bo'lsa shu jarayon buferi ishlatiladi.
+    """
+    positions = {
+        lesson_id: position
+        for (pending_enrollment_id, lesson_id), (position, _) in progress_buffer.snapshot().items()
+        if pending_enrollment_id == enrollment_id
+    }
+    keys = {_pending_key(enrollment_id, lesson_id): lesson_id for lesson_id in lesson_ids}
+    for key, (position, _) in cache.get_many(list(keys)).items():
+        positions[keys[key]] = position
+    return positions
+
+
+def flush_progress(force=True):
+    """Buferdagi pozitsiyalarni batch bilan yozadi. force=False bo'lsa faqat vaqti kelganda."""
+    return progress_buffer.flush(force=force)
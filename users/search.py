@@ -0,0 +1,339 @@
+"""
+Katalog bo'yicha to'liq matnli qidiruv (testlar, kurslar, materiallar, mock testlar, foydalanuvchilar).
+Har bir ommaviy obyekt uchun SearchDocument da normallashtirilgan matn saqlanadi; indeksning o'zi bazaga bog'liq:
+SQLite da FTS5 virtual jadval (triggerlar bilan sinxron), PostgreSQL da tsvector ustun + GIN indeks
+(0023_search_document migratsiyasi, 0026 mavjud obyektlardan to'ldiradi). Hujjatlar indekslanadigan modellarning
+post_save/post_delete signallarida yangilanadi.
+
+O'zbek yozuvi variantlari bitta shaklga keltiriladi: o'/oʻ/o‘ -> o, g'/gʻ -> g, kirill harflari lotinga,
+shuning uchun "o'zbek", "oʻzbek", "ozbek" va "ўзбек" bir xil topiladi.
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework import filters
+
+from .models import User, Subject, Test, Course, Material, MockTest, SearchDocument
+
+
+SEARCH_RESULT_LIMIT = getattr(settings, 'SEARCH_RESULT_LIMIT', 500)
+SEARCH_MAX_TERMS = 8
+SEARCH_FTS_TABLE = 'users_searchdocument_fts'
+SEARCH_INDEX_BATCH_SIZE = 500
+
+# Tutuq belgisi va o'/g' dagi apostrofning barcha yozilishlari olib tashlanadi
+APOSTROPHES = "'`´ʻʼʹʽ‘’′"
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j', 'з': 'z', 'и': 'i',
+    'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't',
+    'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'i', 'ь': '',
+    'э': 'e', 'ю': 'yu', 'я': 'ya', 'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+NORMALIZE_TABLE = str.maketrans({**{char: None for char in APOSTROPHES}, **CYRILLIC_TO_LATIN})
+
+
+def normalize_search_text(text):
+    """Indeks va so'rov uchun umumiy shakl: NFKC, kichik harf, apostrofsiz, lotin yozuvida."""
+    text = unicodedata.normalize('NFKC', str(text or '')).lower()
+    return ' '.join(text.translate(NORMALIZE_TABLE).split())
+
+
+def search_terms(query):
+    return re.findall(r'\w+', normalize_search_text(query))[:SEARCH_MAX_TERMS]
+
+
+# --- Hujjatlar ---
+
+def _join(*parts):
+    return normalize_search_text(' '.join(str(part) for part in parts if part))
+
+
+def _subject_name(obj):
+    return obj.subject.name if obj.subject_id else ''
+
+
+# kind -> (model, ommaviymi, (label, sarlavha, matn))
+SEARCH_SOURCES = {
+    'test': (
+        Test, lambda obj: obj.status == 'active',
+        lambda obj: (obj.title, obj.title, _join(_subject_name(obj), obj.description)),
+    ),
+    'course': (
+        Course, lambda obj: obj.status == 'active',
+        lambda obj: (obj.title, obj.title, _join(_subject_name(obj), obj.teacher.full_name if obj.teacher_id else '', obj.description)),
+    ),
+    'material': (
+        Material, lambda obj: obj.status == 'active',
+        lambda obj: (obj.title, obj.title, _join(_subject_name(obj), obj.description)),
+    ),
+    'mock_test': (
+        MockTest, lambda obj: obj.status == 'active',
+        lambda obj: (obj.title, obj.title, _join(obj.get_mock_type_display(), obj.description)),
+    ),
+    'user': (
+        User, lambda obj: obj.is_active and not obj.is_blocked,
+        lambda obj: (obj.full_name, obj.full_name, _join(obj.study_place, obj.region)),
+    ),
+}
+SEARCH_KIND_BY_MODEL = {model: kind for kind, (model, _, _) in SEARCH_SOURCES.items()}
+# Shu sanagacha qidiruvda ko'rinmaydi (mock test ochilish sanasi)
+SEARCH_VISIBLE_FROM = {'mock_test': lambda obj: obj.available_from}
+# /api/search/ qidiradigan katalog turlari (foydalanuvchilar faqat reytingda qidiriladi)
+UNIFIED_SEARCH_KINDS = ('test', 'course', 'material', 'mock_test')
+# Hujjat matniga kiradigan maydonlar: save(update_fields=...) ularga tegmasa indeks yangilanmaydi
+SEARCH_INDEXED_FIELDS = {
+    'test': {'title', 'description', 'subject', 'status'},
+    'course': {'title', 'description', 'subject', 'teacher', 'status'},
+    'material': {'title', 'description', 'subject', 'status'},
+    'mock_test': {'title', 'description', 'mock_type', 'status', 'available_from'},
+    'user': {'full_name', 'study_place', 'region', 'is_active', 'is_blocked'},
+}
+SEARCH_RELATED = {'test': ['subject'], 'course': ['subject', 'teacher'], 'material': ['subject'], 'mock_test': [], 'user': []}
+# Nomi boshqa turdagi hujjatlar matniga kiradigan modellar: model -> (maydon, [(kind, bog'lovchi maydon), ...])
+SEARCH_DEPENDENTS = {
+    Subject: ('name', [('test', 'subject'), ('course', 'subject'), ('material', 'subject')]),
+    User: ('full_name', [('course', 'teacher')]),
+}
+
+
+def index_objects(kind, objects):
+    """Obyektlar hujjatlarini bitta upsert bilan yozadi, ommaviy bo'lmaganlarinikini o'chiradi."""
+    _, is_public, build = SEARCH_SOURCES[kind]
+    visible_from = SEARCH_VISIBLE_FROM.get(kind, lambda obj: None)
+    documents, hidden = [], []
+    for obj in objects:
+        if not is_public(obj):
+            hidden.append(obj.pk)
+            continue
+        label, title, body = build(obj)
+        documents.append(SearchDocument(
+            kind=kind, object_id=obj.pk, label=label[:255], title=normalize_search_text(title), body=body,
+            visible_from=visible_from(obj),
+        ))
+    if hidden:
+        SearchDocument.objects.filter(kind=kind, object_id__in=hidden).delete()
+    SearchDocument.objects.bulk_create(
+        documents, batch_size=SEARCH_INDEX_BATCH_SIZE, update_conflicts=True,
+        unique_fields=['kind', 'object_id'], update_fields=['label', 'title', 'body', 'visible_from', 'updated_at'],
+    )
+    return len(documents)
+
+
+def _index_in_batches(kind, queryset, batch_size=SEARCH_INDEX_BATCH_SIZE):
+    count, batch = 0, []
+    for obj in queryset.select_related(*SEARCH_RELATED[kind]).order_by('pk').iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            count += index_objects(kind, batch)
+            batch = []
+    return count + index_objects(kind, batch)
+
+
+def rebuild_search_index(kinds=None, batch_size=SEARCH_INDEX_BATCH_SIZE):
+    """Tanlangan turlar uchun indeksni noldan quradi. {kind: hujjatlar soni} qaytaradi."""
+    counts = {}
+    for kind in kinds or SEARCH_SOURCES:
+        SearchDocument.objects.filter(kind=kind).delete()
+        counts[kind] = _index_in_batches(kind, SEARCH_SOURCES[kind][0].objects.all(), batch_size)
+    return counts
+
+
+def _reindex_dependents(sender, pk):
+    for kind, field in SEARCH_DEPENDENTS[sender][1]:
+        _index_in_batches(kind, SEARCH_SOURCES[kind][0].objects.filter(**{field: pk}))
+
+
+@receiver(pre_save, sender=Subject)
+@receiver(pre_save, sender=User)
+def _remember_dependent_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Bog'liq hujjatlar faqat nom haqiqatan o'zgarganda qayta indekslanadi (har bir save da emas)
+    field = SEARCH_DEPENDENTS[sender][0]
+    if raw or instance.pk is None or (update_fields is not None and field not in update_fields):
+        return
+    instance._search_previous_name = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(post_save, sender=Test)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=MockTest)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Subject)
+def _index_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    kind = SEARCH_KIND_BY_MODEL.get(sender)
+    if kind is not None and (update_fields is None or SEARCH_INDEXED_FIELDS[kind] & set(update_fields)):
+        index_objects(kind, [instance]) # Hisoblagichlar yoki last_login yangilanishida indeks o'zgarmaydi
+    if sender in SEARCH_DEPENDENTS:
+        previous = instance.__dict__.pop('_search_previous_name', None)
+        if previous is not None and previous != getattr(instance, SEARCH_DEPENDENTS[sender][0]):
+            # Fan/o'qituvchi nomi o'zgarsa bog'liq hujjatlar commit dan keyin batch bilan yangilanadi
+            transaction.on_commit(lambda: _reindex_dependents(sender, instance.pk))
+
+
+@receiver(post_delete, sender=Test)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Material)
+@receiver(post_delete, sender=MockTest)
+@receiver(post_delete, sender=User)
+def _unindex_on_delete(sender, instance, **kwargs):
+    SearchDocument.objects.filter(kind=SEARCH_KIND_BY_MODEL[sender], object_id=instance.pk).delete()
+
+
+# --- Qidiruv ---
+
+_fts_available = {}
+
+
+def search_backend():
+    """'postgresql', 'fts5' yoki 'like' (FTS5 siz SQLite va boshqa bazalar)."""
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        if connection.alias not in _fts_available:
+            _fts_available[connection.alias] = SEARCH_FTS_TABLE in connection.introspection.table_names()
+        if _fts_available[connection.alias]:
+            return 'fts5'
+    return 'like'
+
+
+def _match_sql(terms, kinds, select='d.kind, d.object_id, d.label, {rank} AS rank'):
+    """
+    Indeksdagi mos hujjatlar uchun SELECT; {rank} qancha kichik bo'lsa shuncha mos.
+    Har bir so'z prefiks sifatida qidiriladi (barchasi bo'lishi kerak); sarlavhadagi moslik matndagidan og'irroq.
+    """
+    kind_placeholders = ', '.join(['%s'] * len(kinds))
+    conditions = f"d.kind IN ({kind_placeholders}) AND (d.visible_from IS NULL OR d.visible_from <= %s)"
+    if search_backend() == 'fts5':
+        rank = f"bm25({SEARCH_FTS_TABLE}, 10.0, 1.0)"
+        sql = (
+            f"SELECT {select.format(rank=rank)} "
+            f"FROM {SEARCH_FTS_TABLE} JOIN users_searchdocument d ON d.id = {SEARCH_FTS_TABLE}.rowid "
+            f"WHERE {SEARCH_FTS_TABLE} MATCH %s AND {conditions}"
+        )
+        match = ' '.join(f'"{term}"*' for term in terms)
+    else:
+        rank = "-ts_rank(d.search_vector, query)"
+        sql = (
+            f"SELECT {select.format(rank=rank)} "
+            "FROM users_searchdocument d, to_tsquery('simple', %s) query "
+            f"WHERE d.search_vector @@ query AND {conditions}"
+        )
+        match = ' & '.join(f'{term}:*' for term in terms)
+    return sql, [match, *kinds, timezone.localdate()]
+
+
+def _match_join(terms, kind, object_column):
+    """
+    Tashqi so'rovni indeks bilan oddiy JOIN qilish uchun (queryset.extra) qismlar: MATCH bir marta bajariladi,
+    har bir tashqi qator uchun qayta emas. (unique (kind, object_id) tufayli qatorlar ko'paymaydi.)
+    """
+    document = SearchDocument._meta.db_table
+    fts5 = search_backend() == 'fts5'
+    # SQLite'da "+kind" kind indeksini o'chiradi: aks holda COUNT rejasi FTS jadvalini ichki siklga qo'yib,
+    # MATCH'ni har bir qator uchun qayta bajaradi; shunda JOIN doim FTS natijasidan boshlanadi.
+    conditions = (f"{'+' if fts5 else ''}{document}.kind = %s AND {document}.object_id = {object_column} "
+                  f"AND ({document}.visible_from IS NULL OR {document}.visible_from <= %s)")
+    params = [kind, timezone.localdate()]
+    if fts5:
+        return {
+            'tables': [document, SEARCH_FTS_TABLE],
+            'select': {'search_rank': f"bm25({SEARCH_FTS_TABLE}, 10.0, 1.0)"},
+            'select_params': [],
+            'where': [f"{SEARCH_FTS_TABLE}.rowid = {document}.id AND {SEARCH_FTS_TABLE} MATCH %s AND {conditions}"],
+            'params': [' '.join(f'"{term}"*' for term in terms), *params],
+        }
+    query = ' & '.join(f'{term}:*' for term in terms)
+    return {
+        'tables': [document],
+        'select': {'search_rank': f"-ts_rank({document}.search_vector, to_tsquery('simple', %s))"},
+        'select_params': [query],
+        'where': [f"{document}.search_vector @@ to_tsquery('simple', %s) AND {conditions}"],
+        'params': [query, *params],
+    }
+
+
+def _like_filter(terms, kinds):
+    # FTS siz bazalar uchun: normallashtirilgan matnda LIKE (relevantliksiz)
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__contains=term) | Q(body__contains=term)
+    return SearchDocument.objects.filter(condition, kind__in=kinds).filter(
+        Q(visible_from__isnull=True) | Q(visible_from__lte=timezone.localdate())
+    )
+
+
+def _like_documents(terms, kinds, limit):
+    rows = _like_filter(terms, kinds).order_by('id').only('kind', 'object_id', 'label')[:limit]
+    return [(row.kind, row.object_id, row.label, 0) for row in rows]
+
+
+def search_grouped(query, kinds=UNIFIED_SEARCH_KINDS, per_kind=5):
+    """
+    Turlar bo'yicha guruhlangan natija bitta so'rovda (oyna funksiyalari bilan):
+    {kind: {'count': jami mos hujjatlar, 'hits': [(object_id, label, rank), ...] eng moslari birinchi}}.
+    """
+    groups = {kind: {'count': 0, 'hits': []} for kind in kinds}
+    terms = search_terms(query)
+    if not terms:
+        return groups
+    if search_backend() == 'like':
+        rows = [(kind, object_id, label, rank, None) for kind, object_id, label, rank in _like_documents(terms, kinds, SEARCH_RESULT_LIMIT)]
+    else:
+        sql, params = _match_sql(terms, list(kinds))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT kind, object_id, label, rank, total FROM ("
+                "SELECT m.*, ROW_NUMBER() OVER (PARTITION BY m.kind ORDER BY m.rank, m.object_id) AS position, "
+                f"COUNT(*) OVER (PARTITION BY m.kind) AS total FROM ({sql}) m"
+                ") ranked WHERE position <= %s ORDER BY kind, position",
+                [*params, per_kind],
+            )
+            rows = cursor.fetchall()
+    for kind, object_id, label, rank, total in rows:
+        group = groups[kind]
+        if total is None: # LIKE: jami soni shu ro'yxatdan
+            group['count'] += 1
+            if len(group['hits']) >= per_kind:
+                continue
+        else:
+            group['count'] = total
+        group['hits'].append((object_id, label, rank))
+    return groups
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """
+    `search_index_kind` belgilangan viewlarda ?search= LIKE o'rniga indeks orqali ishlaydi: indeks so'rovi
+    filtrlangan querysetga SQL da subquery sifatida qo'shiladi (id lar ro'yxati va limitsiz, boshqa filtrlar bilan birga),
+    search_index_ranking=True bo'lsa indeks jadvali querysetga JOIN qilinadi (MATCH bir marta) va relevantlik bo'yicha tartiblanadi.
+    `search_index_field` - id qaysi maydonga mos kelishi (masalan, reytingda 'user_id').
+    """
+    def filter_queryset(self, request, queryset, view):
+        kind = getattr(view, 'search_index_kind', None)
+        search_params = self.get_search_terms(request)
+        if kind is None or not search_params:
+            return super().filter_queryset(request, queryset, view)
+        terms = search_terms(' '.join(search_params))
+        if not terms:
+            return queryset.none()
+        field = getattr(view, 'search_index_field', 'pk')
+        if search_backend() == 'like':
+            return queryset.filter(**{f'{field}__in': _like_filter(terms, [kind]).values('object_id')})
+
+        if not getattr(view, 'search_index_ranking', True):
+            sql, params = _match_sql(terms, [kind], select='d.object_id')
+            return queryset.filter(**{f'{field}__in': RawSQL(sql, params)})
+        model = queryset.model
+        column = model._meta.pk.column if field == 'pk' else model._meta.get_field(field).column
+        quote = connection.ops.quote_name
+        join = _match_join(terms, kind, f'{quote(model._meta.db_table)}.{quote(column)}')
+        return queryset.extra(**join).order_by('search_rank', 'pk')
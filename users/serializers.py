@@ -1,6 +1,8 @@
+import os
 import decimal
 from rest_framework import serializers
 from django.contrib.auth import get_user_model, password_validation, authenticate
+from django.core.files.storage import default_storage
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -8,8 +10,9 @@ from .models import (
     User, Subject, Test, Question, UserTestResult, UserAnswer, Material, Payment,
     UserRating, MockTest, MockTestResult, MockTestMaterial, University,
     Achievement, UserAchievement, Course, Lesson, UserCourseEnrollment,
-    CourseReview, ScheduleItem, Notification, UserSettings
+    CourseReview, ScheduleItem, Notification, UserSettings, LessonProgress, ChunkedUpload
 )
+from .uploads import UPLOAD_MIN_CHUNK_SIZE, UPLOAD_MAX_CHUNK_SIZE, UPLOAD_MAX_SIZE
 try:
     import readtime # Optional: pip install django-readtime
 except ImportError:
@@ -19,6 +22,31 @@ except ImportError:
 User = get_user_model()
 
 # --- Helper Serializers ---
+class ImageVariantsField(serializers.ReadOnlyField):
+    """image_variants dan kichik rasm/preview URL larini beradi: {'sm_webp': url, ...}. Storage ga murojaat qilmaydi."""
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image_variants')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for key, name in (value or {}).items():
+            if key == 'source':
+                continue
+            url = default_storage.url(name)
+            urls[key] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
+def format_material_size(obj):
+    """Material hajmi matn ko'rinishida. Faqat bazadagi maydonlardan (size_mb/file_size), fayl stat qilinmaydi."""
+    # file_size aniqroq (size_mb 2 xonagacha yaxlitlangan), qo'lda kiritilgan size_mb esa havolalar uchun
+    size_mb = obj.file_size / (1024 * 1024) if obj.file_size is not None else obj.size_mb
+    if size_mb is None:
+        return "-"
+    return f"{size_mb:.1f} MB" if size_mb >= 1 else f"{size_mb * 1024:.0f} KB"
+
 class ValueChangeTargetIntSerializer(serializers.Serializer): # <<< NOM O'ZGARTIRILDI
     """Statistika kartasi uchun: Qiymat (int), Foiz o'zgarishi, Maqsad (int)."""
     value = serializers.IntegerField()
@@ -195,6 +223,7 @@ class UserSerializer(serializers.ModelSerializer):
     gender_display = serializers.CharField(source='get_gender_display', read_only=True, allow_null=True)
     balance_display = serializers.CharField(source='get_balance_display', read_only=True)
     profile_picture = serializers.ImageField(max_length=None, use_url=True, read_only=True)
+    profile_picture_variants = ImageVariantsField()
     password = serializers.CharField(write_only=True, required=False, allow_blank=True,
                                      style={'input_type': 'password'})
 
@@ -202,7 +231,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = (
             'id', 'email', 'full_name', 'phone_number', 'role', 'role_display',
-            'profile_picture', 'balance', 'balance_display', 'date_joined', 'is_active', 'is_blocked',
+            'profile_picture', 'profile_picture_variants', 'balance', 'balance_display', 'date_joined', 'is_active', 'is_blocked',
             'birth_date', 'gender', 'gender_display', 'grade', 'region', 'study_place',
             'address', 'target_university', 'target_faculty', 'about_me',
             'settings', 'rating','password'
@@ -311,15 +340,17 @@ class ProfileSettingsUpdateSerializer(serializers.ModelSerializer):
 # --- Subject Serializer ---
 class SubjectSerializer(serializers.ModelSerializer):
     icon = serializers.ImageField(max_length=None, use_url=True, read_only=True)
+    icon_variants = ImageVariantsField()
     class Meta:
         model = Subject
-        fields = ('id', 'name', 'icon')
+        fields = ('id', 'name', 'icon', 'icon_variants')
 
 
 # --- Test & Question Serializers ---
 class QuestionSerializer(serializers.ModelSerializer):
     """For displaying questions during a test (without correct answer)."""
     difficulty_display = serializers.CharField(source='get_difficulty_display', read_only=True)
+    order = serializers.IntegerField(read_only=True, default=None) # TestQuestion dan (Test.get_ordered_questions)
 
     class Meta:
         model = Question
@@ -354,7 +385,8 @@ class TestListSerializer(serializers.ModelSerializer):
 
 
 class TestDetailSerializer(TestListSerializer):
-    questions = QuestionSerializer(many=True, read_only=True, source='questions.all') # questions.all() tartib uchun
+    # Bank savollari (bir nechta testda umumiy qatorlar), tartib TestQuestion.order dan
+    questions = QuestionSerializer(many=True, read_only=True, source='get_ordered_questions')
     # TestListSerializerdan meros oladi, qo'shimcha maydonlar:
     class Meta(TestListSerializer.Meta):
         fields = TestListSerializer.Meta.fields + ('description', 'questions')
@@ -366,6 +398,8 @@ class SubmitAnswerSerializer(serializers.Serializer):
         child=serializers.ChoiceField(choices=Question.ANSWER_CHOICES, allow_blank=True),
         required=True
     )
+    # /start/ dan olingan urinish: javoblar ekranda ko'rilgan (aralashtirilgan) harflarda yuboriladi
+    result_id = serializers.IntegerField(required=False)
 
 class UserAnswerSerializer(serializers.ModelSerializer):
     question = QuestionResultSerializer(read_only=True) # Natijada savol ma'lumotlari
@@ -408,22 +442,21 @@ class MaterialSerializer(serializers.ModelSerializer):
     price_display = serializers.SerializerMethodField()
     uploaded_by_name = serializers.CharField(source='uploaded_by.full_name', read_only=True, default='')
     file = serializers.FileField(max_length=None, use_url=True, read_only=True) # Faqat URL qaytarish
+    downloads_count = serializers.IntegerField(source='get_downloads_count', read_only=True) # Hali yozilmagan yuklab olishlar bilan
+    preview = ImageVariantsField() # PDF birinchi sahifasi (preview_png)
 
     class Meta:
         model = Material
         fields = ('id', 'title', 'subject', 'description', 'material_type', 'type_display',
                   'file_format', 'format_display', 'file', 'link', 'size_mb', 'size_display',
-                  'downloads_count', 'status', 'uploaded_at', 'uploaded_by_name', 'is_free', 'price', 'price_display', 'download_url')
+                  'downloads_count', 'status', 'uploaded_at', 'uploaded_by_name', 'is_free', 'price', 'price_display', 'download_url', 'preview',
+                  'file_size', 'checksum', 'mime_type', 'page_count', 'duration_seconds')
         read_only_fields = ('id', 'subject', 'type_display', 'format_display', 'size_display', 'file',
-                          'downloads_count', 'uploaded_at', 'uploaded_by_name', 'download_url', 'price_display')
+                          'downloads_count', 'uploaded_at', 'uploaded_by_name', 'download_url', 'price_display',
+                          'file_size', 'checksum', 'mime_type', 'page_count', 'duration_seconds')
 
     def get_size_display(self, obj):
-        if obj.size_mb is not None:
-            return f"{obj.size_mb:.1f} MB" if obj.size_mb >= 1 else f"{obj.size_mb * 1024:.0f} KB"
-        elif obj.file:
-             try: return f"{obj.file.size / (1024*1024):.1f} MB" if obj.file.size >= 1024*1024 else f"{obj.file.size / 1024:.0f} KB"
-             except Exception: return "-"
-        return "-"
+        return format_material_size(obj)
 
     def get_download_url(self, obj):
         request = self.context.get('request')
@@ -516,6 +549,7 @@ class MockTestMaterialSerializer(serializers.ModelSerializer):
 class UniversitySerializer(serializers.ModelSerializer):
     region_display = serializers.CharField(source='get_region_display', read_only=True)
     logo = serializers.ImageField(max_length=None, use_url=True, read_only=True)
+    image_variants = ImageVariantsField()
     class Meta:
         model = University
         fields = '__all__'
@@ -549,9 +583,10 @@ class UserAchievementSerializer(serializers.ModelSerializer):
 class TeacherSerializer(serializers.ModelSerializer):
     """O'qituvchi haqida qisqa ma'lumot (nested uchun)."""
     profile_picture = serializers.ImageField(max_length=None, use_url=True, read_only=True)
+    profile_picture_variants = ImageVariantsField()
     class Meta:
         model = User
-        fields = ('id', 'full_name', 'profile_picture', 'about_me')
+        fields = ('id', 'full_name', 'profile_picture', 'profile_picture_variants', 'about_me')
 
 class LessonSerializer(serializers.ModelSerializer):
      """Kurs darslari uchun."""
@@ -581,6 +616,36 @@ class CourseReviewSerializer(serializers.ModelSerializer):
         fields = ('id', 'user', 'rating', 'comment', 'created_at')
         read_only_fields = ('id', 'user', 'created_at')
 
+def build_enrollment_map(user, courses, with_last_lesson=True):
+    """
+    Joriy foydalanuvchining berilgan kurslardagi yozuvlarini bitta so'rov bilan oladi: {course_id: enrollment}.
+    View lar buni serializer contextiga 'enrollment_map' sifatida beradi.
+    Ro'yxatga faqat progress kerak, shuning uchun with_last_lesson=False da oxirgi dars JOIN qilinmaydi.
+    """
+    if not user or not user.is_authenticated:
+        return {}
+    course_ids = [course.pk for course in courses]
+    if not course_ids:
+        return {}
+    enrollments = UserCourseEnrollment.objects.filter(user=user, course_id__in=course_ids)
+    if with_last_lesson:
+        enrollments = enrollments.select_related('last_accessed_lesson')
+    else:
+        enrollments = enrollments.only('id', 'course_id', 'progress').order_by()
+    return {enrollment.course_id: enrollment for enrollment in enrollments}
+
+
+def get_user_enrollment(serializer, course):
+    """Contextdagi umumiy 'enrollment_map' dan o'qiydi; map bo'lmasa (eski yo'l) bitta so'rov qiladi."""
+    request = serializer.context.get('request')
+    if not request or not request.user.is_authenticated:
+        return None
+    enrollment_map = serializer.context.get('enrollment_map')
+    if enrollment_map is not None:
+        return enrollment_map.get(course.pk)
+    return UserCourseEnrollment.objects.select_related('last_accessed_lesson').filter(user=request.user, course=course).first()
+
+
 class CourseListSerializer(serializers.ModelSerializer):
     subject = SubjectSerializer(read_only=True)
     teacher = TeacherSerializer(read_only=True)
@@ -589,14 +654,15 @@ class CourseListSerializer(serializers.ModelSerializer):
     price_display = serializers.SerializerMethodField()
     duration_display = serializers.SerializerMethodField()
     thumbnail = serializers.ImageField(max_length=None, use_url=True, read_only=True)
+    thumbnail_variants = ImageVariantsField() # Ro'yxat uchun kichik WebP/JPEG variantlar
     # Student uchun progressni ham qo'shamiz (agar login qilgan bo'lsa)
     user_progress = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
-        fields = ('id', 'title', 'subject', 'thumbnail', 'teacher', 'price', 'price_display',
+        fields = ('id', 'title', 'subject', 'thumbnail', 'thumbnail_variants', 'teacher', 'price', 'price_display',
                   'duration_weeks', 'duration_display', 'difficulty', 'difficulty_display', 'language', 'language_display',
-                  'rating', 'enrolled_students_count', 'lessons_count', 'user_progress') # user_progress qo'shildi
+                  'rating', 'rating_count', 'enrolled_students_count', 'lessons_count', 'user_progress') # user_progress qo'shildi
         read_only_fields = fields
 
     def get_price_display(self, obj):
@@ -609,8 +675,8 @@ class CourseListSerializer(serializers.ModelSerializer):
          # Contextdan requestni olish
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            # Foydalanuvchining ushbu kursdagi progressini olish
-            enrollment = UserCourseEnrollment.objects.filter(user=request.user, course=obj).first()
+            # Foydalanuvchining ushbu kursdagi progressi (view oldindan yuklagan map dan)
+            enrollment = get_user_enrollment(self, obj)
             return enrollment.progress if enrollment else 0.0
         return None # Agar login qilmagan bo'lsa
 
@@ -620,33 +686,30 @@ class CourseDetailSerializer(CourseListSerializer):
     reviews = serializers.SerializerMethodField() # Oxirgi bir nechtasini olish
     enrollment_status = serializers.SerializerMethodField()
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    rating_histogram = serializers.DictField(source='get_rating_histogram', child=serializers.IntegerField(), read_only=True)
 
     class Meta(CourseListSerializer.Meta):
         # user_progress ni olib tashlaymiz, chunki enrollment_status ichida bor
         fields = [f for f in CourseListSerializer.Meta.fields if f != 'user_progress'] + [
             'description', 'requirements', 'what_you_learn', 'has_certificate', 'status', 'status_display',
-            'lessons', 'reviews', 'enrollment_status', 'last_updated'
+            'rating_histogram', 'lessons', 'reviews', 'enrollment_status', 'last_updated'
         ]
         read_only_fields = fields # Detail viewda hamma narsa read-only
 
     def get_reviews(self, obj):
-        latest_reviews = obj.reviews.all()[:5] # Oxirgi 5 ta sharh
+        latest_reviews = obj.get_latest_reviews() # Oxirgi 5 ta sharh (Prefetch bo'lsa qo'shimcha so'rovsiz)
         return CourseReviewSerializer(latest_reviews, many=True, context=self.context).data
 
     def get_enrollment_status(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            try:
-                enrollment = UserCourseEnrollment.objects.select_related('last_accessed_lesson').get(user=user, course=obj)
-                return {
-                    'is_enrolled': True,
-                    'progress': enrollment.progress,
-                    'completed_at': enrollment.completed_at,
-                    'enrollment_id': enrollment.id,
-                    'last_accessed_lesson': LessonSerializer(enrollment.last_accessed_lesson, context=self.context).data if enrollment.last_accessed_lesson else None
-                }
-            except UserCourseEnrollment.DoesNotExist:
-                pass
+        enrollment = get_user_enrollment(self, obj)
+        if enrollment is not None:
+            return {
+                'is_enrolled': True,
+                'progress': enrollment.progress,
+                'completed_at': enrollment.completed_at,
+                'enrollment_id': enrollment.id,
+                'last_accessed_lesson': LessonSerializer(enrollment.last_accessed_lesson, context=self.context).data if enrollment.last_accessed_lesson else None
+            }
         return {'is_enrolled': False, 'progress': 0.0, 'completed_at': None, 'enrollment_id': None, 'last_accessed_lesson': None}
 
 class CourseEnrollmentSerializer(serializers.ModelSerializer):
@@ -670,6 +733,38 @@ class LeaveReviewSerializer(serializers.ModelSerializer):
 
 class UpdateProgressSerializer(serializers.Serializer):
     lesson_id = serializers.IntegerField(required=True)
+    position_seconds = serializers.IntegerField(required=False, min_value=0, default=0) # Videoning joriy pozitsiyasi
+    completed = serializers.BooleanField(required=False, default=False) # True bo'lsa dars tugatilgan deb belgilanadi
+
+class LessonProgressSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LessonProgress
+        fields = ('lesson', 'position_seconds', 'completed', 'completed_at', 'last_watched_at')
+        read_only_fields = fields
+
+class CourseProgressSerializer(serializers.ModelSerializer):
+    """Kurs bo'yicha umumiy progress va darslar kesimidagi holat."""
+    lessons_count = serializers.IntegerField(source='course.lessons_count', read_only=True)
+    last_accessed_lesson = serializers.PrimaryKeyRelatedField(read_only=True)
+    lessons = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserCourseEnrollment
+        fields = ('id', 'progress', 'completed_lessons_count', 'lessons_count', 'completed_at', 'last_accessed_lesson', 'lessons')
+        read_only_fields = fields
+
+    def get_lessons(self, obj):
+        records = LessonProgressSerializer(obj.lesson_progress.all(), many=True).data
+        # Hali bazaga yozilmagan (buferdagi) pozitsiyalar ustidan qo'yiladi
+        pending = dict(self.context.get('pending_positions') or {})
+        for record in records:
+            if record['lesson'] in pending:
+                record['position_seconds'] = pending.pop(record['lesson'])
+        records.extend(
+            {'lesson': lesson_id, 'position_seconds': position, 'completed': False, 'completed_at': None, 'last_watched_at': None}
+            for lesson_id, position in pending.items()
+        )
+        return records
 
 
 # --- Schedule Serializer ---
@@ -984,14 +1079,25 @@ class AdminTestCreateUpdateSerializer(serializers.ModelSerializer):
 class AdminQuestionSerializer(serializers.ModelSerializer):
      difficulty_display = serializers.CharField(source='get_difficulty_display', read_only=True)
      correct_answer_display = serializers.CharField(source='get_correct_answer_display', read_only=True)
+     # Savol bankda, test va tartib esa TestQuestion bog'lanishidan (viewset annotatsiya qiladi)
+     test = serializers.IntegerField(source='test_id', read_only=True, default=None)
+     order = serializers.IntegerField(read_only=True, default=None)
 
      class Meta:
          model = Question
          fields = ('id', 'test', 'order', 'question_text', 'difficulty', 'difficulty_display', 'option_a', 'option_b',
                    'option_c', 'option_d', 'correct_answer', 'correct_answer_display', 'explanation', 'points')
          read_only_fields = ('id', 'difficulty_display', 'correct_answer_display')
-         # 'test' maydonini faqat yaratishda (data orqali) yoki update da (instance dan) o'qish uchun qoldiramiz
-         extra_kwargs = {'test': {'required': False, 'read_only': True}}
+
+
+class ReorderSerializer(serializers.Serializer):
+    """Savollar/darslar tartibi: barcha ID lar yangi tartibda (birinchisi 1-o'rin)."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+    def validate_ids(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError(_("ID lar takrorlanmasligi kerak."))
+        return value
 
 
 class AdminMaterialListSerializer(serializers.ModelSerializer):
@@ -1002,21 +1108,18 @@ class AdminMaterialListSerializer(serializers.ModelSerializer):
     size_display = serializers.SerializerMethodField()
     uploaded_by_name = serializers.CharField(source='uploaded_by.full_name', read_only=True, default='')
     file_url = serializers.SerializerMethodField()
+    downloads_count = serializers.IntegerField(source='get_downloads_count', read_only=True)
 
     class Meta:
         model = Material
         fields = ('id', 'title', 'subject', 'material_type', 'type_display', 'file_format', 'format_display',
-                  'size_display', 'downloads_count', 'status', 'status_display', 'uploaded_at', 'uploaded_by_name', 'file_url')
+                  'size_display', 'mime_type', 'page_count', 'duration_seconds',
+                  'downloads_count', 'status', 'status_display', 'uploaded_at', 'uploaded_by_name', 'file_url')
         read_only_fields = ('id', 'subject', 'type_display', 'format_display', 'size_display',
                           'downloads_count', 'uploaded_at', 'uploaded_by_name', 'status_display', 'file_url')
 
     def get_size_display(self, obj):
-        # Avvalgi kod bilan bir xil
-        if obj.size_mb is not None: return f"{obj.size_mb:.1f} MB" if obj.size_mb >= 1 else f"{obj.size_mb * 1024:.0f} KB"
-        elif obj.file:
-             try: return f"{obj.file.size / (1024*1024):.1f} MB" if obj.file.size >= 1024*1024 else f"{obj.file.size / 1024:.0f} KB"
-             except Exception: return "-"
-        return "-"
+        return format_material_size(obj)
 
     def get_file_url(self, obj):
          request = self.context.get('request')
@@ -1105,6 +1208,62 @@ class AdminCombinedStatisticsSerializer(serializers.Serializer):
     payments = AdminPaymentStatisticsDataSerializer(read_only=True)
     courses = AdminCourseStatisticsDataSerializer(read_only=True)
 
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    total_chunks = serializers.IntegerField(read_only=True)
+    file_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ('id', 'target', 'object_id', 'filename', 'total_size', 'chunk_size', 'total_chunks',
+                  'received_bytes', 'next_chunk', 'checksum', 'status', 'file_url', 'created_at', 'updated_at')
+        read_only_fields = fields
+
+    def get_file_url(self, obj):
+        if obj.status != 'completed':
+            return None
+        url = obj.get_target_field()[1].storage.url(obj.file_name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+class ChunkedUploadStartSerializer(serializers.Serializer):
+    """Bo'lakli yuklashni boshlash: qaysi obyektning qaysi fayl maydoniga yuklanishi."""
+    target = serializers.ChoiceField(choices=ChunkedUpload.TARGET_CHOICES)
+    object_id = serializers.IntegerField(min_value=1)
+    filename = serializers.CharField(max_length=200)
+    total_size = serializers.IntegerField(min_value=1)
+    chunk_size = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if data['total_size'] > UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError({"total_size": _("Fayl hajmi juda katta.")})
+        chunk_size = data.get('chunk_size')
+        if chunk_size is not None and not UPLOAD_MIN_CHUNK_SIZE <= chunk_size <= UPLOAD_MAX_CHUNK_SIZE:
+            raise serializers.ValidationError({"chunk_size": _("Bo'lak hajmi {min} va {max} bayt oralig'ida bo'lishi kerak.").format(
+                min=UPLOAD_MIN_CHUNK_SIZE, max=UPLOAD_MAX_CHUNK_SIZE)})
+        model = ChunkedUpload.TARGET_FIELDS[data['target']][0]
+        data['instance'] = model.objects.filter(pk=data['object_id']).first()
+        if data['instance'] is None:
+            raise serializers.ValidationError({"object_id": _("Obyekt topilmadi.")})
+        data['filename'] = os.path.basename(data['filename'])
+        return data
+
+class ChunkedUploadCompleteSerializer(serializers.Serializer):
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, help_text=_("Butun faylning SHA-256 qiymati (ixtiyoriy)"))
+
+class AdminCohortRowSerializer(serializers.Serializer):
+    cohort = serializers.CharField() # YYYY-MM
+    size = serializers.IntegerField()
+    retention = serializers.ListField(child=serializers.FloatField(allow_null=True))
+    retention_counts = serializers.ListField(child=serializers.IntegerField())
+    conversion = serializers.ListField(child=serializers.FloatField(allow_null=True))
+    conversion_counts = serializers.ListField(child=serializers.IntegerField())
+
+class AdminCohortAnalyticsSerializer(serializers.Serializer):
+    """Kogorta bo'yicha retention va konversiya matritsalari (foizda)."""
+    generated_at = serializers.DateTimeField()
+    months = serializers.IntegerField()
+    cohorts = AdminCohortRowSerializer(many=True)
+
 class AdminUserStatisticsDetailSerializer(serializers.Serializer):
     """Admin user detail page > Statistics tab uchun"""
     completed_tests = serializers.IntegerField(read_only=True)
@@ -1129,7 +1288,9 @@ class AdminCourseCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
         # Read-only bo'lgan hisoblanuvchi maydonlarni olib tashlaymiz
-        exclude = ('created_at', 'last_updated', 'rating', 'enrolled_students_count', 'lessons_count')
+        exclude = ('created_at', 'last_updated', 'rating', 'enrolled_students_count', 'lessons_count',
+                   'rating_sum', 'rating_count', 'rating_1_count', 'rating_2_count', 'rating_3_count',
+                   'rating_4_count', 'rating_5_count', 'image_variants')
         extra_kwargs = {
             'description': {'required': False, 'allow_blank': True},
             'requirements': {'required': False, 'allow_blank': True},
@@ -0,0 +1,49 @@
+"""
+Har bir student uchun savollar va variantlar tartibini aralashtirish (javob ulashishga qarshi).
+Tartib (result_id, test content_version) dan hosil qilingan urug' bilan deterministik: keshdagi umumiy
+test javobi (payloads.py) o'zgarmaydi, aralashtirish uning ustida bajariladi, baholashda esa variant harflari
+shu urug'dan qayta hisoblangan almashtirish bilan asl harflarga qaytariladi (O(n), qo'shimcha so'rovsiz).
+"""
+import hashlib
+import random
+
+
+OPTION_LETTERS = ('A', 'B', 'C', 'D')
+
+
+def shuffle_seed(result_id, test_version):
+    return f"{result_id}:{test_version}"
+
+
+def _random(seed, *parts):
+    digest = hashlib.sha256(':'.join(str(part) for part in (seed, *parts)).encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+def option_order(seed, question_id):
+    """Ko'rsatiladigan A-D o'rinlaridagi asl harflar: ('C', 'A', 'D', 'B') -> ekrandagi A asl C variant."""
+    letters = list(OPTION_LETTERS)
+    _random(seed, 'options', question_id).shuffle(letters)
+    return tuple(letters)
+
+
+def answer_map(seed, question_id):
+    """Ekrandagi harf -> asl harf (baholash uchun)."""
+    return dict(zip(OPTION_LETTERS, option_order(seed, question_id)))
+
+
+def shuffle_payload(payload, seed):
+    """
+    TestDetailSerializer javobidan (lug'at) aralashtirilgan nusxa: savollar tartibi va har bir savol variantlari.
+    Variantlar savol id siga bog'liq, shuning uchun savollar tartibi baholashga ta'sir qilmaydi.
+    """
+    questions = list(payload.get('questions') or [])
+    _random(seed, 'questions').shuffle(questions)
+    shuffled = []
+    for position, question in enumerate(questions, start=1):
+        question = dict(question, order=position)
+        options = {letter: question[f'option_{letter.lower()}'] for letter in OPTION_LETTERS}
+        for shown, original in zip(OPTION_LETTERS, option_order(seed, question['id'])):
+            question[f'option_{shown.lower()}'] = options[original]
+        shuffled.append(question)
+    return dict(payload, questions=shuffled)
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from django.core.files.storage import FileSystemStorage
+from django.core.signals import request_finished
+from django.db import IntegrityError, models, transaction
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+
+from .metadata import SNIFF_BYTES, StreamingMetadata, sniff_mime_type
+
+
+BLOB_DIR = 'blobs'
+TMP_DIR = '.tmp'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def blob_name_for(digest, ext):
+    """Kontent xeshi bo'yicha fayl yo'li: blobs/ab/cd/abcd...<ext>."""
+    return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def sniff_file(path, name=''):
+    """Diskdagi fayl MIME turi (faqat boshidagi SNIFF_BYTES bayt o'qiladi)."""
+    with open(path, 'rb') as file:
+        return sniff_mime_type(file.read(SNIFF_BYTES), name or path)
+
+
+def add_blob_reference(name, digest, size, count=1, mime_type=''):
+    """StoredBlob ning ref_count ini oshiradi (yo'q bo'lsa yaratadi)."""
+    from .models import StoredBlob # storage ilovalar yuklanishidan oldin import qilinishi mumkin
+    if StoredBlob.objects.filter(pk=name).update(ref_count=models.F('ref_count') + count):
+        return
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.create(name=name, sha256=digest, size=size, mime_type=mime_type, ref_count=count)
+    except IntegrityError: # Parallel yuklash birinchi bo'lib yaratdi
+        StoredBlob.objects.filter(pk=name).update(ref_count=models.F('ref_count') + count)
+
+
+# Tranzaksiya ichida yangi yozilgan blob fayllari: {on_commit callback: (storage, nom)}
+_uncommitted = threading.local()
+
+
+def _uncommitted_blobs():
+    if not hasattr(_uncommitted, 'blobs'):
+        _uncommitted.blobs = {}
+    return _uncommitted.blobs
+
+
+def _track_uncommitted_blob(storage, name):
+    """
+    Fayl diskka darhol yoziladi, StoredBlob qatori esa tranzaksiya bilan birga bekor bo'lishi mumkin.
+    Commit bo'lsa yozuv ro'yxatdan chiqadi; rollback da on_commit callback tashlab yuboriladi va
+    fayl discard_rolled_back_blobs() da o'chiriladi.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        return # autocommit: qator allaqachon saqlangan
+    blobs = _uncommitted_blobs()
+
+    def committed():
+        blobs.pop(committed, None)
+
+    blobs[committed] = (storage, name)
+    transaction.on_commit(committed)
+
+
+def discard_rolled_back_blobs():
+    """
+    Rollback bo'lgan tranzaksiyalar yozgan, hech qaysi StoredBlob ga tegishli bo'lmagan blob fayllarini o'chiradi.
+    Hali commit kutayotganlarga tegmaydi (ularning callbacki ulanishning on_commit ro'yxatida turibdi).
+    """
+    from .models import StoredBlob
+    blobs = _uncommitted_blobs()
+    waiting = {func for _, func, _ in transaction.get_connection().run_on_commit}
+    rolled_back = [callback for callback in blobs if callback not in waiting]
+    if not rolled_back:
+        return
+    names = {blobs[callback][1] for callback in rolled_back}
+    # Parallel yuklash shu blobni saqlab, commit qilib ulgurgan bo'lishi mumkin
+    kept = set(StoredBlob.objects.filter(pk__in=names).values_list('pk', flat=True))
+    for callback in rolled_back:
+        storage, name = blobs.pop(callback)
+        if name not in kept:
+            FileSystemStorage.delete(storage, name)
+
+
+def _discard_outside_transaction():
+    # Ochiq tranzaksiya ichida qo'shimcha so'rov yubormaymiz: tranzaksiya tugagach (keyingi so'rovda) tekshiriladi
+    if not transaction.get_connection().in_atomic_block:
+        discard_rolled_back_blobs()
+
+
+@receiver(request_finished, dispatch_uid='discard_rolled_back_blobs')
+def _discard_after_request(sender, **kwargs):
+    _discard_outside_transaction()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Fayllarni kontent xeshi (SHA-256) bo'yicha saqlaydi: bir xil fayl qayta yuklansa yangi nusxa yozilmaydi,
+    faqat StoredBlob.ref_count oshadi. Xesh, hajm va MIME turi fayl vaqtinchalik faylga oqim bilan
+    yozilayotganda hisoblanadi va StoredBlob da saqlanadi (keyin faylni qayta o'qish shart emas).
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Nom kontentdan kelib chiqadi, tasodifiy qo'shimcha (_2doKypN) kerak emas
+        return name
+
+    def _save(self, name, content):
+        tmp_dir = self.path(TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        stream = StreamingMetadata()
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp_file:
+            for chunk in content.chunks():
+                stream.update(chunk)
+                tmp_file.write(chunk)
+        return self.adopt_file(
+            tmp_file.name, stream.checksum, os.path.splitext(name)[1], stream.size,
+            mime_type=sniff_mime_type(stream.head, name),
+        )
+
+    def adopt_file(self, path, digest, ext, size=None, mime_type=None):
+        """
+        Xeshi ma'lum bo'lgan faylni (masalan, bo'lakli yuklash natijasi) blob joyiga ko'chiradi (rename, nusxa emas).
+        Bunday blob allaqachon bo'lsa fayl o'chiriladi. Blob nomini qaytaradi.
+        Tranzaksiya ichida chaqirilsa havola u bilan birga bekor bo'ladi, yangi yozilgan fayl esa keyin o'chiriladi.
+        """
+        _discard_outside_transaction()
+        name = blob_name_for(digest, ext)
+        full_path = self.path(name)
+        size = os.path.getsize(path) if size is None else size
+        mime_type = sniff_file(path, name) if mime_type is None else mime_type
+        if os.path.exists(full_path):
+            os.remove(path)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(path, full_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+            _track_uncommitted_blob(self, name)
+        add_blob_reference(name, digest, size, mime_type=mime_type)
+        return name
+
+    def delete(self, name):
+        """Blob havolasini kamaytiradi; fayl faqat oxirgi havola o'chirilganda o'chadi."""
+        from .models import StoredBlob
+        if not name or not name.startswith(BLOB_DIR + '/'):
+            return super().delete(name)
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(pk=name).first()
+            if blob is not None and blob.ref_count > 1:
+                StoredBlob.objects.filter(pk=name).update(ref_count=models.F('ref_count') - 1)
+                return
+            StoredBlob.objects.filter(pk=name).delete()
+        super().delete(name)
+
+
+# --- Havolalarni bo'shatish ---
+
+def blob_file_fields(model):
+    """Modelning kontent-manzilli storage dagi FileField/ImageField lari."""
+    return [field for field in model._meta.concrete_fields
+            if isinstance(field, models.FileField) and hasattr(field.storage, 'adopt_file')]
+
+
+def _is_blob(name):
+    return bool(name) and name.startswith(BLOB_DIR + '/')
+
+
+def _release_on_commit(released):
+    # Tranzaksiya bekor qilinsa havola kamaymaydi (yozuv eski faylga ishora qilib qoladi)
+    if released:
+        transaction.on_commit(lambda: [storage.delete(name) for storage, name in released])
+
+
+def release_replaced_blobs(sender, instance, raw=False, update_fields=None, **kwargs):
+    """pre_save: almashtirilgan yoki tozalangan fayl blobining havolasi commit dan keyin bo'shatiladi."""
+    if raw or instance._state.adding:
+        return
+    fields = [field for field in blob_file_fields(sender) if update_fields is None or field.name in update_fields]
+    if not fields:
+        return
+    previous = sender._default_manager.filter(pk=instance.pk).values(*[field.attname for field in fields]).first()
+    if previous is None:
+        return
+    released = []
+    for field in fields:
+        old_name, current = previous[field.attname], getattr(instance, field.attname)
+        # Yangi yuklangan fayl (hali saqlanmagan) o'zi havola qo'shadi, shuning uchun nomi bir xil bo'lsa ham eskisi bo'shatiladi
+        if _is_blob(old_name) and (old_name != current.name or not current._committed):
+            released.append((field.storage, old_name))
+    _release_on_commit(released)
+
+
+def release_deleted_blobs(sender, instance, **kwargs):
+    """post_delete: o'chirilgan yozuv fayllarining blob havolalari bo'shatiladi."""
+    _release_on_commit([
+        (field.storage, getattr(instance, field.attname).name)
+        for field in blob_file_fields(sender) if _is_blob(getattr(instance, field.attname).name)
+    ])
+
+
+def connect_blob_signals(models_list):
+    """Fayl maydoni bor modellar uchun (Material, Lesson, Course.thumbnail, ...) havola signallarini ulaydi."""
+    for model in models_list:
+        if blob_file_fields(model):
+            pre_save.connect(release_replaced_blobs, sender=model, dispatch_uid=f'release_replaced_blobs:{model._meta.label}')
+            post_delete.connect(release_deleted_blobs, sender=model, dispatch_uid=f'release_deleted_blobs:{model._meta.label}')
@@ -0,0 +1,118 @@
+import mimetypes
+import re
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+
+# Faylni o'qish bo'lagi hajmi va proksiga (nginx/apache) yuklash rejimi
+STREAM_CHUNK_SIZE = getattr(settings, 'MEDIA_STREAM_CHUNK_SIZE', 64 * 1024)
+STREAM_OFFLOAD = getattr(settings, 'MEDIA_STREAM_OFFLOAD', None) # None | 'x-accel-redirect' | 'x-sendfile'
+STREAM_INTERNAL_URL = getattr(settings, 'MEDIA_STREAM_INTERNAL_URL', '/protected-media/')
+STREAM_CACHE_CONTROL = 'private, max-age=3600'
+
+RANGE_RE = re.compile(r'^\s*bytes=(\d*)-(\d*)\s*$')
+
+
+def parse_range_header(header, size):
+    """
+    Bitta oraliqli Range sarlavhasini (start, end) ga aylantiradi (end - inklyuziv).
+    Sarlavha yo'q yoki ko'p oraliqli bo'lsa None (butun fayl), qoniqtirib bo'lmasa False qaytaradi.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header)
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start: # bytes=-500 -> oxirgi 500 bayt
+        length = int(end)
+        if length == 0 or size == 0: # Bo'sh faylda qaytariladigan bayt yo'q (aks holda "bytes 0--1/0")
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _file_chunks(field_file, start, length):
+    with field_file.storage.open(field_file.name, 'rb') as file:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _offload_response(field_file, content_type, headers):
+    """Baytlarni front proksi yuboradi: Django faqat ruxsatni tekshiradi va ichki yo'naltirish sarlavhasini qo'yadi."""
+    response = HttpResponse(content_type=content_type)
+    if STREAM_OFFLOAD == 'x-sendfile':
+        response['X-Sendfile'] = field_file.path
+    else:
+        response['X-Accel-Redirect'] = STREAM_INTERNAL_URL.rstrip('/') + '/' + field_file.name.lstrip('/')
+    for key, value in headers.items():
+        response[key] = value
+    return response
+
+
+def ranged_file_response(request, field_file, content_type=None):
+    """
+    FileField faylini HTTP Range (206), ETag/Last-Modified va shartli so'rovlar (304) bilan
+    bo'lakma-bo'lak oqim sifatida qaytaradi. MEDIA_STREAM_OFFLOAD berilgan bo'lsa fayl proksi orqali yuboriladi.
+    """
+    storage = field_file.storage
+    size = storage.size(field_file.name)
+    modified = storage.get_modified_time(field_file.name)
+    last_modified = http_date(modified.timestamp())
+    etag = quote_etag(f"{size:x}-{int(modified.timestamp() * 1000):x}")
+    content_type = content_type or mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': last_modified,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': STREAM_CACHE_CONTROL,
+    }
+
+    if_none_match = request.headers.get('If-None-Match')
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    if (if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]) or \
+            (not if_none_match and if_modified_since and int(modified.timestamp()) <= if_modified_since):
+        response = HttpResponseNotModified()
+        for key in ('ETag', 'Last-Modified', 'Cache-Control'):
+            response[key] = headers[key]
+        return response
+
+    if STREAM_OFFLOAD:
+        return _offload_response(field_file, content_type, headers)
+
+    byte_range = parse_range_header(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range.strip() not in (etag, last_modified):
+        byte_range = None # Fayl o'zgargan: butun faylni qaytaramiz
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    response = StreamingHttpResponse(_file_chunks(field_file, start, length), content_type=content_type,
+                                     status=206 if byte_range else 200)
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    for key, value in headers.items():
+        response[key] = value
+    return response
@@ -1,3 +1,1848 @@
-from django.test import TestCase
+import csv
+import decimal
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase as DjangoTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .analytics import build_cohort_matrices, get_purchase_funnel, np
+from .counters import counter_buffer, flush_counters
+from .exports import openpyxl
+from .events import event_buffer, flush_events, log_event
+from .models import (
+    User, Subject, Test, Question, TestQuestion, Course, Lesson, CourseReview, UserCourseEnrollment, LessonProgress, EventLog,
+    ChunkedUpload, Material, MockTest, MockTestMaterial, Payment, TestStatistics, UserTestResult, UserRating, SearchDocument,
+    StoredBlob,
+)
+from .progress import flush_progress, progress_buffer
+from .search import normalize_search_text, search_terms
+from .storage import TMP_DIR
+from .facets import facet_signature
+from . import search, storage, thumbnails, uploads
+from .imaging import Image, pymupdf
+from .metadata import sniff_mime_type
+
+
+@override_settings(WRITE_BEHIND_BUFFERING=False)
+class TestCase(DjangoTestCase):
+    """
+    Write-behind buferlar o'chirilgan: hodisalar, pinglar va hisoblagichlar darhol, test tranzaksiyasi ichida yoziladi.
+    Buferli yo'lni tekshiradigan testlar override_settings(WRITE_BEHIND_BUFFERING=True) bilan yoqadi.
+    """
+
+
+class CourseListQueryCountTests(TestCase):
+    """Kurslar ro'yxati so'rovlar soni sahifadagi kurslar soniga bog'liq bo'lmasligi kerak."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            email='student@example.com', phone_number='+998901234567', full_name='Student', password='pass12345'
+        )
+        cls.subject = Subject.objects.create(name='Matematika')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def _create_courses(self, count, enroll=True):
+        for index in range(count):
+            course = Course.objects.create(
+                title=f'Kurs {Course.objects.count() + 1}', subject=self.subject, description='-', status='active'
+            )
+            if enroll:
+                UserCourseEnrollment.objects.create(user=self.student, course=course, progress=index * 10)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_course_list_query_count_is_constant(self):
+        self._create_courses(2)
+        small_count, _ = self._count_queries('/api/courses/')
+        self._create_courses(8)
+        large_count, response = self._count_queries('/api/courses/')
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_course_list_returns_user_progress(self):
+        self._create_courses(3)
+        _, response = self._count_queries('/api/courses/')
+        progress = sorted(item['user_progress'] for item in response.data['results'])
+        self.assertEqual(progress, [0.0, 10.0, 20.0])
+
+    def test_my_courses_query_count_is_constant(self):
+        self._create_courses(2)
+        small_count, _ = self._count_queries('/api/courses/my-courses/')
+        self._create_courses(8)
+        large_count, _ = self._count_queries('/api/courses/my-courses/')
+        self.assertEqual(small_count, large_count)
+
+    def test_course_detail_enrollment_status(self):
+        self._create_courses(1)
+        course = Course.objects.get()
+        _, response = self._count_queries(f'/api/courses/{course.pk}/')
+        self.assertTrue(response.data['enrollment_status']['is_enrolled'])
+
+    def test_course_detail_orders_lessons_and_limits_reviews(self):
+        self._create_courses(1)
+        course = Course.objects.get()
+        for order in (3, 1, 2):
+            Lesson.objects.create(course=course, title=f'Dars {order}', order=order)
+        reviewers = [
+            User.objects.create_user(
+                email=f'reviewer{index}@example.com', phone_number=f'+99890765432{index}', full_name='Student',
+                password='pass12345',
+            )
+            for index in range(Course.LATEST_REVIEWS_LIMIT + 2)
+        ]
+        CourseReview.objects.create(user=reviewers[0], course=course, rating=4, comment='Sharh 0')
+        small_count, _ = self._count_queries(f'/api/courses/{course.pk}/')
+        for index, reviewer in enumerate(reviewers[1:], start=1):
+            CourseReview.objects.create(user=reviewer, course=course, rating=5, comment=f'Sharh {index}')
+
+        large_count, response = self._count_queries(f'/api/courses/{course.pk}/')
+        self.assertEqual(small_count, large_count)
+        self.assertEqual([lesson['title'] for lesson in response.data['lessons']], ['Dars 1', 'Dars 2', 'Dars 3'])
+        self.assertEqual([review['comment'] for review in response.data['reviews']],
+                         [f'Sharh {index}' for index in range(len(reviewers) - 1, 1, -1)])
+
+
+class ListEndpointBudgetTests(TestCase):
+    """
+    Katalog ro'yxatlari uchun so'rov va qator byudjeti: so'rovlar soni o'zgarmas, faqat bitta sahifa qatorlari
+    o'qiladi, detail maydonlari (description) va bog'langan jadvallar (savollar, darslar, sharhlar) yuklanmaydi.
+    """
+    PAGE_SIZE = 20
+    # url -> (so'rovlar byudjeti, ro'yxatda o'qilmasligi kerak bo'lgan jadvallar)
+    BUDGETS = {
+        '/api/tests/': (2, ('users_testquestion', 'users_question')), # COUNT + sahifa
+        '/api/courses/': (3, ('users_lesson', 'users_coursereview')), # COUNT + sahifa + enrollment map
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            email='budget@example.com', phone_number='+998901234568', full_name='Student', password='pass12345'
+        )
+        cls.teacher = User.objects.create_user(
+            email='teacher@example.com', phone_number='+998901234569', full_name='Teacher', password='pass12345'
+        )
+        cls.subject = Subject.objects.create(name='Fizika')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def _create_catalog(self, count):
+        for _ in range(count):
+            number = Test.objects.count() + 1
+            test = Test.objects.create(title=f'Test {number}', subject=self.subject, description='-' * 500, status='active')
+            question = Question.objects.create(
+                question_text=f'Savol {number}', option_a='1', option_b='2', option_c='3', option_d='4', correct_answer='A'
+            )
+            TestQuestion.objects.create(test=test, question=question, order=1)
+            course = Course.objects.create(
+                title=f'Kurs {number}', subject=self.subject, teacher=self.teacher, description='-' * 500, status='active'
+            )
+            Lesson.objects.create(course=course, title='Dars', order=1)
+            CourseReview.objects.create(user=self.student, course=course, rating=5)
+
+    def _assert_within_budget(self, url):
+        query_budget, forbidden_tables = self.BUDGETS[url]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), query_budget, [q['sql'] for q in context.captured_queries])
+        for query in context.captured_queries:
+            sql = query['sql']
+            for table in forbidden_tables:
+                self.assertNotIn(f'"{table}"', sql)
+            self.assertNotIn('."description"', sql)
+        return response
+
+    def test_list_endpoints_stay_within_budget(self):
+        self._create_catalog(3)
+        for url in self.BUDGETS:
+            with self.subTest(url=url):
+                response = self._assert_within_budget(url)
+                self.assertEqual(len(response.data['results']), 3)
+
+    def test_list_rows_are_limited_to_one_page(self):
+        self._create_catalog(self.PAGE_SIZE + 5)
+        for url in self.BUDGETS:
+            with self.subTest(url=url):
+                response = self._assert_within_budget(url)
+                self.assertEqual(response.data['count'], self.PAGE_SIZE + 5)
+                self.assertEqual(len(response.data['results']), self.PAGE_SIZE)
+
+    def test_list_payload_is_unchanged_by_deferred_columns(self):
+        self._create_catalog(1)
+        test_item = self._assert_within_budget('/api/tests/').data['results'][0]
+        self.assertEqual(test_item['subject']['name'], 'Fizika')
+        self.assertEqual(test_item['question_count'], Test.objects.get().question_count)
+        course_item = self._assert_within_budget('/api/courses/').data['results'][0]
+        self.assertEqual(course_item['teacher']['full_name'], 'Teacher')
+        self.assertEqual(course_item['lessons_count'], Course.objects.get().lessons_count)
+
+
+class TestStatisticsTests(TestCase):
+    """Test statistikasi hisoblagichlari: baholash va to'lovda yangilanadi, rebuild buyrug'i bilan tiklanadi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='stats-admin@example.com', phone_number='+998901234570', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        cls.students = [
+            User.objects.create_user(
+                email=f'stats{index}@example.com', phone_number=f'+99890123457{index + 1}', full_name='Student',
+                password='pass12345', balance=10000,
+            )
+            for index in range(2)
+        ]
+        cls.test = Test.objects.create(
+            title='Pullik test', subject=Subject.objects.create(name='Adabiyot'), description='-', status='active',
+            test_type='premium', price=4000,
+        )
+        cls.questions = [create_question(cls.test, order) for order in range(1, 3)]
+
+    def setUp(self):
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+
+    def _submit(self, student, correct):
+        client = APIClient()
+        client.force_authenticate(student)
+        answers = {str(question.pk): 'A' if index < correct else 'B' for index, question in enumerate(self.questions)}
+        response = client.post(f'/api/tests/{self.test.pk}/submit/', {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return UserTestResult.objects.get(pk=response.json()['id'])
+
+    def _statistics(self):
+        response = self.admin_client.get(f'/api/admin/tests/{self.test.pk}/statistics/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counters_follow_grading_and_purchases(self):
+        self.assertEqual(self._statistics()['participants_count'], 0)
+        result = self._submit(self.students[0], correct=2)
+        self._submit(self.students[1], correct=1)
+        result.calculate_result({str(question.pk): 'A' for question in self.questions}) # Qayta hisoblash ikki marta sanalmaydi
+
+        with self.assertNumQueries(3): # test, uning savollari (queryset prefetch) va bitta statistika qatori - natijalar skanerlanmaydi
+            stats = self._statistics()
+        self.assertEqual(stats['participants_count'], 2)
+        self.assertEqual(stats['average_score'], 75.0)
+        self.assertEqual(stats['score_stddev'], 25.0)
+        self.assertEqual(stats['best_percentage'], 100.0)
+        self.assertEqual(stats['best_score'], 2)
+        self.assertEqual(decimal.Decimal(str(stats['total_income'])), 8000)
+
+    def test_rebuild_command_fixes_drift(self):
+        self._submit(self.students[0], correct=1)
+        expected = self._statistics()
+        TestStatistics.objects.filter(test=self.test).update(completed_count=7, percentage_sum=0, income_sum=0)
+        call_command('rebuild_test_statistics', test_ids=[self.test.pk], stdout=io.StringIO())
+        self.assertEqual(self._statistics(), expected)
+
+
+def read_csv_export(test_case, client, url):
+    response = client.get(url)
+    test_case.assertEqual(response.status_code, 200)
+    test_case.assertTrue(response.streaming) # StreamingHttpResponse: butun fayl xotirada yig'ilmaydi
+    content = b''.join(response.streaming_content).decode('utf-8').lstrip('\ufeff')
+    return list(csv.reader(io.StringIO(content)))
+
+
+class TestResultExportTests(TestCase):
+    """Test natijalari eksporti: oqimli CSV, XLSX, javob ustunlari va filterlar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='export-admin@example.com', phone_number='+998901234560', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        cls.student = User.objects.create_user(
+            email='export@example.com', phone_number='+998901234561', full_name='Ali Valiyev', password='pass12345',
+        )
+        cls.test = Test.objects.create(title='Test', subject=Subject.objects.create(name='Ingliz tili'), description='-', status='active')
+        cls.questions = [create_question(cls.test, order) for order in range(1, 3)]
+        cls.result = UserTestResult.objects.create(user=cls.student, test=cls.test, status='in_progress')
+        cls.result.calculate_result({str(cls.questions[0].pk): 'A', str(cls.questions[1].pk): 'C'})
+        UserTestResult.objects.create(user=cls.student, test=cls.test, status='in_progress')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _csv(self, url):
+        return read_csv_export(self, self.client, url)
+
+    def test_results_csv_with_answers(self):
+        rows = self._csv(f'/api/admin/tests/{self.test.pk}/export/?answers=1&status=completed')
+        self.assertEqual(rows[0][-2:], ['Q1', 'Q2'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], str(self.result.pk))
+        self.assertEqual(rows[1][1], 'Ali Valiyev')
+        self.assertEqual(rows[1][-2:], ['A', 'C'])
+        self.assertEqual(len(self._csv(f'/api/admin/tests/{self.test.pk}/export/')), 3)
+
+    def test_results_export_rejects_invalid_parameters(self):
+        url = f'/api/admin/tests/{self.test.pk}/export/'
+        self.assertEqual(self.client.get(f'{url}?status=unknown').status_code, 400)
+        self.assertEqual(self.client.get(f'{url}?file_format=pdf').status_code, 400)
+        student_client = APIClient()
+        student_client.force_authenticate(self.student)
+        self.assertEqual(student_client.get(url).status_code, 403)
+
+    @skipIf(openpyxl is None, "openpyxl o'rnatilmagan")
+    def test_results_xlsx(self):
+        response = self.client.get(f'/api/admin/tests/{self.test.pk}/export/?file_format=xlsx&answers=1&status=completed')
+        self.assertEqual(response.status_code, 200)
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][-2:], ('Q1', 'Q2'))
+        self.assertEqual(rows[1][0], self.result.pk)
+        self.assertEqual(rows[1][-2:], ('A', 'C'))
+
+
+class PaymentLedgerExportTests(TestCase):
+    """To'lovlar reestri eksporti: sana oralig'i, filterlar va turlar bo'yicha jami summalar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='ledger-admin@example.com', phone_number='+998901234562', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        cls.student = User.objects.create_user(
+            email='ledger@example.com', phone_number='+998901234563', full_name='Student', password='pass12345',
+        )
+        payments = [
+            ('deposit', 'successful', 'click', 50000, datetime(2026, 3, 1, 0, 30)),
+            ('deposit', 'successful', 'payme', 20000, datetime(2026, 3, 31, 23, 50)),
+            ('test_purchase', 'successful', 'internal', -5000, datetime(2026, 3, 10, 12)),
+            ('deposit', 'failed', 'click', 70000, datetime(2026, 3, 12, 12)),
+            ('deposit', 'successful', 'click', 10000, datetime(2026, 4, 1, 0, 10)),
+        ]
+        for index, (payment_type, status, method, amount, created_at) in enumerate(payments):
+            payment = Payment.objects.create(
+                user=cls.student, amount=amount, payment_type=payment_type, status=status, payment_method=method,
+                transaction_id=f'tx-{index}',
+            )
+            Payment.objects.filter(pk=payment.pk).update(created_at=timezone.make_aware(created_at))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _csv(self, url):
+        return read_csv_export(self, self.client, url)
+
+    def test_payment_ledger_filters_and_totals(self):
+        rows = self._csv('/api/admin/payments/export/?date_from=2026-03-01&date_to=2026-03-31&status=successful')
+        self.assertEqual([row[-2] for row in rows[1:4]], ['tx-0', 'tx-2', 'tx-1']) # created_at bo'yicha, chegaralar kiradi
+        self.assertEqual(rows[4], [])
+        totals = {row[0]: (row[1], decimal.Decimal(row[2])) for row in rows[6:]}
+        self.assertEqual(totals, {
+            "Hisobni to'ldirish": ('2', 70000),
+            'Test sotib olish': ('1', -5000),
+            'Jami': ('3', 65000),
+        })
+
+    def test_payment_ledger_rejects_invalid_dates(self):
+        for value in ('2026-13-01', '01.03.2026'):
+            with self.subTest(value=value):
+                self.assertEqual(self.client.get(f'/api/admin/payments/export/?date_from={value}').status_code, 400)
+
+
+@skipIf(np is None, "numpy o'rnatilmagan")
+class CohortAnalyticsTests(TestCase):
+    """Kogorta retention/konversiya matritsalari va keshlangan admin endpointi."""
+
+    def test_matrices(self):
+        m = 2026 * 12 # 2026-01
+        users = np.array([(1, m), (2, m), (3, m + 1)])
+        activity = np.array([(1, m), (1, m + 1), (2, m + 1), (3, m + 1), (99, m)]) # 99 - student emas
+        payments = np.array([(2, m + 1), (3, m - 2)]) # Qo'shilishdan oldingi to'lov 0-oyga tushadi
+        january, february = build_cohort_matrices(users, activity, payments, months=3, current_month=m + 1)
+
+        self.assertEqual((january['cohort'], january['size']), ('2026-01', 2))
+        self.assertEqual(january['retention_counts'], [1, 2, 0])
+        self.assertEqual(january['retention'], [50.0, 100.0, None])
+        self.assertEqual(january['conversion_counts'], [0, 1, 1])
+        self.assertEqual(january['conversion'], [0.0, 50.0, None])
+        self.assertEqual((february['cohort'], february['size']), ('2026-02', 1))
+        self.assertEqual(february['retention'], [100.0, None, None])
+        self.assertEqual(february['conversion'], [100.0, None, None])
+        self.assertEqual(build_cohort_matrices(np.empty((0, 2)), np.empty((0, 2)), np.empty((0, 2)), 3, m), [])
+
+    def test_endpoint_is_cached(self):
+        cache.clear()
+        admin = User.objects.create_user(
+            email='cohort-admin@example.com', phone_number='+998901234564', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        student = User.objects.create_user(
+            email='cohort@example.com', phone_number='+998901234565', full_name='Student', password='pass12345',
+        )
+        test = Test.objects.create(title='Test', subject=Subject.objects.create(name='Huquq'), description='-', status='active')
+        UserTestResult.objects.create(user=student, test=test, status='in_progress')
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = '/api/admin/statistics/cohorts/?months=2'
+
+        with self.assertNumQueries(3): # studentlar, faollik va to'lovlar massivlari
+            cohorts = client.get(url).json()['cohorts']
+        self.assertEqual([(row['cohort'], row['size'], row['retention'][0]) for row in cohorts],
+                         [(timezone.localtime().strftime('%Y-%m'), 1, 100.0)])
+
+        User.objects.create_user(
+            email='cohort2@example.com', phone_number='+998901234566', full_name='Student', password='pass12345',
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(url).json()['cohorts'][0]['size'], 1)
+        self.assertEqual(client.get(f'{url}&refresh=1').json()['cohorts'][0]['size'], 2)
+        self.assertEqual(client.get('/api/admin/statistics/cohorts/?months=x').status_code, 400)
+
+
+class EventLogTests(TestCase):
+    """Hodisalar jurnali: faqat commit bo'lgan tranzaksiya hodisalari yoziladi, xato bo'lsa yo'qolmaydi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='events@example.com', phone_number='+998901234570', full_name='Student', password='pass12345'
+        )
+        cls.test = Test.objects.create(title='Test', subject=Subject.objects.create(name='Tarix'), description='-')
+
+    def test_log_event_writes_synchronously_when_buffering_is_disabled(self):
+        log_event('test_viewed', user=self.user, test=self.test)
+        event = EventLog.objects.get()
+        self.assertEqual((event.event_type, event.user_id, event.test_id), ('test_viewed', self.user.pk, self.test.pk))
+        self.assertEqual(event.day, timezone.localdate(event.created_at))
+        self.assertEqual(event_buffer.snapshot(), {})
+
+    @override_settings(WRITE_BEHIND_BUFFERING=True)
+    def test_buffered_event_is_queued_on_commit_and_flushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            log_event('test_viewed', user=self.user, test=self.test)
+            self.assertEqual(event_buffer.snapshot(), {}) # commit gacha buferga tushmaydi
+        self.assertEqual(len(event_buffer.snapshot()), 1)
+        self.assertFalse(EventLog.objects.exists())
+        self.assertEqual(flush_events(), 1)
+        self.assertEqual(EventLog.objects.get().test_id, self.test.pk)
+
+    @override_settings(WRITE_BEHIND_BUFFERING=True)
+    def test_events_of_rolled_back_transaction_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                log_event('purchase_attempted', user=self.user, test=self.test)
+                raise RuntimeError
+        self.assertEqual(event_buffer.snapshot(), {})
+        self.assertEqual(flush_events(), 0)
+        self.assertFalse(EventLog.objects.exists())
+
+    @override_settings(WRITE_BEHIND_BUFFERING=True)
+    def test_failed_flush_keeps_events_for_retry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            log_event('submitted', user=self.user, test=self.test)
+        with mock.patch.object(event_buffer, 'write', side_effect=RuntimeError), self.assertLogs('users.buffers', 'ERROR'):
+            self.assertEqual(flush_events(), 0)
+        self.assertEqual(len(event_buffer.snapshot()), 1)
+        self.assertEqual(flush_events(), 1)
+        self.assertEqual(EventLog.objects.filter(event_type='submitted').count(), 1)
+
+
+class PurchaseFunnelTests(TestCase):
+    """Voronka bosqichlari takrorlanmas foydalanuvchilar bo'yicha hisoblanadi."""
+
+    def setUp(self):
+        self.test = Test.objects.create(title='Test', subject=Subject.objects.create(name='Tarix'), description='-')
+        self.users = [
+            User.objects.create_user(
+                email=f'funnel{index}@example.com', phone_number=f'+99890123460{index}', full_name='Student', password='pass12345'
+            )
+            for index in range(3)
+        ]
+
+    def test_funnel_stages_and_drop_off(self):
+        first, second, third = self.users
+        for user in self.users:
+            log_event('test_viewed', user=user, test=self.test)
+        log_event('test_viewed', user=first, test=self.test) # takroriy ko'rish foydalanuvchilar sonini oshirmaydi
+        for user in (first, second):
+            log_event('purchase_attempted', user=user, test=self.test)
+        log_event('submitted', user=first, test=self.test)
+        log_event('insufficient_funds', user=second, test=self.test)
+        log_event('insufficient_funds', user=first, test=self.test) # keyin topshirgan - voz kechmagan
+        log_event('test_viewed', user=third) # boshqa test filtri bilan hisobga olinmaydi
+
+        today = timezone.localdate()
+        funnel = get_purchase_funnel(today, today, test_id=self.test.pk)
+        stages = {stage['stage']: stage for stage in funnel['stages']}
+        self.assertEqual([stage['users'] for stage in funnel['stages']], [3, 2, 1])
+        self.assertEqual(stages['test_viewed']['events'], 4)
+        self.assertIsNone(stages['test_viewed']['rate_from_previous'])
+        self.assertEqual(stages['purchase_attempted']['rate_from_previous'], 66.67)
+        self.assertEqual(stages['submitted']['rate_from_previous'], 50.0)
+        self.assertEqual(funnel['insufficient_funds'], {'events': 2, 'users': 2})
+        self.assertEqual(funnel['gave_up_users'], 1)
+        self.assertEqual(len(funnel['daily']), 1)
+        self.assertEqual(funnel['daily'][0]['submitted'], {'events': 1, 'users': 1})
+
+    def test_funnel_outside_date_range_is_empty(self):
+        log_event('test_viewed', user=self.users[0], test=self.test)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        funnel = get_purchase_funnel(yesterday, yesterday)
+        self.assertEqual([stage['users'] for stage in funnel['stages']], [0, 0, 0])
+        self.assertEqual(funnel['daily'], [])
+
+
+class LessonProgressTests(TestCase):
+    """Video pinglari birlashtirib yoziladi, dars tugatish progressni hisoblagichlardan yangilaydi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            email='progress@example.com', phone_number='+998901234571', full_name='Student', password='pass12345'
+        )
+        cls.course = Course.objects.create(title='Kurs', subject=Subject.objects.create(name='Ingliz tili'), description='-', status='active')
+        cls.lessons = [Lesson.objects.create(course=cls.course, title=f'Dars {order}', order=order) for order in range(1, 4)]
+        cls.course.update_lessons_count()
+        cls.enrollment = UserCourseEnrollment.objects.create(user=cls.student, course=cls.course)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = f'/api/courses/{self.course.pk}/progress/'
+        patcher = mock.patch.object(progress_buffer, 'flush_interval', 60 * 60) # So'rov oxiridagi flush ishlamasin
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, lesson, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'lesson_id': lesson.pk, **data}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def _lessons(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return {record['lesson']: record for record in response.data['lessons']}
+
+    @override_settings(WRITE_BEHIND_BUFFERING=True)
+    def test_pings_are_coalesced_and_flushed_in_one_batch(self):
+        first, second, _ = self.lessons
+        for position in (10, 20, 30):
+            self._post(first, position_seconds=position)
+        self._post(second, position_seconds=5)
+        self.assertFalse(LessonProgress.objects.exists())
+        self.assertEqual(len(progress_buffer.snapshot()), 2)
+        self.assertEqual(self._lessons()[first.pk]['position_seconds'], 30)
+
+        self.assertEqual(flush_progress(), 2)
+        positions = dict(LessonProgress.objects.values_list('lesson_id', 'position_seconds'))
+        self.assertEqual(positions, {first.pk: 30, second.pk: 5})
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.last_accessed_lesson_id, second.pk)
+
+    @override_settings(WRITE_BEHIND_BUFFERING=True)
+    def test_pending_position_is_visible_from_another_worker(self):
+        first = self.lessons[0]
+        self._post(first, position_seconds=42)
+        progress_buffer.discard((self.enrollment.pk, first.pk)) # Ping boshqa jarayon buferida qolgan
+        self.assertEqual(self._lessons()[first.pk]['position_seconds'], 42)
+
+    @override_settings(WRITE_BEHIND_BUFFERING=True)
+    def test_flushed_position_is_no_longer_overlaid_from_cache(self):
+        first, second, _ = self.lessons
+        self._post(first, position_seconds=42)
+        self._post(second, position_seconds=7)
+        with self.captureOnCommitCallbacks(execute=True):
+            flush_progress()
+        LessonProgress.objects.filter(enrollment=self.enrollment, lesson=first).update(position_seconds=50)
+        self.assertEqual(self._lessons()[first.pk]['position_seconds'], 50)
+        self.assertIsNone(cache.get(f'progress:pending:{self.enrollment.pk}:{first.pk}'))
+
+    @override_settings(WRITE_BEHIND_BUFFERING=True)
+    def test_completing_lesson_drops_pending_ping(self):
+        first = self.lessons[0]
+        self._post(first, position_seconds=15)
+        self._post(first, position_seconds=90, completed=True)
+        self.assertEqual(progress_buffer.snapshot(), {})
+        record = self._lessons()[first.pk]
+        self.assertTrue(record['completed'])
+        self.assertEqual(record['position_seconds'], 90)
+
+    def test_complete_lesson_updates_progress_from_counters(self):
+        first, second, third = self.lessons
+        self.assertTrue(self.enrollment.complete_lesson(first, position_seconds=100))
+        self.assertAlmostEqual(self.enrollment.progress, 100 / 3, places=2)
+        self.assertFalse(self.enrollment.complete_lesson(first)) # Takroriy tugatish hisoblanmaydi
+        self.assertEqual(self.enrollment.completed_lessons_count, 1)
+
+        self.enrollment.complete_lesson(second)
+        self.assertIsNone(self.enrollment.completed_at)
+        response = self._post(third, completed=True)
+        self.assertEqual(response.data['completed_lessons_count'], 3)
+        self.assertEqual(response.data['progress'], 100.0)
+        self.enrollment.refresh_from_db()
+        self.assertIsNotNone(self.enrollment.completed_at)
+        self.assertEqual(self.enrollment.last_accessed_lesson_id, third.pk)
+
+
+class CounterTests(TestCase):
+    """Statistika va daromad F() bilan darhol yoziladi, faqat yuklab olishlar soni buferlanadi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Kimyo')
+        cls.test = Test.objects.create(title='Test', subject=cls.subject, description='-')
+        cls.material = Material.objects.create(title='Kitob', subject=cls.subject, file_format='link', link='https://example.com')
+
+    def test_record_result_updates_counters_atomically(self):
+        TestStatistics.record_result(self.test.pk, 80, 8)
+        with self.assertNumQueries(1): # Qator mavjud bo'lsa bitta UPDATE
+            TestStatistics.record_result(self.test.pk, 60, 9)
+        TestStatistics.record_income(self.test.pk, decimal.Decimal('-5000.00'))
+        stats = TestStatistics.objects.get(pk=self.test.pk)
+        self.assertEqual(stats.completed_count, 2)
+        self.assertEqual(stats.average_percentage, 70)
+        self.assertEqual(stats.percentage_stddev, 10)
+        self.assertEqual((stats.best_percentage, stats.best_score), (80, 9))
+        self.assertEqual(stats.income_sum, decimal.Decimal('-5000.00'))
+
+    def test_rebuild_recomputes_from_results(self):
+        user = User.objects.create_user(
+            email='stats@example.com', phone_number='+998901234572', full_name='Student', password='pass12345'
+        )
+        for percentage, score in ((50, 5), (100, 10)):
+            UserTestResult.objects.create(user=user, test=self.test, status='completed', percentage=percentage, score=score)
+        TestStatistics.objects.create(test=self.test, completed_count=7)
+        self.assertEqual(TestStatistics.rebuild([self.test.pk]), 1)
+        stats = TestStatistics.objects.get(pk=self.test.pk)
+        self.assertEqual((stats.completed_count, stats.percentage_sum, stats.best_score), (2, 150, 10))
+
+    @override_settings(WRITE_BEHIND_BUFFERING=True)
+    def test_download_counts_are_buffered_and_merged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                self.material.increment_download_count()
+        self.assertEqual(self.material.get_downloads_count(), 3)
+        self.assertEqual(Material.objects.get(pk=self.material.pk).downloads_count, 0)
+        with self.assertNumQueries(3): # SAVEPOINT + bitta UPDATE + RELEASE
+            self.assertEqual(flush_counters(), 1)
+        self.assertEqual(counter_buffer.snapshot(), {})
+        self.assertEqual(Material.objects.get(pk=self.material.pk).downloads_count, 3)
+
+    def test_download_count_is_written_synchronously_without_buffering(self):
+        self.material.increment_download_count()
+        self.assertEqual(Material.objects.get(pk=self.material.pk).downloads_count, 1)
+
+
+class SearchTests(TestCase):
+    """To'liq matnli indeks: normalizatsiya, prefiks qidiruv, view filtrlari bilan birga ishlash va sinxronlash."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Fizika')
+        cls.other_subject = Subject.objects.create(name='Tarix')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _test(self, title, **fields):
+        fields = {'subject': self.subject, 'description': '-', 'status': 'active', **fields}
+        return Test.objects.create(title=title, **fields)
+
+    def _search(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_normalize_search_text_unifies_uzbek_spellings(self):
+        for spelling in ("O'zbek tili", 'Oʻzbek tili', 'O‘zbek tili', 'Ozbek  TILI', 'Ўзбек тили'):
+            with self.subTest(spelling=spelling):
+                self.assertEqual(normalize_search_text(spelling), 'ozbek tili')
+        self.assertEqual(normalize_search_text("G'alaba"), 'galaba')
+        self.assertEqual(search_terms("  qo'shma   gap! "), ['qoshma', 'gap'])
+
+    def test_prefix_search_across_spellings(self):
+        test = self._test("O'zbek tili: qo'shma gaplar")
+        self._test('Boshqa test')
+        for query in ('ozb', 'oʻzbek', 'ўзбек', "qo'shma gap"):
+            with self.subTest(query=query):
+                self.assertEqual(self._search(f'/api/tests/?search={query}'), [test.pk])
+
+    def test_title_matches_rank_first(self):
+        in_body = self._test('Mexanika', description='Kinematika masalalari')
+        in_title = self._test('Kinematika')
+        self.assertEqual(self._search('/api/tests/?search=kinematika'), [in_title.pk, in_body.pk])
+
+    def test_search_is_combined_with_view_filters_in_sql(self):
+        hard = [self._test(f'Fizika {index}', difficulty='qiyin') for index in range(3)]
+        self._test('Fizika oson', difficulty='oson')
+        self._test('Kimyo', subject=self.other_subject, difficulty='qiyin')
+        with self.assertNumQueries(2): # COUNT + sahifa, id ro'yxati alohida o'qilmaydi
+            ids = self._search('/api/tests/?search=fizika&difficulty=qiyin')
+        self.assertEqual(sorted(ids), [test.pk for test in hard])
+
+    def test_ranking_joins_the_index_once_instead_of_matching_per_row(self):
+        Test.objects.bulk_create([
+            Test(title=f'Dinamika {index}', subject=self.subject, description='dinamika ' * (index % 3), status='active')
+            for index in range(60)
+        ])
+        search.rebuild_search_index()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tests/?search=dinamika')
+        self.assertEqual(response.data['count'], 60)
+        self.assertEqual(len(queries.captured_queries), 2)
+        for query in queries.captured_queries:
+            self.assertEqual(query['sql'].count(' MATCH ') + query['sql'].count(' @@ '), 1)
+
+    def test_leaderboard_search_keeps_rank_order_and_region_filter(self):
+        for index, region in enumerate(('Toshkent', 'Toshkent', 'Samarqand')):
+            user = User.objects.create_user(
+                email=f'leader{index}@example.com', phone_number=f'+99890123461{index}', full_name=f'Ali Valiyev {index}',
+                password='pass12345', region=region,
+            )
+            UserRating.objects.update_or_create(user=user, defaults={'rank': 3 - index})
+        response = self.client.get('/api/leaderboard/?search=ali&user__region=Toshkent')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['rank'] for item in response.data['results']], [2, 3])
+
+    def test_index_follows_save_and_delete(self):
+        test = self._test('Optika')
+        self.assertEqual(self._search('/api/tests/?search=optika'), [test.pk])
+        test.title = 'Elektr'
+        test.save()
+        self.assertEqual(self._search('/api/tests/?search=optika'), [])
+        self.assertEqual(self._search('/api/tests/?search=elektr'), [test.pk])
+        test.status = 'draft'
+        test.save()
+        self.assertFalse(SearchDocument.objects.filter(kind='test', object_id=test.pk).exists())
+        test.status = 'active'
+        test.save()
+        test.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind='test').exists())
+
+    def test_subject_rename_reindexes_dependents_only_when_name_changes(self):
+        test = self._test('Savollar', subject=self.other_subject)
+        with mock.patch.object(search, '_reindex_dependents') as reindex, self.captureOnCommitCallbacks(execute=True):
+            self.other_subject.save()
+        reindex.assert_not_called()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_subject.name = 'Jahon tarixi'
+            self.other_subject.save()
+        self.assertEqual(self._search('/api/tests/?search=jahon'), [test.pk])
+
+
+class UnifiedSearchTests(TestCase):
+    """/api/search/: barcha kataloglar bitta so'rovda, turlar bo'yicha guruhlangan natijalar va jami sonlar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        subject = Subject.objects.create(name='Geometriya')
+        cls.tests = [Test.objects.create(title=f'Algebra {index}', subject=subject, description='-', status='active')
+                     for index in range(3)]
+        Test.objects.create(title='Algebra qoralama', subject=subject, description='-') # draft - qidirilmaydi
+        cls.course = Course.objects.create(title='Algebra kursi', subject=subject, description='-', status='active')
+        Material.objects.create(title='Algebra kitobi', subject=subject, status='active', file_format='link', link='https://example.com')
+        MockTest.objects.create(title='Algebra mock', status='active', available_from=timezone.localdate() + timedelta(days=3))
+
+    def _search(self, query, **params):
+        response = APIClient().get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _assert_grouped(self, data):
+        self.assertEqual(data['counts'], {'test': 3, 'course': 1, 'material': 1, 'mock_test': 0})
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(len(data['results']['test']), 2)
+        self.assertEqual(data['results']['course'], [{'id': self.course.pk, 'type': 'course', 'title': 'Algebra kursi'}])
+
+    def test_grouped_results_in_one_query(self):
+        search.search_backend() # FTS5 jadvali borligi jarayon uchun bir marta tekshiriladi
+        with self.assertNumQueries(1):
+            data = self._search('algeb', limit=2)
+        self._assert_grouped(data)
+
+    def test_like_fallback_matches_index(self):
+        with mock.patch('users.search.search_backend', return_value='like'):
+            self._assert_grouped(self._search('algeb', limit=2))
+
+    def test_types_and_short_queries(self):
+        data = self._search('algebra', types='course,material')
+        self.assertEqual(set(data['results']), {'course', 'material'})
+        self.assertEqual(data['total'], 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._search('a')['total'], 0)
+        self.assertEqual(APIClient().get('/api/search/', {'q': 'algebra', 'types': 'user'}).status_code, 400)
+        self.assertEqual(APIClient().get('/api/search/', {'q': 'algebra', 'limit': 'x'}).status_code, 400)
+
+
+def create_question(test, order, text=None, correct_answer='A'):
+    question = Question.objects.create(
+        question_text=text or f'Savol {order}', option_a='1', option_b='2', option_c='3', option_d='4',
+        correct_answer=correct_answer, subject=test.subject,
+    )
+    TestQuestion.objects.create(test=test, question=question, order=order)
+    return question
+
+
+class TestPayloadCacheTests(TestCase):
+    """Test javobi versiya bo'yicha keshlanadi: ETag/304 va savollar o'zgarganda eskirgan javob qaytmasligi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='payload-admin@example.com', phone_number='+998901234580', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        cls.test = Test.objects.create(title='Test', subject=Subject.objects.create(name='Biologiya'), description='-', status='active')
+        cls.questions = [create_question(cls.test, order) for order in range(1, 4)]
+        Test.objects.filter(pk=cls.test.pk).update(question_count=3)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+        self.url = f'/api/tests/{self.test.pk}/'
+        self.questions_url = f'/api/admin/tests/{self.test.pk}/questions/'
+
+    def _get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        self.assertIn(response.status_code, (200, 304))
+        return response
+
+    def _question_texts(self):
+        return [question['question_text'] for question in self._get().json()['questions']]
+
+    def test_etag_and_not_modified(self):
+        response = self._get()
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        with self.assertNumQueries(2): # Keshdan: faqat test (versiya uchun) + test_viewed hodisasi (testlarda bufersiz)
+            self.assertEqual(self._get().content, response.content)
+        for value in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(value=value):
+                not_modified = self._get(if_none_match=value)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified['ETag'], etag)
+        self.assertEqual(self._get(if_none_match='"other"').status_code, 200)
+
+    def test_save_bumps_version_atomically(self):
+        stale = Test.objects.get(pk=self.test.pk)
+        version = stale.content_version
+        Test.bump_content_version([self.test.pk])
+        stale.title = 'Yangi nom'
+        stale.save()
+        self.assertEqual(stale.content_version, version + 2)
+        self.assertEqual(Test.objects.get(pk=self.test.pk).content_version, version + 2)
+        stale.save(update_fields=['title'])
+        self.assertEqual(stale.content_version, version + 2)
+
+    def _assert_invalidated(self, change):
+        etag = self._get()['ETag']
+        change()
+        response = self._get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_question_edit_invalidates_payload(self):
+        question = self.questions[0]
+        self._assert_invalidated(lambda: self.admin_client.patch(
+            f'{self.questions_url}{question.pk}/', {'question_text': 'Tahrirlangan savol'}, format='json'))
+        self.assertEqual(self._question_texts()[0], 'Tahrirlangan savol')
+
+    def test_reorder_invalidates_payload(self):
+        ids = [question.pk for question in reversed(self.questions)]
+        self._assert_invalidated(lambda: self.admin_client.post(f'{self.questions_url}reorder/', {'ids': ids}, format='json'))
+        self.assertEqual(self._question_texts(), ['Savol 3', 'Savol 2', 'Savol 1'])
+
+    def test_import_invalidates_payload(self):
+        upload = SimpleUploadedFile(
+            'savollar.csv', 'question_text,option_a,option_b,option_c,option_d,correct_answer\nYangi savol,1,2,3,4,B\n'.encode()
+        )
+        self._assert_invalidated(lambda: self.admin_client.post(f'{self.questions_url}import/', {'file': upload}))
+        self.assertEqual(self._question_texts()[-1], 'Yangi savol')
+
+    def test_delete_invalidates_payload(self):
+        question = self.questions[1]
+        self._assert_invalidated(lambda: self.admin_client.delete(f'{self.questions_url}{question.pk}/'))
+        self.assertEqual(self._question_texts(), ['Savol 1', 'Savol 3'])
+
+
+class QuestionImportTests(TestCase):
+    """Savollarni CSV/XLSX/JSON dan ommaviy import: oldindan tekshiruv, qator xatolari, dry run va buyruq."""
+
+    HEADER = 'savol,a,b,c,d,javob,ball\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='import-admin@example.com', phone_number='+998901234550', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        cls.test = Test.objects.create(title='Test', subject=Subject.objects.create(name='Iqtisod'), description='-', status='active')
+        create_question(cls.test, 1, text='Mavjud savol')
+        Test.objects.filter(pk=cls.test.pk).update(question_count=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/api/admin/tests/{self.test.pk}/questions/import/'
+
+    def _csv(self, count, start=1):
+        rows = ''.join(f'Savol {number},1,2,3,4,b,2\n' for number in range(start, start + count))
+        return SimpleUploadedFile('savollar.csv', (self.HEADER + rows).encode())
+
+    def _linked(self):
+        return list(TestQuestion.objects.filter(test=self.test).order_by('order')
+                    .values_list('question__question_text', 'order', 'question__correct_answer', 'question__points'))
+
+    def test_csv_import_appends_in_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(self.url, {'file': self._csv(2)})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['created'], response.json()['question_count']), (2, 3))
+        self.assertEqual(self._linked(), [('Mavjud savol', 1, 'A', 1), ('Savol 1', 2, 'B', 2), ('Savol 2', 3, 'B', 2)])
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(self.url, {'file': self._csv(30, start=3)})
+        self.assertEqual(response.json()['question_count'], 33)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_dry_run_saves_nothing(self):
+        response = self.client.post(self.url, {'file': self._csv(3), 'dry_run': '1'})
+        self.assertEqual((response.status_code, response.json()['valid'], response.json()['created']), (200, 3, 0))
+        self.assertEqual(len(self._linked()), 1)
+
+    def test_row_errors_reject_whole_file(self):
+        content = self.HEADER + 'Yaxshi savol,1,2,3,4,A,1\nYomon javob,1,2,3,4,E,1\n\nVariantsiz,1,,3,4,A,1\n'
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('savollar.csv', content.encode())})
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([error['row'] for error in errors], [3, 5]) # Bo'sh qator tashlanadi, raqamlash fayl bo'yicha
+        self.assertIn('correct_answer', errors[0]['errors'])
+        self.assertIn('option_b', errors[1]['errors'])
+        self.assertEqual(len(self._linked()), 1)
+
+    def test_invalid_files(self):
+        for upload in (SimpleUploadedFile('savollar.txt', b'x'), SimpleUploadedFile('savollar.csv', b'a,b\n1,2\n'),
+                       SimpleUploadedFile('savollar.json', b'{"savollar": 1}')):
+            with self.subTest(name=upload.name):
+                self.assertIn('file', self.client.post(self.url, {'file': upload}).json())
+
+    def test_json_import(self):
+        payload = {'questions': [{'question': 'JSON savol', 'a': '1', 'b': '2', 'c': '3', 'd': '4', 'answer': 'd'}]}
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('savollar.json', json.dumps(payload).encode())})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._linked()[-1], ('JSON savol', 2, 'D', 1))
+
+    @skipIf(openpyxl is None, "openpyxl o'rnatilmagan")
+    def test_xlsx_import(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['Savol', 'A', 'B', 'C', 'D', 'Javob', 'Ball'])
+        workbook.active.append(['XLSX savol', 1, 2, 3, 4, 'C', 3.0])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('savollar.xlsx', buffer.getvalue())})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._linked()[-1], ('XLSX savol', 2, 'C', 3))
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as file:
+            file.write(self._csv(2).read())
+        self.addCleanup(os.remove, file.name)
+        call_command('import_questions', self.test.pk, file.name, '--dry-run', stdout=io.StringIO())
+        self.assertEqual(len(self._linked()), 1)
+        call_command('import_questions', self.test.pk, file.name, stdout=io.StringIO())
+        self.assertEqual(len(self._linked()), 3)
+
+
+class QuestionBankTests(TestCase):
+    """Savollar umumiy bankda: kontent xeshi bo'yicha qayta ishlatish, copy-on-write tahrir va faqat bog'lanishni o'chirish."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='bank-admin@example.com', phone_number='+998901234551', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        subject = Subject.objects.create(name='Informatika')
+        cls.first, cls.second = [
+            Test.objects.create(title=title, subject=subject, description='-', status='active') for title in ('A', 'B')
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _url(self, test, suffix=''):
+        return f'/api/admin/tests/{test.pk}/questions/{suffix}'
+
+    def _create(self, test, text='Umumiy savol'):
+        return self.client.post(self._url(test), {
+            'question_text': text, 'option_a': '1', 'option_b': '2', 'option_c': '3', 'option_d': '4', 'correct_answer': 'A',
+        }, format='json')
+
+    def _texts(self, test):
+        return list(test.question_links.order_by('order').values_list('question__question_text', flat=True))
+
+    def test_content_hash_is_normalized(self):
+        content = {'question_text': 'Savol  matni', 'option_a': '1', 'option_b': '2', 'option_c': '3', 'option_d': '4',
+                   'correct_answer': 'A'}
+        variant = dict(content, question_text=' Savol\tmatni ', option_a='\uff11', correct_answer='a') # Fullwidth "1"
+        self.assertEqual(Question.compute_content_hash(content), Question.compute_content_hash(variant))
+        self.assertNotEqual(Question.compute_content_hash(content), Question.compute_content_hash(dict(content, option_d='5')))
+
+    def test_same_content_reuses_bank_question(self):
+        first_id = self._create(self.first).json()['id']
+        self.assertEqual(self._create(self.second).json()['id'], first_id)
+        self.assertEqual(Question.objects.count(), 1)
+        self.assertEqual(self._create(self.second).status_code, 400) # Testda allaqachon bor
+
+        upload = 'savol,a,b,c,d,javob\nUmumiy savol,1,2,3,4,A\nYangi savol,1,2,3,4,B\nYangi savol,1,2,3,4,B\n'
+        response = self.client.post(self._url(self.first, 'import/'), {'file': SimpleUploadedFile('s.csv', upload.encode())})
+        self.assertEqual((response.json()['created'], response.json()['reused'], response.json()['skipped']), (1, 0, 2))
+        response = self.client.post(self._url(self.second, 'import/'), {'file': SimpleUploadedFile('s.csv', upload.encode())})
+        self.assertEqual((response.json()['created'], response.json()['reused'], response.json()['skipped']), (1, 1, 2))
+        self.assertEqual(Question.objects.count(), 2)
+
+    def test_editing_shared_question_is_copy_on_write(self):
+        question_id = self._create(self.first).json()['id']
+        self._create(self.second)
+        student = User.objects.create_user(
+            email='bank@example.com', phone_number='+998901234552', full_name='Student', password='pass12345',
+        )
+        result = UserTestResult.objects.create(user=student, test=self.second, status='in_progress')
+        result.calculate_result({str(question_id): 'A'})
+
+        response = self.client.patch(self._url(self.first, f'{question_id}/'), {'question_text': 'Tahrirlangan'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['id'], question_id)
+        self.assertEqual(self._texts(self.first), ['Tahrirlangan'])
+        self.assertEqual(self._texts(self.second), ['Umumiy savol'])
+        self.assertEqual(result.user_answers.get().question_id, question_id)
+
+        # Faqat shu testdagi savol joyida yangilanadi
+        own_id = response.json()['id']
+        response = self.client.patch(self._url(self.first, f'{own_id}/'), {'explanation': 'Izoh'}, format='json')
+        self.assertEqual(response.json()['id'], own_id)
+
+    def test_delete_removes_only_the_link(self):
+        question_id = self._create(self.first).json()['id']
+        self._create(self.second)
+        self.assertEqual(self.client.delete(self._url(self.first, f'{question_id}/')).status_code, 204)
+        self.assertEqual(self._texts(self.first), [])
+        self.assertEqual(self._texts(self.second), ['Umumiy savol'])
+        self.assertTrue(Question.objects.filter(pk=question_id).exists())
+        self.assertEqual(Test.objects.get(pk=self.first.pk).question_count, 0)
+
+
+class ReorderTests(TestCase):
+    """Savollar va darslar tartibi bitta so'rovda, bitta bulk_update bilan o'zgartiriladi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='reorder-admin@example.com', phone_number='+998901234553', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        subject = Subject.objects.create(name='Chizmachilik')
+        cls.test = Test.objects.create(title='Test', subject=subject, description='-', status='active')
+        cls.questions = [create_question(cls.test, order) for order in range(1, 6)]
+        cls.course = Course.objects.create(title='Kurs', subject=subject, description='-', status='active')
+        cls.lessons = [Lesson.objects.create(course=cls.course, title=f'Dars {order}', order=order) for order in range(1, 6)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.questions_url = f'/api/admin/tests/{self.test.pk}/questions/reorder/'
+        self.lessons_url = f'/api/admin/courses/{self.course.pk}/lessons/reorder/'
+
+    def test_reorder_questions(self):
+        ids = [question.pk for question in self.questions]
+        ids[0], ids[4] = ids[4], ids[0]
+        version = Test.objects.get(pk=self.test.pk).content_version
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.questions_url, {'ids': ids}, format='json')
+        self.assertEqual(response.json(), {'updated': 2})
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "users_testquestion"') for query in context.captured_queries), 1)
+        self.assertEqual(list(self.test.question_links.order_by('order').values_list('question_id', flat=True)), ids)
+        self.assertEqual(Test.objects.get(pk=self.test.pk).content_version, version + 1)
+
+        # O'zgarish bo'lmasa yozuv ham, versiya oshishi ham yo'q
+        self.assertEqual(self.client.post(self.questions_url, {'ids': ids}, format='json').json(), {'updated': 0})
+        self.assertEqual(Test.objects.get(pk=self.test.pk).content_version, version + 1)
+
+    def test_reorder_lessons(self):
+        ids = [lesson.pk for lesson in reversed(self.lessons)]
+        self.assertEqual(self.client.post(self.lessons_url, {'ids': ids}, format='json').json(), {'updated': 4})
+        self.assertEqual(list(self.course.lessons.order_by('order').values_list('pk', flat=True)), ids)
+
+    def test_incomplete_or_duplicate_ids_are_rejected(self):
+        ids = [lesson.pk for lesson in self.lessons]
+        for bad_ids in (ids[:-1], ids + [ids[0]], ids[:-1] + [999999], []):
+            with self.subTest(ids=bad_ids):
+                response = self.client.post(self.lessons_url, {'ids': bad_ids}, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ids', response.json())
+        self.assertEqual(list(self.course.lessons.order_by('order').values_list('pk', flat=True)), ids)
+
+
+class ShuffledAttemptTests(TestCase):
+    """/start/ bilan boshlangan urinish: barqaror aralashtirilgan tartib, ekrandagi harflar bo'yicha baholash."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student, cls.other = [
+            User.objects.create_user(
+                email=f'shuffle{index}@example.com', phone_number=f'+99890123459{index}', full_name='Student',
+                password='pass12345',
+            )
+            for index in range(2)
+        ]
+        cls.test = Test.objects.create(title='Test', subject=Subject.objects.create(name='Geografiya'), description='-', status='active')
+        cls.questions = [create_question(cls.test, order, correct_answer='ABCD'[order % 4]) for order in range(1, 7)]
+        Test.objects.filter(pk=cls.test.pk).update(question_count=6)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = f'/api/tests/{self.test.pk}/'
+
+    def _start(self, client=None):
+        response = (client or self.client).post(f'{self.url}start/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    @staticmethod
+    def _order(payload):
+        return [(question['id'], [question[f'option_{letter}'] for letter in 'abcd']) for question in payload['questions']]
+
+    def _correct_answers(self, payload):
+        # Ekrandagi harf: asl to'g'ri variant matni ko'rsatilgan o'rin (variant matnlari '1'..'4')
+        correct = {question.pk: '1234'['ABCD'.index(question.correct_answer)] for question in self.questions}
+        return {
+            str(question['id']): next(letter.upper() for letter in 'abcd' if question[f'option_{letter}'] == correct[question['id']])
+            for question in payload['questions']
+        }
+
+    def _submit(self, data):
+        return self.client.post(f'{self.url}submit/', data, format='json')
+
+    def test_order_is_stable_across_reloads(self):
+        first = self._start()
+        again = self._start()
+        self.assertEqual(again['result_id'], first['result_id'])
+        self.assertEqual(self._order(again), self._order(first))
+        self.assertEqual(UserTestResult.objects.filter(user=self.student, test=self.test).count(), 1)
+
+        other_client = APIClient()
+        other_client.force_authenticate(self.other)
+        self.assertNotEqual(self._order(self._start(other_client)), self._order(first))
+
+    def test_retrieve_during_attempt_returns_attempt_order(self):
+        fixed = self._order(APIClient().get(self.url).json())
+        attempt = self._start()
+        self.assertNotEqual(self._order(attempt), fixed)
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['result_id'], attempt['result_id'])
+        self.assertEqual(self._order(response.json()), self._order(attempt))
+        self.assertEqual(self.client.get(self.url, headers={'if_none_match': response['ETag']}).status_code, 304)
+
+        self._submit({'result_id': attempt['result_id'], 'answers': {}})
+        after = self.client.get(self.url).json()
+        self.assertNotIn('result_id', after)
+        self.assertEqual(self._order(after), fixed)
+
+    def test_cached_retrieve_does_not_query_attempts(self):
+        attempt = self._start()
+        self.assertFalse(EventLog.objects.filter(event_type='test_viewed').exists()) # /start/ ko'rish sifatida sanalmaydi
+        with self.assertNumQueries(2): # Faqat test + test_viewed hodisasi (testlarda bufersiz)
+            self.assertEqual(self.client.get(self.url).json()['result_id'], attempt['result_id'])
+        self._submit({'result_id': attempt['result_id'], 'answers': {}})
+        self.client.get(self.url) # Urinish yo'qligi ham keshlanadi
+        with self.assertNumQueries(2):
+            self.assertNotIn('result_id', self.client.get(self.url).json())
+
+    def test_shuffled_letters_are_graded_against_original(self):
+        attempt = self._start()
+        response = self._submit({'result_id': attempt['result_id'], 'answers': self._correct_answers(attempt)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], attempt['result_id'])
+        self.assertEqual(response.json()['score'], 6)
+        self.assertEqual(decimal.Decimal(str(response.json()['percentage'])), 100)
+
+    def test_legacy_submit_uses_original_letters(self):
+        answers = {str(question.pk): question.correct_answer for question in self.questions}
+        response = self._submit({'answers': answers})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['score'], 6)
+        self.assertIsNone(UserTestResult.objects.get(pk=response.json()['id']).test_version)
+
+    def test_unknown_or_finished_attempt_is_rejected(self):
+        attempt = self._start()
+        self.assertEqual(self._submit({'result_id': attempt['result_id'] + 100, 'answers': {}}).status_code, 400)
+        self.assertEqual(self._submit({'result_id': attempt['result_id'], 'answers': {}}).status_code, 200)
+        self.assertEqual(self._submit({'result_id': attempt['result_id'], 'answers': {}}).status_code, 400)
+
+
+class MediaRootMixin:
+    """Har bir test uchun vaqtinchalik MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
+
+    def media_exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+
+class MediaStreamingTests(MediaRootMixin, TestCase):
+    """Dars videosi va mock test fayllari: Range (206/416), shartli so'rovlar (304), ruxsatlar va proksiga yuklash."""
+
+    DATA = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(
+            email='stream@example.com', phone_number='+998901234568', full_name='Student', password='pass12345',
+        )
+        cls.course = Course.objects.create(title='Kurs', subject=Subject.objects.create(name='Astronomiya'), description='-', status='active')
+
+    def setUp(self):
+        super().setUp()
+        self.lesson = Lesson.objects.create(
+            course=self.course, title='Dars', order=1, video_file=SimpleUploadedFile('dars.mp4', self.DATA)
+        )
+        self.url = f'/api/courses/{self.course.pk}/lessons/{self.lesson.pk}/stream/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def _get(self, url=None, **headers):
+        response = self.client.get(url or self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_requires_enrollment_or_free_preview(self):
+        self.assertEqual(self._get()[0].status_code, 403)
+        Lesson.objects.filter(pk=self.lesson.pk).update(is_free_preview=True)
+        self.assertEqual(self._get()[0].status_code, 200)
+
+    def test_full_and_ranged_responses(self):
+        UserCourseEnrollment.objects.create(user=self.student, course=self.course)
+        response, body = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.DATA)
+        self.assertEqual(response['Content-Length'], str(len(self.DATA)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+
+        size = len(self.DATA)
+        for header, (start, end) in (('bytes=10-19', (10, 19)), ('bytes=-5', (size - 5, size - 1)),
+                                     (f'bytes=1000-{size * 2}', (1000, size - 1))):
+            with self.subTest(range=header):
+                response, body = self._get(range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(body, self.DATA[start:end + 1])
+
+        response, _ = self._get(range=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+    def test_range_on_empty_file_is_not_satisfiable(self):
+        UserCourseEnrollment.objects.create(user=self.student, course=self.course)
+        self.lesson.video_file = SimpleUploadedFile('bosh.mp4', b'')
+        self.lesson.save()
+        for header in ('bytes=-5', 'bytes=0-'):
+            with self.subTest(range=header):
+                response, body = self._get(range=header)
+                self.assertEqual((response.status_code, body), (416, b''))
+                self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_conditional_requests(self):
+        UserCourseEnrollment.objects.create(user=self.student, course=self.course)
+        response, _ = self._get()
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self._get(if_none_match=etag)[0].status_code, 304)
+        self.assertEqual(self._get(if_modified_since=last_modified)[0].status_code, 304)
+        self.assertEqual(self._get(range='bytes=0-9', if_range=etag)[0].status_code, 206)
+        response, body = self._get(range='bytes=0-9', if_range='"eskirgan"') # Fayl o'zgargan: butun fayl
+        self.assertEqual((response.status_code, body), (200, self.DATA))
+
+    def test_offload_to_proxy(self):
+        UserCourseEnrollment.objects.create(user=self.student, course=self.course)
+        with mock.patch('users.streaming.STREAM_OFFLOAD', 'x-accel-redirect'):
+            response, body = self._get(range='bytes=0-9')
+        self.assertEqual((response.status_code, body), (200, b''))
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.lesson.video_file.name}')
+
+    def test_mock_test_material(self):
+        material = MockTestMaterial.objects.create(
+            mock_test_type=MockTest.MOCK_TYPE_CHOICES[0][0], title='Audio', material_format='mp3',
+            file=SimpleUploadedFile('audio.mp3', self.DATA), is_free=False,
+        )
+        url = f'/api/mock-tests/materials/{material.pk}/stream/'
+        self.assertEqual(self._get(url)[0].status_code, 403)
+        MockTestMaterial.objects.filter(pk=material.pk).update(is_free=True)
+        response, body = self._get(url, range='bytes=0-99')
+        self.assertEqual((response.status_code, body), (206, self.DATA[:100]))
+
+
+class ChunkedUploadTests(MediaRootMixin, TestCase):
+    """Bo'lakli yuklash: ketma-ket bo'laklar, qayta yuborish, boshqa worker da davom etish, checksum va bekor qilish."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='upload-admin@example.com', phone_number='+998901234569', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        cls.subject = Subject.objects.create(name='Musiqa')
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.material = Material.objects.create(title='Arxiv', subject=self.subject, file_format='zip', link='https://example.com')
+        self.chunk_size = uploads.UPLOAD_MIN_CHUNK_SIZE
+        self.data = os.urandom(self.chunk_size * 2 + 1000)
+
+    def _start(self):
+        response = self.client.post('/api/admin/uploads/', {
+            'target': 'material', 'object_id': self.material.pk, 'filename': '../arxiv.zip',
+            'total_size': len(self.data), 'chunk_size': self.chunk_size,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['filename'], response.json()['total_chunks']), ('arxiv.zip', 3))
+        return response.json()['id']
+
+    def _put(self, upload_id, number, data=None):
+        if data is None:
+            data = self.data[number * self.chunk_size:(number + 1) * self.chunk_size]
+        return self.client.put(f'/api/admin/uploads/{upload_id}/chunks/{number}/', data,
+                               content_type='application/octet-stream')
+
+    def test_upload_in_chunks(self):
+        upload_id = self._start()
+        self.assertEqual(self._put(upload_id, 0).json()['next_chunk'], 1)
+        self.assertEqual(self._put(upload_id, 0).json()['next_chunk'], 1) # Javob yo'qolgan bo'lsa qayta yuborish
+        out_of_order = self._put(upload_id, 2)
+        self.assertEqual((out_of_order.status_code, out_of_order.json()['next_chunk']), (409, 1))
+        self.assertEqual(self._put(upload_id, 1, data=b'qisqa').status_code, 409)
+        self.assertEqual(self._put(upload_id, 1).status_code, 200)
+        uploads._hashers.clear() # Keyingi bo'lak boshqa worker ga tushdi: xesh diskdan tiklanadi
+        self.assertEqual(self._put(upload_id, 2).json()['received_bytes'], len(self.data))
+
+        complete_url = f'/api/admin/uploads/{upload_id}/complete/'
+        self.assertEqual(self.client.post(complete_url, {'checksum': '0' * 64}, format='json').status_code, 400)
+        checksum = hashlib.sha256(self.data).hexdigest()
+        response = self.client.post(complete_url, {'checksum': checksum}, format='json')
+        self.assertEqual((response.status_code, response.json()['status']), (200, 'completed'))
+        self.assertEqual(self.client.post(complete_url, {}, format='json').status_code, 200)
+
+        self.material.refresh_from_db()
+        with self.material.file.open('rb') as file:
+            self.assertEqual(file.read(), self.data)
+        self.assertEqual((self.material.file_size, self.material.checksum), (len(self.data), checksum))
+        self.assertEqual(self._put(upload_id, 2).status_code, 409)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, TMP_DIR, 'uploads')), [])
+
+    def test_failed_complete_rolls_back_blob_reference(self):
+        upload_id = self._start()
+        for number in range(3):
+            self._put(upload_id, number)
+        blob_name = storage.blob_name_for(hashlib.sha256(self.data).hexdigest(), '.zip')
+        with mock.patch.object(Material, 'save', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            uploads.complete_upload(ChunkedUpload.objects.get(pk=upload_id))
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).status, 'uploading')
+        storage.discard_rolled_back_blobs()
+        self.assertFalse(self.media_exists(blob_name))
+
+    def test_incomplete_upload_cannot_complete(self):
+        upload_id = self._start()
+        self._put(upload_id, 0)
+        self.assertEqual(self.client.post(f'/api/admin/uploads/{upload_id}/complete/', {}, format='json').status_code, 400)
+
+    def test_abort_and_cleanup_remove_partial_files(self):
+        aborted, stale = self._start(), self._start()
+        for upload_id in (aborted, stale):
+            self._put(upload_id, 0)
+        self.assertEqual(self.client.delete(f'/api/admin/uploads/{aborted}/').status_code, 204)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, TMP_DIR, 'uploads'))), 1)
+
+        ChunkedUpload.objects.filter(pk=stale).update(updated_at=timezone.now() - timedelta(days=3))
+        call_command('cleanup_chunked_uploads', stdout=io.StringIO())
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, TMP_DIR, 'uploads')), [])
+        self.material.refresh_from_db()
+        self.assertFalse(self.material.file)
+
+
+@skipIf(Image is None, "Pillow o'rnatilmagan")
+@mock.patch('users.thumbnails.VARIANT_WORKERS', 0) # Variantlar jarayonlar pulisiz, shu jarayonda yaratiladi
+class MediaVariantTests(MediaRootMixin, TestCase):
+    """Yuklangan rasmlar uchun kichik variantlar va PDF materiallar uchun birinchi sahifa preview."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Rasm')
+
+    @staticmethod
+    def _image(name='rasm.png', size=(1200, 800), color='red'):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def _course(self, thumbnail):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Course.objects.create(
+                title='Kurs', subject=self.subject, description='-', status='active', thumbnail=thumbnail
+            )
+
+    def _size(self, name):
+        with Image.open(os.path.join(self.media_root, name)) as image:
+            return image.size
+
+    def test_upload_builds_resized_variants(self):
+        course = self._course(self._image())
+        course.refresh_from_db()
+        variants = course.image_variants
+        self.assertEqual(variants['source'], course.thumbnail.name)
+        self.assertEqual(set(variants) - {'source'}, {'sm_webp', 'sm_jpg', 'md_webp', 'md_jpg'})
+        self.assertEqual(self._size(variants['sm_webp']), (160, 107))
+        self.assertEqual(self._size(variants['md_jpg']), (480, 320))
+
+        response = APIClient().get('/api/courses/')
+        urls = response.json()['results'][0]['thumbnail_variants']
+        self.assertEqual(set(urls), {'sm_webp', 'sm_jpg', 'md_webp', 'md_jpg'})
+        self.assertTrue(urls['sm_webp'].endswith(variants['sm_webp']))
+
+    def test_replaced_or_removed_source(self):
+        course = self._course(self._image())
+        old_source, old_variant = course.thumbnail.name, course.image_variants['sm_webp']
+        with self.captureOnCommitCallbacks(execute=True):
+            course.thumbnail = self._image('yangi.png', color='blue')
+            course.save()
+        course.refresh_from_db()
+        self.assertEqual(course.image_variants['source'], course.thumbnail.name)
+        self.assertNotEqual(course.thumbnail.name, old_source)
+        self.assertFalse(self.media_exists(os.path.dirname(old_variant))) # Eski variantlar papkasi o'chirildi
+
+        # Eski fayl uchun kechikib kelgan natija yangisini bosib ketmaydi
+        thumbnails._store_variants(Course, course.pk, 'thumbnail', old_source, {'source': old_source})
+        course.refresh_from_db()
+        self.assertEqual(course.image_variants['source'], course.thumbnail.name)
+
+        new_variant = course.image_variants['sm_webp']
+        with self.captureOnCommitCallbacks(execute=True):
+            course.thumbnail = None
+            course.save()
+        course.refresh_from_db()
+        self.assertEqual(course.image_variants, {})
+        self.assertFalse(self.media_exists(os.path.dirname(new_variant)))
+
+    def test_variants_of_shared_blob_are_kept_while_in_use(self):
+        first, second = self._course(self._image()), self._course(self._image())
+        self.assertEqual(first.thumbnail.name, second.thumbnail.name)
+        variant = first.image_variants['sm_webp']
+        with self.captureOnCommitCallbacks(execute=True):
+            first.thumbnail = None
+            first.save()
+        self.assertTrue(self.media_exists(variant))
+
+    @skipIf(pymupdf is None, "pymupdf o'rnatilmagan")
+    def test_pdf_preview(self):
+        document = pymupdf.open()
+        document.new_page(width=300, height=400)
+        with self.captureOnCommitCallbacks(execute=True):
+            material = Material.objects.create(
+                title='Kitob', subject=self.subject, file_format='pdf',
+                file=SimpleUploadedFile('kitob.pdf', document.tobytes()),
+            )
+        material.refresh_from_db()
+        self.assertEqual(self._size(material.image_variants['preview_png']), (600, 800))
+
+    def test_backfill_command(self):
+        course = self._course(self._image())
+        Course.objects.filter(pk=course.pk).update(image_variants={})
+        call_command('generate_media_variants', stdout=io.StringIO())
+        course.refresh_from_db()
+        self.assertEqual(course.image_variants['source'], course.thumbnail.name)
+        self.assertIn('sm_webp', course.image_variants)
+
+
+class MaterialMetadataTests(MediaRootMixin, TestCase):
+    """Material fayli metama'lumotlari yuklashda bir marta olinadi, ro'yxatlar storage ni stat qilmaydi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Falsafa')
+
+    def _material(self, name, content):
+        return Material.objects.create(
+            title='Kitob', subject=self.subject, status='active', file=SimpleUploadedFile(name, content)
+        )
+
+    def test_sniff_mime_type(self):
+        self.assertEqual(sniff_mime_type(b'%PDF-1.7 ...', 'nomsiz.bin'), 'application/pdf')
+        self.assertEqual(sniff_mime_type(b'\x89PNG\r\n\x1a\n...', 'rasm.jpg'), 'image/png')
+        self.assertEqual(sniff_mime_type(b'PK\x03\x04...', 'hujjat.docx'),
+                         'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        self.assertEqual(sniff_mime_type(b'\x00\x00\x00\x18ftypmp42', 'video'), 'video/mp4')
+        self.assertEqual(sniff_mime_type(b'matn', 'izoh.txt'), 'text/plain')
+
+    def test_metadata_extracted_on_upload_and_cleared_on_removal(self):
+        content = b'%PDF-1.4 ' + b'x' * 3000
+        material = self._material('kitob.pdf', content)
+        material.refresh_from_db()
+        self.assertEqual(
+            (material.file_size, material.checksum, material.mime_type),
+            (len(content), hashlib.sha256(content).hexdigest(), 'application/pdf'),
+        )
+        material.file = None
+        material.save()
+        material.refresh_from_db()
+        self.assertEqual((material.file_size, material.checksum, material.mime_type), (None, '', ''))
+
+    @skipIf(pymupdf is None, "pymupdf o'rnatilmagan")
+    def test_pdf_page_count(self):
+        document = pymupdf.open()
+        for _ in range(3):
+            document.new_page()
+        material = self._material('kitob.pdf', document.tobytes())
+        self.assertEqual(Material.objects.get(pk=material.pk).page_count, 3)
+
+    def test_list_does_not_stat_storage(self):
+        self._material('kitob.pdf', b'%PDF-1.4 ' + b'x' * 3000)
+        self._material('kitob2.pdf', b'%PDF-1.4 ' + b'y' * (2 * 1024 * 1024))
+        with mock.patch.object(FileSystemStorage, 'size', side_effect=AssertionError('storage.size() chaqirildi')):
+            response = APIClient().get('/api/materials/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(item['size_display'] for item in response.json()['results']), ['2.0 MB', '3 KB'])
+
+    def test_backfill_command(self):
+        content = b'%PDF-1.4 backfill'
+        material = self._material('kitob.pdf', content)
+        Material.objects.filter(pk=material.pk).update(file_size=None, checksum='', mime_type='')
+        call_command('extract_material_metadata', stdout=io.StringIO())
+        material.refresh_from_db()
+        self.assertEqual((material.file_size, material.checksum), (len(content), hashlib.sha256(content).hexdigest()))
+
+
+class ContentAddressedStorageTests(MediaRootMixin, TestCase):
+    """Bir xil fayllar bitta blobda saqlanadi, havolalar almashtirish va o'chirishda kamayadi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Adabiyot')
+
+    def _material(self, content, name='kitob.txt'):
+        return Material.objects.create(
+            title='Kitob', subject=self.subject, file_format='doc', file=SimpleUploadedFile(name, content)
+        )
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self._material(b'bir xil matn')
+        second = self._material(b'bir xil matn', name='boshqa_nom.txt')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/'))
+        blob = StoredBlob.objects.get()
+        self.assertEqual((blob.ref_count, blob.size), (2, len(b'bir xil matn')))
+        self.assertTrue(self.media_exists(blob.name))
+
+    def test_delete_releases_reference_and_last_one_removes_file(self):
+        first = self._material(b'kontent')
+        second = self._material(b'kontent')
+        name = first.file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+        self.assertTrue(self.media_exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(self.media_exists(name))
+
+    def test_replacing_file_releases_previous_blob(self):
+        material = self._material(b'eski')
+        old_name = material.file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            material.file = SimpleUploadedFile('yangi.txt', b'yangi')
+            material.save()
+        self.assertEqual(list(StoredBlob.objects.values_list('name', 'ref_count')), [(material.file.name, 1)])
+        self.assertFalse(self.media_exists(old_name))
+
+        with self.captureOnCommitCallbacks(execute=True): # Aynan shu faylni qayta yuklash havolani ko'paytirmaydi
+            material.file = SimpleUploadedFile('yangi.txt', b'yangi')
+            material.save()
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+    def test_rolled_back_delete_keeps_reference(self):
+        material = self._material(b'kontent')
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                material.delete()
+                raise RuntimeError
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+    def test_rolled_back_save_removes_new_blob_file_and_reference(self):
+        existing = self._material(b'kontent')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            new_name = self._material(b'yangi kontent').file.name
+            self._material(b'kontent') # Mavjud blob: faqat havola oshadi
+            raise RuntimeError
+        self.assertEqual(list(StoredBlob.objects.values_list('name', 'ref_count')), [(existing.file.name, 1)])
+        self.assertTrue(self.media_exists(new_name))
+        storage.discard_rolled_back_blobs()
+        self.assertFalse(self.media_exists(new_name))
+        self.assertTrue(self.media_exists(existing.file.name))
+
+        with self.captureOnCommitCallbacks(execute=True): # Commit bo'lgan blob fayli o'chirilmaydi
+            committed = self._material(b'yangi kontent')
+        storage.discard_rolled_back_blobs()
+        self.assertTrue(self.media_exists(committed.file.name))
+
+    def test_lesson_video_is_released_with_cascading_course_delete(self):
+        course = Course.objects.create(title='Kurs', subject=self.subject, description='-')
+        lesson = Lesson.objects.create(course=course, title='Dars', order=1, video_file=SimpleUploadedFile('dars.mp4', b'video'))
+        self._material(b'video', name='nusxa.mp4')
+        self.assertEqual(StoredBlob.objects.get(name=lesson.video_file.name).ref_count, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            course.delete()
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+
+class ContentPackageTests(MediaRootMixin, TestCase):
+    """Paket eksport -> import aylanishi va bekor qilingan importdan keyin media qoldiqlari."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='packages@example.com', phone_number='+998901234581', full_name='Admin', password='pass12345',
+            role='admin', is_staff=True,
+        )
+        cls.subject = Subject.objects.create(name='Geografiya')
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _export(self, kind, pk):
+        response = self.client.get(f'/api/admin/packages/export/{kind}/{pk}/')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def _import(self, content):
+        return self.client.post('/api/admin/packages/import/', {'file': SimpleUploadedFile('paket.zip', content)})
+
+    def test_test_package_round_trip(self):
+        test = Test.objects.create(title='Poytaxtlar', subject=self.subject, description='-', status='active')
+        for order in (1, 2):
+            create_question(test, order, text=f'Poytaxt {order}', correct_answer='C')
+        response = self._import(self._export('test', test.pk))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['questions'], response.data['questions_reused']), (2, 2)) # Savollar bankdan qayta ishlatildi
+        copy = Test.objects.get(pk=response.data['id'])
+        self.assertNotEqual(copy.pk, test.pk)
+        self.assertEqual((copy.title, copy.subject_id, copy.question_count), ('Poytaxtlar', self.subject.pk, 2))
+        self.assertEqual([q.question_text for q in copy.get_ordered_questions()], ['Poytaxt 1', 'Poytaxt 2'])
+
+    def test_course_package_round_trip_reuses_media(self):
+        course = Course.objects.create(title='Xaritalar', subject=self.subject, description='-')
+        lesson = Lesson.objects.create(course=course, title='Dars', order=1, video_file=SimpleUploadedFile('dars.mp4', b'video'))
+        response = self._import(self._export('course', course.pk))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['media_stored'], response.data['media_reused']), (0, 1))
+        copy = Lesson.objects.get(course_id=response.data['id'])
+        self.assertEqual((copy.title, copy.video_file.name), ('Dars', lesson.video_file.name))
+        self.assertEqual(StoredBlob.objects.get().ref_count, 2)
+
+    def test_failed_import_removes_written_media(self):
+        video = b'yangi video'
+        key = hashlib.sha256(video).hexdigest() + '.mp4'
+        missing_key = '0' * 64 + '.mp4'
+        manifest = {
+            'format': 'testonline-package', 'version': 1, 'kind': 'course', 'subject': 'Geografiya',
+            'object': {'title': 'Buzilgan', 'description': '-'},
+            'media': {key: {'size': len(video)}, missing_key: {'size': 1}},
+            'lessons': [{'title': 'Bir', 'order': 1, 'video_file': key}, {'title': 'Ikki', 'order': 2, 'video_file': missing_key}],
+        }
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('manifest.json', json.dumps(manifest))
+            archive.writestr(f'media/{key}', video)
+        response = self._import(buffer.getvalue())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file', response.data)
+        self.assertFalse(Course.objects.filter(title='Buzilgan').exists())
+        self.assertFalse(StoredBlob.objects.exists())
+        blobs_dir = os.path.join(self.media_root, 'blobs')
+        self.assertEqual([files for _, _, files in os.walk(blobs_dir) if files], [])
+
+
+class CourseRatingCounterTests(TestCase):
+    """Kurs reytingi sharhlar yaratilganda, tahrirlanganda va o'chirilganda hisoblagichlardan yangilanadi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(title='Kurs', subject=Subject.objects.create(name='Huquq'), description='-')
+        cls.users = [
+            User.objects.create_user(
+                email=f'review{index}@example.com', phone_number=f'+99890123462{index}', full_name='Student', password='pass12345'
+            )
+            for index in range(3)
+        ]
+
+    def _course(self):
+        return Course.objects.get(pk=self.course.pk)
+
+    def test_review_create_edit_delete(self):
+        first = CourseReview.objects.create(user=self.users[0], course=self.course, rating=5)
+        CourseReview.objects.create(user=self.users[1], course=self.course, rating=2)
+        course = self._course()
+        self.assertEqual((course.rating, course.rating_sum, course.rating_count), (3.5, 7, 2))
+
+        edited = CourseReview.objects.get(pk=first.pk)
+        edited.rating = 3
+        edited.save()
+        course = self._course()
+        self.assertEqual(course.rating, 2.5)
+        self.assertEqual(course.get_rating_histogram(), {1: 0, 2: 1, 3: 1, 4: 0, 5: 0})
+
+        edited.delete()
+        course = self._course()
+        self.assertEqual((course.rating, course.rating_count), (2.0, 1))
+        self.assertEqual(course.get_rating_histogram()[3], 0)
+
+    def test_invalid_star_value_is_rejected_without_partial_writes(self):
+        CourseReview.objects.create(user=self.users[0], course=self.course, rating=4)
+        with self.assertRaises(ValueError):
+            CourseReview.objects.create(user=self.users[1], course=self.course, rating=7)
+        self.assertEqual(CourseReview.objects.count(), 1)
+        course = self._course()
+        self.assertEqual((course.rating, course.rating_count, course.rating_sum), (4.0, 1, 4))
+
+    def test_reconcile_command_fixes_drifted_counters(self):
+        CourseReview.objects.create(user=self.users[0], course=self.course, rating=4)
+        CourseReview.objects.create(user=self.users[1], course=self.course, rating=5)
+        Lesson.objects.create(course=self.course, title='Dars', order=1)
+        UserCourseEnrollment.objects.create(user=self.users[2], course=self.course)
+        Course.objects.filter(pk=self.course.pk).update(rating=1.0, rating_count=9, rating_5_count=0, lessons_count=0)
+
+        output = io.StringIO()
+        call_command('reconcile_course_counters', course_ids=[self.course.pk], stdout=output)
+        self.assertIn('1 ta kurs', output.getvalue())
+        course = self._course()
+        self.assertEqual((course.rating, course.rating_count, course.rating_5_count), (4.5, 2, 1))
+        self.assertEqual((course.lessons_count, course.enrolled_students_count), (1, 1))
+        self.assertEqual(Course.reconcile_counters([self.course.pk]), 0) # Endi farq yo'q
+
+
+class FacetCountsTests(TestCase):
+    """?facets= : variantlar soni, facetning o'z filtri hisobga olinmasligi va natija keshi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.physics = Subject.objects.create(name='Fizika')
+        cls.history = Subject.objects.create(name='Tarix')
+        for subject, difficulty in ((cls.physics, 'qiyin'), (cls.physics, 'qiyin'), (cls.physics, 'oson'), (cls.history, 'oson')):
+            Test.objects.create(title=f'{subject.name} testi', subject=subject, description='-', status='active', difficulty=difficulty)
+        Test.objects.create(title='Qoralama', subject=cls.history, description='-', status='draft', difficulty='qiyin')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _facets(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        return response.data['facets']
+
+    @staticmethod
+    def _counts(facet):
+        return {item['label']: item['count'] for item in facet}
+
+    def test_counts_with_labels(self):
+        facets = self._facets('/api/tests/?facets=all')
+        self.assertEqual(set(facets), {'subject', 'difficulty', 'test_type'})
+        self.assertEqual(self._counts(facets['subject']), {'Fizika': 3, 'Tarix': 1})
+        self.assertEqual(self._counts(facets['difficulty']), {'Qiyin': 2, 'Oson': 2})
+        self.assertEqual(facets['subject'][0]['value'], self.physics.pk) # Ko'p sonlisi birinchi
+
+    def test_facet_ignores_its_own_filter(self):
+        facets = self._facets(f'/api/tests/?difficulty=qiyin&subject={self.physics.pk}&facets=difficulty,subject')
+        self.assertEqual(self._counts(facets['difficulty']), {'Qiyin': 2, 'Oson': 1}) # Fizika bo'yicha, qiyinliksiz
+        self.assertEqual(self._counts(facets['subject']), {'Fizika': 2}) # Qiyin bo'yicha, fansiz
+
+    def test_facets_with_search(self):
+        facets = self._facets('/api/tests/?search=tarix&facets=difficulty')
+        self.assertEqual(self._counts(facets['difficulty']), {'Oson': 1})
+
+    def test_boolean_facet_labels(self):
+        Material.objects.create(title='Bepul', subject=self.physics, status='active', is_free=True, file_format='link', link='https://example.com')
+        Material.objects.create(title='Pullik', subject=self.physics, status='active', is_free=False, price=1000, file_format='link', link='https://example.com')
+        facets = self._facets('/api/materials/?facets=is_free')
+        self.assertEqual({item['value']: item['label'] for item in facets['is_free']}, {True: 'Ha', False: "Yo'q"})
+
+    def test_facet_without_choices_is_labelled_by_value(self):
+        for price in (150000, 150000, 0):
+            Course.objects.create(title='Kurs', subject=self.physics, description='-', status='active', price=price)
+        facets = self._facets('/api/courses/?facets=price')
+        self.assertEqual(self._counts(facets['price']), {'150000.00': 2, '0.00': 1})
+
+    def test_unknown_facet_is_rejected(self):
+        response = self.client.get('/api/tests/?facets=price')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('facets', response.data)
+
+    def test_signature_ignores_order_and_pagination(self):
+        signature = facet_signature(QueryDict('difficulty=oson&subject=1&page=2'), ['subject', 'difficulty'])
+        self.assertEqual(signature, facet_signature(QueryDict('subject=1&difficulty=oson&ordering=title'), ['difficulty', 'subject']))
+        self.assertNotEqual(signature, facet_signature(QueryDict('difficulty=qiyin&subject=1'), ['subject', 'difficulty']))
+        self.assertNotEqual(signature, facet_signature(QueryDict('difficulty=oson&subject=1'), ['subject']))
+
+    def test_counts_are_cached_per_signature(self):
+        self._facets('/api/tests/?facets=difficulty')
+        Test.objects.create(title='Yangi', subject=self.physics, description='-', status='active', difficulty='orta')
+        with CaptureQueriesContext(connection) as context:
+            cached = self._facets('/api/tests/?facets=difficulty&page=1')
+        self.assertNotIn("O'rta", self._counts(cached['difficulty'])) # Kesh muddati ichida eski natija
+        self.assertFalse(any('GROUP BY' in query['sql'] for query in context.captured_queries))
+        self.assertIn("O'rta", self._counts(self._facets('/api/tests/?facets=difficulty,subject')['difficulty']))
@@ -0,0 +1,122 @@
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .imaging import Image, pymupdf, build_image_variants, build_pdf_preview, variant_base_name
+from .models import User, Subject, University, Course, Material
+
+
+logger = logging.getLogger(__name__)
+
+# Rasm variantlari: nom -> (maksimal o'lcham px, formatlar)
+IMAGE_VARIANT_SPECS = getattr(settings, 'IMAGE_VARIANT_SPECS', {
+    'sm': (160, ('webp', 'jpg')),
+    'md': (480, ('webp', 'jpg')),
+})
+# 0 bo'lsa variantlar shu jarayonning o'zida (sinxron) yaratiladi
+VARIANT_WORKERS = getattr(settings, 'MEDIA_VARIANT_WORKERS', 2)
+
+# model -> manba fayl maydoni
+IMAGE_SOURCE_FIELDS = {
+    User: 'profile_picture',
+    Subject: 'icon',
+    University: 'logo',
+    Course: 'thumbnail',
+}
+# Variantlari bo'lishi mumkin bo'lgan barcha maydonlar (Material uchun PDF preview)
+VARIANT_SOURCE_FIELDS = {**IMAGE_SOURCE_FIELDS, Material: 'file'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=VARIANT_WORKERS)
+        return _executor
+
+
+def _store_variants(model, pk, field_name, source_name, variants):
+    # Manba fayl shu orada almashtirilgan bo'lsa eski natija yozilmaydi
+    model.objects.filter(pk=pk, **{field_name: source_name}).update(image_variants=variants)
+
+
+def _on_done(model, pk, field_name, source_name):
+    def callback(future):
+        try:
+            _store_variants(model, pk, field_name, source_name, future.result())
+        except Exception:
+            logger.exception("%s %s uchun variantlarni yaratib bo'lmadi", model.__name__, pk)
+        finally:
+            connections.close_all() # Executor ning callback oqimidagi ulanishlar
+    return callback
+
+
+def get_variant_builder(model):
+    if model in IMAGE_SOURCE_FIELDS:
+        if Image is None:
+            return None, None
+        return partial(build_image_variants, specs=IMAGE_VARIANT_SPECS), IMAGE_SOURCE_FIELDS[model]
+    if model is Material:
+        return (build_pdf_preview, 'file') if pymupdf is not None else (None, None)
+    return None, None
+
+
+def generate_variants(instance, sync=False):
+    """
+    Manba fayl uchun variantlarni yaratishni rejalashtiradi (jarayonlar pulida) yoki sync=True da darhol yaratadi.
+    Fayl bo'lmasa yoki kerakli kutubxona o'rnatilmagan bo'lsa hech narsa qilmaydi.
+    """
+    model = type(instance)
+    builder, field_name = get_variant_builder(model)
+    source = getattr(instance, field_name, None) if builder else None
+    if not source or not source.name:
+        return False
+    if model is Material and not source.name.lower().endswith('.pdf'):
+        return False
+    root = source.storage.path('')
+    if sync or not VARIANT_WORKERS:
+        variants = builder(root, source.name)
+        _store_variants(model, instance.pk, field_name, source.name, variants)
+        instance.image_variants = variants
+        return True
+    future = _get_executor().submit(builder, root, source.name)
+    future.add_done_callback(_on_done(model, instance.pk, field_name, source.name))
+    return True
+
+
+def delete_unused_variants(storage, source_name):
+    """Eski manba faylning variantlar papkasini o'chiradi (bir xil blob boshqa yozuvda ishlatilmayotgan bo'lsa)."""
+    if any(model.objects.filter(**{field_name: source_name}).exists() for model, field_name in VARIANT_SOURCE_FIELDS.items()):
+        return
+    shutil.rmtree(os.path.join(storage.path(''), variant_base_name(source_name)), ignore_errors=True)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=University)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Material)
+def _schedule_variants_after_upload(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    source = getattr(instance, VARIANT_SOURCE_FIELDS[sender])
+    current = (instance.image_variants or {}).get('source')
+    if current and (not source or source.name != current):
+        # Almashtirilgan yoki olib tashlangan manbaning variantlari commit dan keyin o'chiriladi
+        transaction.on_commit(partial(delete_unused_variants, source.storage, current))
+    if not source and current:
+        sender.objects.filter(pk=instance.pk).update(image_variants={})
+    elif source and source.name != current:
+        # Fayl va yozuv bazaga tushgandan keyin (tranzaksiya commit bo'lganda) ishlaymiz
+        transaction.on_commit(lambda: generate_variants(instance))
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from .models import ChunkedUpload
+from .storage import TMP_DIR, sniff_file
+
+
+# Bo'lak hajmi chegaralari va bitta fayl uchun maksimal hajm (baytlarda)
+UPLOAD_CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+UPLOAD_MIN_CHUNK_SIZE = 256 * 1024
+UPLOAD_MAX_CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 * 1024)
+UPLOAD_MAX_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 5 * 1024 ** 3)
+READ_BLOCK_SIZE = 64 * 1024
+
+# upload_id -> (sha256 obyekti, shu paytgacha hashlangan baytlar soni)
+_hashers = {}
+_lock = threading.Lock()
+
+
+class ChunkError(Exception):
+    """Bo'lakni qabul qilib bo'lmadi (uzunlik mos emas, tartib buzilgan va h.k.)."""
+
+
+def supports_chunked_upload(storage):
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return False
+    return True
+
+
+def start_upload(user, target, instance, filename, total_size, chunk_size=None):
+    """
+    Yuklash sessiyasini ochadi. Oddiy omborda yakuniy fayl nomi FileField ning upload_to si bo'yicha darhol
+    band qilinadi va bo'laklar to'g'ridan-to'g'ri shu faylga yoziladi. Kontent-manzilli omborda nom xeshdan
+    chiqadi: bo'laklar .tmp/uploads/ dagi faylga yoziladi va complete da blob joyiga rename qilinadi.
+    """
+    field = ChunkedUpload(target=target).get_target_field()[1]
+    if hasattr(field.storage, 'adopt_file'):
+        # Kontent-manzilli omborda yakuniy nom xeshdan chiqadi: bo'laklar shu ombordagi .tmp ga yoziladi
+        # va complete da blob joyiga rename qilinadi (nusxalanmaydi)
+        name = f"{TMP_DIR}/uploads/{uuid.uuid4().hex}{os.path.splitext(filename)[1]}"
+        os.makedirs(os.path.dirname(field.storage.path(name)), exist_ok=True)
+        open(field.storage.path(name), 'wb').close()
+    else:
+        name = field.storage.save(field.generate_filename(instance, filename), ContentFile(b''))
+    upload = ChunkedUpload.objects.create(
+        user=user, target=target, object_id=instance.pk, filename=filename, file_name=name,
+        total_size=total_size, chunk_size=chunk_size or UPLOAD_CHUNK_SIZE,
+    )
+    with _lock:
+        _hashers[upload.pk] = (hashlib.sha256(), 0)
+    return upload
+
+
+def _storage_path(upload):
+    return upload.get_target_field()[1].storage.path(upload.file_name)
+
+
+def _take_hasher(upload, path):
+    """
+    Xotiradagi hash holatini oladi. Boshqa jarayonda boshlangan yoki server qayta ishga tushgan bo'lsa
+    allaqachon yozilgan qism diskdan bir marta qayta hashlanadi.
+    """
+    with _lock:
+        entry = _hashers.pop(upload.pk, None)
+    if entry is not None and entry[1] == upload.received_bytes:
+        return entry[0]
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as file:
+        remaining = upload.received_bytes
+        while remaining > 0:
+            block = file.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def expected_chunk_length(upload, chunk_number):
+    return min(upload.chunk_size, upload.total_size - chunk_number * upload.chunk_size)
+
+
+def write_chunk(upload, chunk_number, stream, content_length):
+    """
+    N-bo'lakni so'rov oqimidan bloklab o'qib faylning oxiriga yozadi va SHA-256 ni shu o'tishda yangilaydi.
+    Bo'laklar ketma-ket keladi; oxirgi qabul qilingan bo'lakni qayta yuborish xato emas (javob yo'qolgan bo'lishi mumkin).
+    """
+    if chunk_number == upload.next_chunk - 1:
+        return False # Takroriy bo'lak: allaqachon yozilgan
+    if chunk_number != upload.next_chunk or upload.received_bytes >= upload.total_size:
+        raise ChunkError(f"Kutilgan bo'lak raqami: {upload.next_chunk}.")
+    expected = expected_chunk_length(upload, chunk_number)
+    if content_length != expected:
+        raise ChunkError(f"Bo'lak hajmi {expected} bayt bo'lishi kerak.")
+
+    path = _storage_path(upload)
+    hasher = _take_hasher(upload, path)
+    written = 0
+    with open(path, 'r+b') as file:
+        file.seek(upload.received_bytes)
+        file.truncate() # Oldingi uzilgan urinishdan qolgan baytlar
+        while written < expected:
+            block = stream.read(min(READ_BLOCK_SIZE, expected - written))
+            if not block:
+                break
+            file.write(block)
+            hasher.update(block)
+            written += len(block)
+        if written != expected:
+            file.truncate(upload.received_bytes)
+            raise ChunkError(f"Bo'lak to'liq kelmadi ({written}/{expected} bayt).")
+
+    upload.received_bytes += written
+    upload.next_chunk += 1
+    upload.save(update_fields=['received_bytes', 'next_chunk', 'updated_at'])
+    with _lock:
+        _hashers[upload.pk] = (hasher, upload.received_bytes)
+    return True
+
+
+def complete_upload(upload, checksum=None):
+    """Hajm va (berilgan bo'lsa) checksum ni tekshirib, faylni Material.file yoki Lesson.video_file ga biriktiradi."""
+    if upload.received_bytes != upload.total_size:
+        raise ChunkError(f"Fayl to'liq yuklanmagan ({upload.received_bytes}/{upload.total_size} bayt).")
+    digest = _take_hasher(upload, _storage_path(upload)).hexdigest()
+    if checksum and checksum.lower() != digest:
+        raise ChunkError("Checksum mos kelmadi.")
+
+    model, field = upload.get_target_field()
+    with transaction.atomic():
+        instance = model.objects.select_for_update().get(pk=upload.object_id)
+        if hasattr(field.storage, 'adopt_file'):
+            # Havola shu tranzaksiyada qo'shiladi: bekor qilinsa u ham bekor bo'ladi, yangi blob faylini storage o'chiradi
+            upload.file_name = field.storage.adopt_file(
+                _storage_path(upload), digest, os.path.splitext(upload.filename)[1], upload.total_size
+            )
+            if getattr(instance, field.name).name == upload.file_name:
+                # Aynan shu fayl qayta yuklandi: adopt_file qo'shgan havola ortiqcha
+                transaction.on_commit(lambda: field.storage.delete(upload.file_name))
+        setattr(instance, field.name, upload.file_name)
+        if hasattr(instance, 'get_file_metadata'):
+            # Hajm va xesh bo'laklar yozilayotganda hisoblangan, faylni qayta o'qimaymiz
+            instance._known_file_metadata = {
+                'file_size': upload.total_size, 'checksum': digest,
+                'mime_type': sniff_file(field.storage.path(upload.file_name), upload.filename),
+            }
+        instance.save()
+        upload.checksum = digest
+        upload.status = 'completed'
+        upload.save(update_fields=['file_name', 'checksum', 'status', 'updated_at'])
+    return instance
+
+
+def abort_upload(upload):
+    """Tugallanmagan sessiyani va yarim yozilgan faylni o'chiradi."""
+    with _lock:
+        _hashers.pop(upload.pk, None)
+    if upload.status != 'completed':
+        upload.get_target_field()[1].storage.delete(upload.file_name)
+    upload.delete()
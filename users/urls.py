@@ -11,17 +11,19 @@ from .views import (
     # Profile (ViewSet)
     ProfileViewSet,
     # Student/Public Lists & ViewSets
-    SubjectListView, TestViewSet, MaterialViewSet, LeaderboardView,
+    SubjectListView, TestViewSet, MaterialViewSet, LeaderboardView, UnifiedSearchView,
     MockTestViewSet, UniversityViewSet, CourseViewSet, ScheduleItemViewSet,
     NotificationViewSet,
     # Admin Dashboard
     AdminDashboardStatsView, AdminDashboardLatestListsView,
     # Admin Statistics (Separate Views)
-    AdminCombinedStatisticsView,
+    AdminCombinedStatisticsView, AdminCohortAnalyticsView, AdminPurchaseFunnelView,
+    # Admin Content Packages
+    AdminPackageExportView, AdminPackageImportView,
     # Admin CRUD ViewSets
     AdminUserViewSet, AdminTestViewSet, AdminQuestionViewSet, AdminMaterialViewSet,
     AdminPaymentViewSet, AdminUniversityViewSet, AdminAchievementViewSet,
-    AdminCourseViewSet, AdminLessonViewSet
+    AdminCourseViewSet, AdminLessonViewSet, AdminChunkedUploadViewSet
 )
 
 # --- Student/Public Router ---
@@ -53,6 +55,7 @@ admin_router.register(r'payments', AdminPaymentViewSet, basename='admin-payment'
 admin_router.register(r'universities', AdminUniversityViewSet, basename='admin-university')
 admin_router.register(r'achievements', AdminAchievementViewSet, basename='admin-achievement')
 admin_router.register(r'courses', AdminCourseViewSet, basename='admin-course')
+admin_router.register(r'uploads', AdminChunkedUploadViewSet, basename='admin-upload') # Bo'lakli (resumable) yuklash
 # Darslar nested router orqali qo'shiladi
 # admin_router.register(r'lessons', AdminLessonViewSet, basename='admin-lesson')
 # Subject uchun alohida ViewSet kerak bo'lsa:
@@ -76,6 +79,7 @@ urlpatterns = [
     # Student/Public Lists (non-ViewSet)
     path('subjects/', SubjectListView.as_view(), name='subject-list'),
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('search/', UnifiedSearchView.as_view(), name='unified-search'), # Barcha kataloglar bo'yicha bitta qidiruv
 
     # Student Profile Actions & Retrieve/Update (using its own router)
     path('', include(profile_router.urls)), # /api/profile/, /api/profile/change-password/, etc.
@@ -90,8 +94,14 @@ urlpatterns = [
 
     # Statistics (using separate GenericAPIViews)
     path('admin/statistics/', AdminCombinedStatisticsView.as_view(), name='admin-combined-statistics'),
+    path('admin/statistics/cohorts/', AdminCohortAnalyticsView.as_view(), name='admin-cohort-analytics'),
+    path('admin/statistics/funnel/', AdminPurchaseFunnelView.as_view(), name='admin-purchase-funnel'),
     # path('admin/statistics/courses/', AdminCourseStatisticsView.as_view(), name='admin-stats-courses'), # Agar kerak bo'lsa
 
+    # Content packages (staging -> production ko'chirish)
+    path('admin/packages/export/<str:kind>/<int:pk>/', AdminPackageExportView.as_view(), name='admin-package-export'),
+    path('admin/packages/import/', AdminPackageImportView.as_view(), name='admin-package-import'),
+
     # Admin CRUD ViewSets (using admin_router and nested routers)
     path('admin/', include(admin_router.urls)), # /api/admin/users/, /api/admin/tests/, etc.
     path('admin/', include(tests_admin_router.urls)), # /api/admin/tests/{test_pk}/questions/
@@ -2,9 +2,13 @@
 
 import decimal
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, datetime, time
+from django.utils.dateparse import parse_date
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse, StreamingHttpResponse
 from drf_yasg.utils import swagger_auto_schema
-from django.db.models import Count, Avg, Sum, F, ExpressionWrapper, DurationField, Q, Max
+from django.db.models import Count, Avg, Sum, F, ExpressionWrapper, DurationField, Q, Max, Prefetch, prefetch_related_objects
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext_lazy as _ # <<<--- _ uchun import
 from rest_framework import generics, permissions, status, viewsets, mixins
@@ -17,12 +21,26 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from django.db.models.functions import TruncDate # Grafik uchun
 from .utils import get_date_ranges # Yordamchi funksiyani import qilamiz
+from .analytics import get_cohort_analytics, get_purchase_funnel, np
+from .events import log_event
+from .progress import record_ping, discard_pending, get_pending_positions
+from .streaming import ranged_file_response
+from .uploads import ChunkError, supports_chunked_upload, start_upload, write_chunk, complete_upload, abort_upload
+from .exports import csv_stream_response, xlsx_file_response, test_result_rows, payment_ledger_rows, openpyxl
+from .imports import QuestionImportError, detect_import_format, import_questions
+from .packages import PACKAGE_KINDS, PackageError, build_package, import_package
+from .payloads import (
+    get_test_payload, get_shuffled_test_payload, render_payload, etag_matches, get_cached_attempt, remember_attempt,
+    forget_attempt,
+)
+from .facets import parse_facets, get_facet_counts
+from .search import IndexedSearchFilter, UNIFIED_SEARCH_KINDS, search_grouped
 
 from .models import (
-    User, Subject, Test, Question, UserTestResult, UserAnswer, Material, Payment,
+    User, Subject, Test, Question, TestQuestion, UserTestResult, UserAnswer, Material, Payment,
     UserRating, MockTest, MockTestResult, MockTestMaterial, University,
     Achievement, UserAchievement, Course, Lesson, UserCourseEnrollment,
-    CourseReview, ScheduleItem, Notification, UserSettings
+    CourseReview, ScheduleItem, Notification, UserSettings, TestStatistics, LessonProgress, ChunkedUpload
 )
 from .serializers import * # Barcha serializerlarni import qilamiz
 from .permissions import IsOwnerOrAdmin, IsAdminOrReadOnly
@@ -44,6 +62,37 @@ def _calculate_percentage_change(current_value, previous_value):
     except (TypeError, decimal.InvalidOperation, decimal.DivisionByZero, ValueError):
          return 0.0 # Xatolik bo'lsa 0
 
+def _parse_date_param(request, name):
+    """So'rov parametridan YYYY-MM-DD sanani oladi; noto'g'ri bo'lsa ValidationError."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError: # Format to'g'ri, lekin sana mavjud emas (masalan, 13-oy)
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: _("Sana YYYY-MM-DD formatida bo'lishi kerak.")})
+    return parsed
+
+def _apply_order(items, ids):
+    """
+    items: {id: order maydoni bor obyekt}. ids - shu obyektlarning to'liq ro'yxati yangi tartibda.
+    Tartibi o'zgargan obyektlarni qaytaradi (bulk_update uchun).
+    """
+    if set(ids) != set(items):
+        missing, unknown = set(items) - set(ids), set(ids) - set(items)
+        raise ValidationError({"ids": _("Ro'yxat to'liq bo'lishi kerak. Yetishmayotgan: %(missing)s; begona: %(unknown)s") % {
+            'missing': sorted(missing) or '-', 'unknown': sorted(unknown) or '-',
+        }})
+    changed = []
+    for order, pk in enumerate(ids, start=1):
+        item = items[pk]
+        if item.order != order:
+            item.order = order
+            changed.append(item)
+    return changed
+
 # --- Authentication Views ---
 
 class SignupView(generics.CreateAPIView):
@@ -208,22 +257,147 @@ class SubjectListView(generics.ListAPIView):
     serializer_class = SubjectSerializer
     permission_classes = [AllowAny]
 
-class TestViewSet(viewsets.ReadOnlyModelViewSet):
+class FacetCountsMixin:
+    """
+    list ga ixtiyoriy ?facets=subject,difficulty (yoki ?facets=all): javobga joriy filtr bo'yicha
+    har bir variant soni 'facets' kaliti bilan qo'shiladi (facets.py). Facetlar `facet_fields` da.
+    """
+    facet_fields = {}
+
+    def list(self, request, *args, **kwargs):
+        value = request.query_params.get('facets')
+        names = parse_facets(value, self.facet_fields) if value else None
+        response = super().list(request, *args, **kwargs)
+        if names and isinstance(response.data, dict): # Sahifalangan javob
+            response.data['facets'] = get_facet_counts(self, request, names)
+        return response
+
+
+class UnifiedSearchView(generics.GenericAPIView):
+    """
+    Yagona qidiruv oynasi uchun: testlar, kurslar, materiallar va mock testlar indeksdan bitta so'rov bilan
+    qidiriladi, natija turlar bo'yicha guruhlangan (har birida eng mos `limit` ta) va har tur uchun jami soni bilan.
+    Parametrlar: q (kamida 2 belgi), types (vergul bilan, masalan "test,course"), limit (1-20, default 5).
+    """
+    permission_classes = [AllowAny]
+    serializer_class = serializers.Serializer
+    DEFAULT_LIMIT = 5
+    MAX_LIMIT = 20
+    MIN_QUERY_LENGTH = 2
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        types = request.query_params.get('types')
+        kinds = [kind.strip() for kind in types.split(',') if kind.strip()] if types else list(UNIFIED_SEARCH_KINDS)
+        unknown = [kind for kind in kinds if kind not in UNIFIED_SEARCH_KINDS]
+        if unknown:
+            raise ValidationError({"types": _("Noma'lum tur(lar): %(kinds)s.") % {'kinds': ', '.join(unknown)}})
+        try:
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": _("limit butun son bo'lishi kerak.")})
+        limit = max(1, min(limit, self.MAX_LIMIT))
+
+        if len(query) < self.MIN_QUERY_LENGTH:
+            groups = {kind: {'count': 0, 'hits': []} for kind in kinds}
+        else:
+            groups = search_grouped(query, kinds=kinds, per_kind=limit)
+        return Response({
+            'query': query,
+            'total': sum(group['count'] for group in groups.values()),
+            'counts': {kind: group['count'] for kind, group in groups.items()},
+            'results': {
+                kind: [{'id': object_id, 'type': kind, 'title': label} for object_id, label, _rank in group['hits']]
+                for kind, group in groups.items()
+            },
+        })
+
+
+class TestViewSet(FacetCountsMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly] # <- Import qilingan
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter]
     filterset_fields = ['subject', 'difficulty', 'test_type']
     search_fields = ['title', 'subject__name', 'description']
-    queryset = Test.objects.filter(status='active').select_related('subject').prefetch_related('questions') # Savollarni ham oldindan olish
+    search_index_kind = 'test' # ?search= to'liq matnli indeks orqali (search.py)
+    facet_fields = {'subject': 'subject__name', 'difficulty': None, 'test_type': None} # ?facets= (facets.py)
+    queryset = Test.objects.filter(status='active').select_related('subject')
+    # Ro'yxatda faqat TestListSerializer o'qiydigan ustunlar (description va h.k. yuklanmaydi)
+    list_only_fields = (
+        'id', 'title', 'test_type', 'question_count', 'difficulty', 'price', 'time_limit', 'reward_points',
+        'status', 'created_at', 'subject__id', 'subject__name', 'subject__icon', 'subject__image_variants',
+    )
 
     def get_serializer_class(self):
         action_serializer_map = {
             'list': TestListSerializer,
             'retrieve': TestDetailSerializer,
+            'start_test': TestDetailSerializer,
             'submit_test': SubmitAnswerSerializer,
             'results': UserTestResultSerializer,
         }
         return action_serializer_map.get(self.action, TestListSerializer)
 
+    def get_queryset(self):
+        # Savollar hech qaysi action da prefetch qilinmaydi: retrieve ularni tayyor javob keshidan oladi,
+        # kesh bo'sh bo'lsagina payloads.py yuklaydi
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.only(*self.list_only_fields)
+        return queryset
+
+    def _in_progress_attempt(self, user, test):
+        # /start/ bilan boshlangan (aralashtirilgan) oxirgi tugallanmagan urinish
+        return UserTestResult.objects.filter(
+            user=user, test=test, status='in_progress', test_version__isnull=False
+        ).order_by('-start_time').first()
+
+    def _attempt_payload(self, test, result_id, seed):
+        data = get_shuffled_test_payload(test, self.request, TestDetailSerializer, seed)
+        data['result_id'] = result_id
+        return data
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Test va savollar. Boshlangan (aralashtirilgan) urinishi bor student shu urinish tartibini oladi (result_id bilan),
+        shuning uchun urinish davomida asl tartib ko'rinmaydi. Qolganlarga keshdagi asl tartib beriladi:
+        result_id siz (eski) submit javoblari shu tartibdagi harflar bo'yicha baholanadi.
+        Urinish ham keshdan olinadi: keshlangan yo'lda faqat testning o'zi o'qiladi.
+        """
+        instance = self.get_object()
+        log_event('test_viewed', user=request.user, test=instance) # Buferga yoziladi, so'rov qo'shmaydi
+        attempt = ()
+        if request.user.is_authenticated:
+            attempt = get_cached_attempt(instance, request.user, lambda: self._in_progress_attempt(request.user, instance))
+        if attempt:
+            body, etag = render_payload(self._attempt_payload(instance, *attempt))
+        else:
+            body, etag = get_test_payload(instance, request, self.get_serializer_class())
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache' # Har safar ETag bilan tekshirilsin
+        return response
+
+    @action(detail=True, methods=['post'], url_path='start', permission_classes=[IsAuthenticated])
+    def start_test(self, request, pk=None):
+        """
+        Urinishni boshlaydi (tugallanmagani bo'lsa davom ettiradi) va savollarni shu urinish uchun aralashtirilgan
+        tartibda qaytaradi: urug' (result_id, content_version), asos keshdagi umumiy javob (shuffling.py).
+        Javoblar submit ga result_id bilan, ekranda ko'rilgan harflarda yuboriladi.
+        """
+        test = self.get_object()
+        # Qayta yuklanganda tartib o'zgarmasligi uchun oxirgi tugallanmagan urinish davom ettiriladi
+        result = self._in_progress_attempt(request.user, test)
+        if result is None:
+            result = UserTestResult.objects.create(
+                user=request.user, test=test, status='in_progress',
+                total_questions=test.question_count, test_version=test.content_version
+            )
+        # test_viewed bu yerda yozilmaydi: ko'rish retrieve da hisoblangan, voronka ikki marta sanamasin
+        return Response(self._attempt_payload(test, *remember_attempt(test, request.user, result)))
+
     @action(detail=True, methods=['post'], url_path='submit', permission_classes=[IsAuthenticated])
     def submit_test(self, request, pk=None):
         test = self.get_object()
@@ -235,7 +409,9 @@ class TestViewSet(viewsets.ReadOnlyModelViewSet):
         # To'lov tekshiruvi...
         if test.test_type == 'premium' and test.price > 0:
              if not Payment.objects.filter(user=user, test=test, status='successful').exists():
+                 log_event('purchase_attempted', user=user, test=test)
                  if user.balance < test.price:
+                     log_event('insufficient_funds', user=user, test=test)
                      raise ValidationError(_("Testni topshirish uchun hisobingizda yetarli mablag' yo'q."))
                  Payment.objects.create(
                      user=user, amount=-test.price, payment_type='test_purchase',
@@ -248,12 +424,21 @@ class TestViewSet(viewsets.ReadOnlyModelViewSet):
         serializer.is_valid(raise_exception=True)
         user_answers = serializer.validated_data.get('answers', {})
 
-        # Natijani yaratish va hisoblash
-        result = UserTestResult.objects.create(
-            user=user, test=test, status='in_progress',
-            total_questions=test.questions.count() # Savollar sonini boshida saqlash
-        )
+        result_id = serializer.validated_data.get('result_id')
+        if result_id is not None:
+            # /start/ bilan boshlangan (aralashtirilgan) urinish: harflar calculate_result da asl variantlarga qaytariladi
+            result = UserTestResult.objects.filter(pk=result_id, user=user, test=test, status='in_progress').first()
+            if result is None:
+                raise ValidationError({"result_id": _("Bu test uchun tugallanmagan urinish topilmadi.")})
+        else:
+            # Natijani yaratish va hisoblash
+            result = UserTestResult.objects.create(
+                user=user, test=test, status='in_progress',
+                total_questions=test.questions.count() # Savollar sonini boshida saqlash
+            )
         result.calculate_result(user_answers) # Javoblarni saqlab, hisoblaydi
+        forget_attempt(test, user)
+        log_event('submitted', user=user, test=test)
 
         result_serializer = UserTestResultSerializer(result, context=self.get_serializer_context())
         return Response(result_serializer.data, status=status.HTTP_200_OK)
@@ -270,12 +455,14 @@ class TestViewSet(viewsets.ReadOnlyModelViewSet):
         except UserTestResult.DoesNotExist:
             raise NotFound(_("Siz bu testni hali topshirmagansiz."))
 
-class MaterialViewSet(viewsets.ReadOnlyModelViewSet):
+class MaterialViewSet(FacetCountsMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly] # <- Import qilingan
     serializer_class = MaterialSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter]
     filterset_fields = ['subject', 'material_type', 'file_format', 'is_free']
     search_fields = ['title', 'subject__name', 'description']
+    search_index_kind = 'material'
+    facet_fields = {'subject': 'subject__name', 'material_type': None, 'file_format': None, 'is_free': None}
     queryset = Material.objects.filter(status='active').select_related('subject')
 
     @action(detail=True, methods=['get'], url_path='download', permission_classes=[IsAuthenticated])
@@ -293,6 +480,7 @@ class MaterialViewSet(viewsets.ReadOnlyModelViewSet):
                  raise PermissionDenied(_("Bu materialni yuklab olish uchun avval sotib olishingiz kerak."))
 
         material.increment_download_count()
+        log_event('material_downloaded', user=user, material=material)
         serializer = self.get_serializer(material, context={'request': request}) # Contextni uzatish muhim (URL uchun)
         # Javob sifatida faqat serializer data qaytariladi, frontend URLni olib yuklaydi
         return Response(serializer.data)
@@ -300,8 +488,11 @@ class MaterialViewSet(viewsets.ReadOnlyModelViewSet):
 class LeaderboardView(generics.ListAPIView):
     serializer_class = UserRatingSerializer
     permission_classes = [AllowAny] # Reyting hamma uchun ochiq
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     search_fields = ['user__full_name', 'user__study_place', 'user__region']
+    search_index_kind = 'user'
+    search_index_field = 'user_id'
+    search_index_ranking = False # Reyting tartibi saqlanadi
     filterset_fields = ['user__region']
     # ordering_fields = ['rank', 'total_score', 'math_score', 'physics_score', 'english_score']
     # ordering = ['rank'] # Default saralash
@@ -329,9 +520,10 @@ class LeaderboardView(generics.ListAPIView):
 
 class MockTestViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly] # <- Import qilingan
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter]
     filterset_fields = ['mock_type', 'language']
     search_fields = ['title', 'description']
+    search_index_kind = 'mock_test'
 
     def get_queryset(self):
         # Faqat aktiv va vaqti kelgan mock testlar
@@ -400,6 +592,17 @@ class MockTestViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(queryset, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path=r'materials/(?P<material_pk>\d+)/stream', permission_classes=[IsAuthenticated])
+    def stream_material(self, request, material_pk=None):
+        """Mock test audio/video faylini Range (206) qo'llab-quvvatlagan holda oqim bilan beradi."""
+        material = get_object_or_404(MockTestMaterial, pk=material_pk)
+        if not material.file:
+            raise NotFound(_("Bu material uchun fayl yuklanmagan."))
+        if not (material.is_free or request.user.is_staff or Payment.objects.filter(
+                user=request.user, mock_test__mock_type=material.mock_test_type, status='successful').exists()):
+            raise PermissionDenied(_("Bu materialdan foydalanish uchun avval mock testni sotib olishingiz kerak."))
+        return ranged_file_response(request, material.file)
+
 class UniversityViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = University.objects.all().order_by('region', 'name')
     serializer_class = UniversitySerializer
@@ -408,12 +611,34 @@ class UniversityViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['region']
     search_fields = ['name', 'short_name']
 
-class CourseViewSet(viewsets.ReadOnlyModelViewSet):
+class CourseEnrollmentMapMixin:
+    """
+    list/retrieve da joriy foydalanuvchining sahifadagi kurslar bo'yicha yozuvlarini
+    bitta so'rov bilan oldindan yuklab, serializer contextiga 'enrollment_map' sifatida beradi.
+    """
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve') and args:
+            courses = args[0] if kwargs.get('many') else [args[0]]
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['enrollment_map'] = build_enrollment_map(self.request.user, courses, with_last_lesson=self.action == 'retrieve')
+        return super().get_serializer(*args, **kwargs)
+
+
+class CourseViewSet(FacetCountsMixin, CourseEnrollmentMapMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly] # <- Import qilingan
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter]
     filterset_fields = ['subject', 'difficulty', 'language', 'has_certificate', 'price']
     search_fields = ['title', 'subject__name', 'teacher__full_name', 'description']
-    queryset = Course.objects.filter(status='active').select_related('subject', 'teacher').prefetch_related('lessons', 'reviews') # Oldindan olish
+    search_index_kind = 'course'
+    facet_fields = {'subject': 'subject__name', 'language': None, 'difficulty': None, 'price': None}
+    queryset = Course.objects.filter(status='active').select_related('subject', 'teacher')
+    # Ro'yxatda faqat CourseListSerializer o'qiydigan ustunlar
+    list_only_fields = (
+        'id', 'title', 'thumbnail', 'image_variants', 'price', 'duration_weeks', 'difficulty', 'language',
+        'rating', 'rating_count', 'enrolled_students_count', 'lessons_count', 'created_at',
+        'subject__id', 'subject__name', 'subject__icon', 'subject__image_variants',
+        'teacher__id', 'teacher__full_name', 'teacher__profile_picture', 'teacher__image_variants', 'teacher__about_me',
+    )
 
     def get_serializer_class(self):
         action_serializer_map = {
@@ -422,18 +647,29 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
             'my_courses': CourseEnrollmentSerializer,
             'enroll': serializers.Serializer, # Data kerak emas
             'leave_review': LeaveReviewSerializer,
+            'progress': UpdateProgressSerializer,
         }
         return action_serializer_map.get(self.action, CourseListSerializer)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.only(*self.list_only_fields)
+        elif self.action == 'retrieve':
+            queryset = queryset.with_detail_relations() # Tartiblangan darslar + oxirgi sharhlar faqat detail sahifada
+        return queryset
+
     @action(detail=False, methods=['get'], url_path='my-courses', permission_classes=[IsAuthenticated])
     def my_courses(self, request):
-        enrollments = UserCourseEnrollment.objects.filter(user=request.user).select_related('course', 'course__subject').order_by('-enrolled_at')
+        enrollments = UserCourseEnrollment.objects.filter(user=request.user).select_related(
+            'course', 'course__subject', 'course__teacher', 'last_accessed_lesson').order_by('-enrolled_at')
         page = self.paginate_queryset(enrollments)
+        enrollment_page = page if page is not None else list(enrollments)
+        # Yozuvlar allaqachon bor: nested CourseListSerializer progressni shu map dan o'qiydi
+        context = {'request': request, 'enrollment_map': {enrollment.course_id: enrollment for enrollment in enrollment_page}}
+        serializer = CourseEnrollmentSerializer(enrollment_page, many=True, context=context)
         if page is not None:
-            # CourseEnrollmentSerializer ishlatish kerak
-            serializer = CourseEnrollmentSerializer(page, many=True, context={'request': request})
             return self.get_paginated_response(serializer.data)
-        serializer = CourseEnrollmentSerializer(enrollments, many=True, context={'request': request})
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
@@ -452,9 +688,7 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
                  payment_method='internal' # course=course
              )
              user.refresh_from_db()
-        enrollment = UserCourseEnrollment.objects.create(user=user, course=course)
-        course.enrolled_students_count = F('enrolled_students_count') + 1
-        course.save(update_fields=['enrolled_students_count'])
+        enrollment = UserCourseEnrollment.objects.create(user=user, course=course) # enrolled_students_count save() da oshiriladi
         serializer = CourseEnrollmentSerializer(enrollment, context=self.get_serializer_context())
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -475,6 +709,57 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         review_serializer = CourseReviewSerializer(review, context={'request': request})
         return Response(review_serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'], url_path=r'lessons/(?P<lesson_pk>\d+)/stream', permission_classes=[IsAuthenticated])
+    def stream_lesson(self, request, pk=None, lesson_pk=None):
+        """Dars videosini Range (206), ETag/Last-Modified bilan oqim sifatida beradi (videoda oldinga o'tish uchun)."""
+        course = self.get_object()
+        lesson = get_object_or_404(Lesson, pk=lesson_pk, course=course)
+        if not lesson.video_file:
+            raise NotFound(_("Bu dars uchun video fayl yuklanmagan."))
+        if not (lesson.is_free_preview or request.user.is_staff or
+                UserCourseEnrollment.objects.filter(user=request.user, course=course).exists()):
+            raise PermissionDenied(_("Darsni ko'rish uchun avval kursga yozilishingiz kerak."))
+        return ranged_file_response(request, lesson.video_file)
+
+    @action(detail=True, methods=['get', 'post'], permission_classes=[IsAuthenticated])
+    def progress(self, request, pk=None):
+        """
+        GET - kurs va darslar bo'yicha progress.
+        POST - video pleer pingi: pozitsiya xotirada yig'ilib batch bilan yoziladi,
+        completed=true bo'lsa dars darhol tugatilgan deb belgilanadi va progress hisoblagichlardan yangilanadi.
+        """
+        course = self.get_object()
+        enrollment = UserCourseEnrollment.objects.select_related('course').filter(user=request.user, course=course).first()
+        if enrollment is None:
+            raise PermissionDenied(_("Progressni kuzatish uchun avval kursga yozilishingiz kerak."))
+
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            lesson = Lesson.objects.filter(pk=serializer.validated_data['lesson_id'], course=course).first()
+            if lesson is None:
+                raise ValidationError({'lesson_id': _("Bu dars ushbu kursga tegishli emas.")})
+            position = serializer.validated_data['position_seconds']
+            if serializer.validated_data['completed']:
+                enrollment.complete_lesson(lesson, position_seconds=position)
+                discard_pending(enrollment, lesson)
+            else:
+                record_ping(enrollment, lesson, position) # Bazaga yozilmaydi, keyingi flush da yoziladi
+            return Response({
+                'lesson_id': lesson.id,
+                'position_seconds': position,
+                'progress': enrollment.progress,
+                'completed_lessons_count': enrollment.completed_lessons_count,
+                'lessons_count': course.lessons_count,
+            })
+
+        prefetch_related_objects(
+            [enrollment], Prefetch('lesson_progress', queryset=LessonProgress.objects.order_by('lesson__order', 'lesson_id'))
+        )
+        lesson_ids = course.lessons.values_list('pk', flat=True)
+        context = {'request': request, 'pending_positions': get_pending_positions(enrollment.pk, lesson_ids)}
+        return Response(CourseProgressSerializer(enrollment, context=context).data)
+
 
 class ScheduleItemViewSet(viewsets.ModelViewSet):
     serializer_class = ScheduleItemSerializer
@@ -736,6 +1021,86 @@ class AdminCombinedStatisticsView(generics.GenericAPIView):
 
 
 
+class AdminCohortAnalyticsView(generics.GenericAPIView):
+    """
+    Kogorta tahlili: X oyda qo'shilgan studentlarning necha foizi X+k oyda test topshirgan
+    va necha foizi k-oygacha to'lov qilgan. Natija keshlanadi (?refresh=1 qayta hisoblaydi).
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = AdminCohortAnalyticsSerializer
+    MAX_MONTHS = 36
+
+    def get(self, request, *args, **kwargs):
+        if np is None:
+            return Response({"detail": _("Kogorta tahlili uchun serverda numpy o'rnatilmagan.")}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        try:
+            months = int(request.query_params.get('months', 12))
+        except ValueError:
+            return Response({"detail": "Invalid months parameter"}, status=status.HTTP_400_BAD_REQUEST)
+        months = max(1, min(months, self.MAX_MONTHS))
+        refresh = request.query_params.get('refresh', '').lower() in ('1', 'true', 'yes')
+
+        data = get_cohort_analytics(months=months, refresh=refresh)
+        serializer = self.get_serializer(data)
+        return Response(serializer.data)
+
+
+class AdminPurchaseFunnelView(generics.GenericAPIView):
+    """
+    Premium testlar sotib olish voronkasi: ko'rish -> sotib olishga urinish -> mablag' yetmasligi -> topshirish.
+    Parametrlar: date_from, date_to (YYYY-MM-DD, default oxirgi 30 kun), test (ixtiyoriy test ID).
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = serializers.Serializer
+
+    def get(self, request, *args, **kwargs):
+        today = timezone.localdate()
+        date_to = _parse_date_param(request, 'date_to') or today
+        date_from = _parse_date_param(request, 'date_from') or date_to - timedelta(days=29)
+        if date_from > date_to:
+            raise ValidationError({"date_from": _("Boshlanish sanasi tugash sanasidan keyin bo'lishi mumkin emas.")})
+        test_id = request.query_params.get('test')
+        if test_id and not test_id.isdigit():
+            raise ValidationError({"test": _("Test ID butun son bo'lishi kerak.")})
+        return Response(get_purchase_funnel(date_from, date_to, test_id=int(test_id) if test_id else None))
+
+
+class AdminPackageExportView(generics.GenericAPIView):
+    """
+    Test, kurs yoki mock testni zip paket (manifest.json + media) sifatida oqim bilan yuklab olish.
+    URL: /api/admin/packages/export/<kind>/<id>/, kind: test | course | mock_test.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = serializers.Serializer
+
+    def get(self, request, kind, pk, *args, **kwargs):
+        if kind not in PACKAGE_KINDS:
+            raise NotFound(_("Noma'lum paket turi."))
+        try:
+            builder = build_package(kind, pk)
+        except ObjectDoesNotExist:
+            raise NotFound(_("Obyekt topilmadi."))
+        response = StreamingHttpResponse(builder.stream(), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{kind}-{pk}.zip"'
+        return response
+
+
+class AdminPackageImportView(generics.GenericAPIView):
+    """Eksport qilingan paketni (multipart: file) import qilish. Hammasi bitta tranzaksiyada, media xesh bo'yicha qayta ishlatiladi."""
+    permission_classes = [IsAdminUser]
+    serializer_class = serializers.Serializer
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({"file": _("Fayl yuklanmagan.")})
+        try:
+            instance, report = import_package(upload, user=request.user)
+        except PackageError as e:
+            raise ValidationError({"file": str(e)})
+        return Response(report, status=status.HTTP_201_CREATED)
+
+
 # --- Admin CRUD ViewSets ---
 # (AdminUserViewSet, AdminTestViewSet, AdminQuestionViewSet, AdminMaterialViewSet, AdminPaymentViewSet,
 #  AdminUniversityViewSet, AdminAchievementViewSet, AdminCourseViewSet, AdminLessonViewSet
@@ -855,7 +1220,9 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 class AdminTestViewSet(viewsets.ModelViewSet):
-    queryset = Test.objects.select_related('subject', 'created_by').prefetch_related('questions')
+    queryset = Test.objects.select_related('subject', 'created_by').prefetch_related(
+        Prefetch('question_links', queryset=TestQuestion.objects.select_related('question').order_by('order', 'id'))
+    )
     permission_classes = [IsAdminUser]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['subject', 'difficulty', 'test_type', 'status']
@@ -890,22 +1257,52 @@ class AdminTestViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(results, many=True, context=serializer_context)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='export')
+    def export_results(self, request, pk=None):
+        """
+        Test natijalarini CSV (oqim bilan) yoki XLSX fayl sifatida eksport qilish.
+        Parametrlar: file_format=csv|xlsx, answers=1 (savollar bo'yicha javoblar), status=completed|...
+        """
+        # status bu yerda natija holati: ro'yxat filtri (Test.status) testni topishga aralashmasligi kerak
+        test = get_object_or_404(Test, pk=pk)
+        self.check_object_permissions(request, test)
+        file_format = request.query_params.get('file_format', 'csv')
+        include_answers = request.query_params.get('answers', '').lower() in ('1', 'true', 'yes')
+        status_filter = request.query_params.get('status')
+        if status_filter and status_filter not in dict(UserTestResult.STATUS_CHOICES):
+            raise ValidationError({"status": _("Noto'g'ri holat qiymati.")})
+
+        rows = test_result_rows(test, include_answers=include_answers, status=status_filter)
+        filename = f"test_{test.pk}_results"
+        if file_format == 'xlsx':
+            if openpyxl is None:
+                raise ValidationError({"file_format": _("XLSX eksport uchun serverda openpyxl o'rnatilmagan.")})
+            return xlsx_file_response(rows, f"{filename}.xlsx", sheet_title=_("Natijalar"))
+        if file_format != 'csv':
+            raise ValidationError({"file_format": _("Faqat 'csv' yoki 'xlsx' formatlari qo'llab-quvvatlanadi.")})
+        return csv_stream_response(rows, f"{filename}.csv")
+
     @action(detail=True, methods=['get'], url_path='statistics')
     def statistics(self, request, pk=None):
         test = self.get_object()
-        # ... (Statistika hisoblash avvalgidek) ...
-        participants_count = UserTestResult.objects.filter(test=test, status='completed').count()
-        avg_score = UserTestResult.objects.filter(test=test, status='completed').aggregate(avg=Avg('percentage'))['avg'] or 0
-        total_income = Payment.objects.filter(test=test, status='successful', payment_type='test_purchase').aggregate(total=Sum('amount'))['total'] or 0
+        # Hisoblagichlar natija/to'lov paytida yangilanadi, bu yerda faqat o'qiladi (O(1))
+        stats = TestStatistics.objects.filter(test=test).first() or TestStatistics(test=test)
         # Serializer ishlatish yaxshiroq
         return Response({
-            "participants_count": participants_count,
-            "average_score": round(avg_score, 2),
-            "total_income": abs(total_income) if total_income else 0,
+            "participants_count": stats.completed_count,
+            "average_score": round(stats.average_percentage, 2),
+            "score_stddev": round(stats.percentage_stddev, 2),
+            "best_percentage": round(stats.best_percentage, 2),
+            "best_score": stats.best_score,
+            "total_income": abs(stats.income_sum) if stats.income_sum else 0,
         })
 
 class AdminQuestionViewSet(viewsets.ModelViewSet):
-    queryset = Question.objects.select_related('test') # Testni ham olish
+    """
+    Test savollari. Savollar umumiy bankda saqlanadi (Question), test ularga TestQuestion orqali tartib bilan bog'lanadi:
+    bir xil kontentli savol qayta yaratilmaydi, bankdagisi ishlatiladi.
+    """
+    queryset = Question.objects.all()
     serializer_class = AdminQuestionSerializer
     permission_classes = [IsAdminUser]
     pagination_class = None # Odatda test savollari ko'p bo'lmaydi
@@ -913,30 +1310,93 @@ class AdminQuestionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         test_pk = self.kwargs.get('test_pk')
         if test_pk:
-            return Question.objects.filter(test_id=test_pk).order_by('order', 'id')
+            # order va test_id bog'lanishdan (filter bilan bir xil JOIN)
+            return (Question.objects.filter(test_links__test_id=test_pk)
+                    .annotate(order=F('test_links__order'), test_id=F('test_links__test_id'))
+                    .order_by('test_links__order', 'test_links__id'))
         # Agar nested bo'lmasa (masalan, /api/admin/questions/), bo'sh queryset qaytarish mumkin
         return Question.objects.none()
 
+    def _link_question(self, test, question, order):
+        if TestQuestion.objects.filter(test=test, question=question).exists():
+            raise ValidationError({"question_text": _("Bu savol testda allaqachon bor.")})
+        TestQuestion.objects.create(test=test, question=question, order=order)
+        question.order, question.test_id = order, test.pk
+
     def perform_create(self, serializer):
         test_pk = self.kwargs.get('test_pk')
         if not test_pk: raise ValidationError(_("URL da test ID si ko'rsatilmagan."))
         test = get_object_or_404(Test, pk=test_pk)
-        # Orderni avtomatik belgilash (oxirgisidan keyingi)
-        last_order = Question.objects.filter(test=test).aggregate(max_order=Max('order'))['max_order'] or 0
-        instance = serializer.save(test=test, order=last_order + 1)
-        test.question_count = F('question_count') + 1 # Atomik tarzda oshirish
-        test.save(update_fields=['question_count'])
+        with transaction.atomic():
+            question, _created = Question.get_or_create_from_content(serializer.validated_data, subject=test.subject)
+            # Orderni avtomatik belgilash (oxirgisidan keyingi)
+            last_order = test.question_links.aggregate(max_order=Max('order'))['max_order'] or 0
+            self._link_question(test, question, last_order + 1)
+            Test.bump_content_version([test.pk], question_count=F('question_count') + 1) # Atomik tarzda oshirish
+        serializer.instance = question
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request, test_pk=None):
+        """
+        Savollarni CSV/XLSX/JSON fayldan ommaviy qo'shish (multipart: file, ixtiyoriy file_format, dry_run=1).
+        Avval barcha qatorlar tekshiriladi; xato bo'lsa hech narsa saqlanmaydi va qatorlar bo'yicha xatolar qaytadi.
+        """
+        test = get_object_or_404(Test, pk=test_pk)
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({"file": _("Fayl yuklanmagan.")})
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+        try:
+            file_format = detect_import_format(upload.name, request.data.get('file_format'))
+            result = import_questions(test, upload, file_format, dry_run=dry_run)
+        except QuestionImportError as e:
+            raise ValidationError({"file": str(e)})
+        if result['errors']:
+            return Response({"detail": _("Faylda xatolar bor, savollar saqlanmadi."), "errors": result['errors']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        test.refresh_from_db(fields=['question_count'])
+        return Response({"created": result['created'], "reused": result['reused'], "skipped": result['skipped'],
+                         "valid": result['valid'], "question_count": test.question_count},
+                        status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='reorder')
+    def reorder(self, request, test_pk=None):
+        """Savollar tartibini bitta so'rovda o'zgartirish: {"ids": [...]} - testdagi barcha savol ID lari yangi tartibda."""
+        test = get_object_or_404(Test, pk=test_pk)
+        serializer = ReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            links = TestQuestion.objects.select_for_update().filter(test=test).only('id', 'question_id', 'order').order_by()
+            changed = _apply_order({link.question_id: link for link in links}, serializer.validated_data['ids'])
+            TestQuestion.objects.bulk_update(changed, ['order'], batch_size=500)
+            if changed:
+                Test.bump_content_version([test.pk])
+        return Response({"updated": len(changed)}, status=status.HTTP_200_OK)
 
     def perform_update(self, serializer):
-         # Testni o'zgartirmaslik kerak
-         serializer.save()
+        question = serializer.instance
+        content = {**question.get_content(), **serializer.validated_data}
+        new_hash = Question.compute_content_hash(content)
+        shared = question.test_links.exclude(test_id=question.test_id).exists()
+        duplicate = Question.objects.filter(content_hash=new_hash).exclude(pk=question.pk).exists()
+        if new_hash == question.content_hash or not (shared or duplicate):
+            serializer.save() # Faqat shu testdagi savol (yoki izoh/qiyinlik o'zgardi) - joyida yangilanadi
+            return
+        # Copy-on-write: boshqa testlar va eski natijalar avvalgi savolda qoladi, shu test yangi/mavjud bank savoliga o'tadi
+        with transaction.atomic():
+            new_question, _created = Question.get_or_create_from_content(content, subject=question.subject)
+            if TestQuestion.objects.filter(test_id=question.test_id, question=new_question).exists():
+                raise ValidationError({"question_text": _("Bu savol testda allaqachon bor.")})
+            TestQuestion.objects.filter(test_id=question.test_id, question=question).update(question=new_question)
+            Test.bump_content_version([question.test_id])
+        new_question.order, new_question.test_id = question.order, question.test_id
+        serializer.instance = new_question
 
     def perform_destroy(self, instance):
-        test = instance.test
-        instance.delete()
-        # Atomik tarzda kamaytirish
-        test.question_count = F('question_count') - 1
-        test.save(update_fields=['question_count'])
+        # Faqat testdan olib tashlanadi, savol bankda qoladi (boshqa testlar va natijalar unga bog'liq bo'lishi mumkin)
+        with transaction.atomic():
+            TestQuestion.objects.filter(test_id=instance.test_id, question=instance).delete()
+            Test.bump_content_version([instance.test_id], question_count=F('question_count') - 1) # Atomik tarzda kamaytirish
         # Qolgan savollarning orderini yangilash kerak bo'lishi mumkin
 
 class AdminMaterialViewSet(viewsets.ModelViewSet):
@@ -964,6 +1424,31 @@ class AdminPaymentViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['user__email', 'user__full_name', 'transaction_id']
     ordering_fields = ['created_at', 'amount']
 
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_ledger(self, request):
+        """
+        To'lovlar reestrini CSV ko'rinishida oqim bilan eksport qilish (Click/Payme bilan solishtirish uchun).
+        Filterlar: date_from, date_to (YYYY-MM-DD, ikkalasi ham kiradi), status, payment_type, payment_method, user, search.
+        Fayl oxirida to'lov turlari bo'yicha jami summalar qo'shiladi.
+        """
+        payments = self.filter_queryset(self.get_queryset())
+        date_range = {}
+        for param in ('date_from', 'date_to'):
+            parsed = _parse_date_param(request, param)
+            if parsed is not None:
+                date_range[param] = parsed
+
+        current_tz = timezone.get_current_timezone()
+        if 'date_from' in date_range:
+            start = datetime.combine(date_range['date_from'], time.min)
+            payments = payments.filter(created_at__gte=timezone.make_aware(start, current_tz))
+        if 'date_to' in date_range:
+            end = datetime.combine(date_range['date_to'] + timedelta(days=1), time.min) # Eksklyuziv tugash
+            payments = payments.filter(created_at__lt=timezone.make_aware(end, current_tz))
+
+        period = '_'.join(str(date_range[key]) for key in ('date_from', 'date_to') if key in date_range) or 'all'
+        return csv_stream_response(payment_ledger_rows(payments), f"payments_{period}.csv")
+
 class AdminUniversityViewSet(viewsets.ModelViewSet):
     queryset = University.objects.all().order_by('region', 'name')
     serializer_class = UniversitySerializer
@@ -980,8 +1465,8 @@ class AdminAchievementViewSet(viewsets.ModelViewSet):
     filterset_fields = ['category', 'is_active']
     search_fields = ['name', 'description']
 
-class AdminCourseViewSet(viewsets.ModelViewSet):
-    queryset = Course.objects.select_related('subject', 'teacher').prefetch_related('lessons', 'reviews')
+class AdminCourseViewSet(CourseEnrollmentMapMixin, viewsets.ModelViewSet):
+    queryset = Course.objects.select_related('subject', 'teacher').with_detail_relations()
     permission_classes = [IsAdminUser]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['subject', 'teacher', 'status', 'difficulty', 'language']
@@ -1051,6 +1536,18 @@ class AdminLessonViewSet(viewsets.ModelViewSet):
         instance = serializer.save(course=course, order=last_order + 1)
         course.update_lessons_count()
 
+    @action(detail=False, methods=['post'], url_path='reorder')
+    def reorder(self, request, course_pk=None):
+        """Darslar tartibini bitta so'rovda o'zgartirish: {"ids": [...]} - kursdagi barcha dars ID lari yangi tartibda."""
+        course = get_object_or_404(Course, pk=course_pk)
+        serializer = ReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            lessons = Lesson.objects.select_for_update().filter(course=course).only('id', 'order').order_by()
+            changed = _apply_order({lesson.pk: lesson for lesson in lessons}, serializer.validated_data['ids'])
+            Lesson.objects.bulk_update(changed, ['order'], batch_size=500)
+        return Response({"updated": len(changed)}, status=status.HTTP_200_OK)
+
     def perform_update(self, serializer):
         # Kursni o'zgartirish mumkin emas
         instance = serializer.save()
@@ -1062,5 +1559,69 @@ class AdminLessonViewSet(viewsets.ModelViewSet):
         course.update_lessons_count()
 
 
+class AdminChunkedUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                                mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Katta fayllarni (dars videolari, material ZIP lari) bo'laklab, uzilsa davom ettirib yuklash:
+    POST /admin/uploads/ -> PUT /admin/uploads/{id}/chunks/{n}/ (xom baytlar) -> POST /admin/uploads/{id}/complete/.
+    GET /admin/uploads/{id}/ qaysi bo'lakdan davom etishni ko'rsatadi, DELETE sessiyani bekor qiladi.
+    """
+    queryset = ChunkedUpload.objects.all()
+    permission_classes = [IsAdminUser]
+
+    def get_serializer_class(self):
+        action_serializer_map = {
+            'create': ChunkedUploadStartSerializer,
+            'complete': ChunkedUploadCompleteSerializer,
+        }
+        return action_serializer_map.get(self.action, ChunkedUploadSerializer)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        field = ChunkedUpload(target=data['target']).get_target_field()[1]
+        if not supports_chunked_upload(field.storage):
+            return Response({"detail": _("Joriy fayl ombori bo'lakli yuklashni qo'llab-quvvatlamaydi.")},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+        upload = start_upload(request.user, data['target'], data['instance'], data['filename'],
+                              data['total_size'], data.get('chunk_size'))
+        return Response(ChunkedUploadSerializer(upload, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<chunk_number>\d+)')
+    def upload_chunk(self, request, pk=None, chunk_number=None):
+        """Bo'lak so'rov tanasida xom baytlar sifatida (application/octet-stream) yuboriladi."""
+        try:
+            content_length = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            content_length = 0
+        with transaction.atomic():
+            upload = get_object_or_404(ChunkedUpload.objects.select_for_update(), pk=self.get_object().pk)
+            if upload.status != 'uploading':
+                return Response({"detail": _("Yuklash allaqachon yakunlangan.")}, status=status.HTTP_409_CONFLICT)
+            try:
+                write_chunk(upload, int(chunk_number), request.stream, content_length)
+            except ChunkError as e:
+                return Response({"detail": str(e), "next_chunk": upload.next_chunk}, status=status.HTTP_409_CONFLICT)
+        return Response(ChunkedUploadSerializer(upload, context=self.get_serializer_context()).data)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            upload = get_object_or_404(ChunkedUpload.objects.select_for_update(), pk=self.get_object().pk)
+            if upload.status == 'uploading':
+                try:
+                    complete_upload(upload, serializer.validated_data.get('checksum'))
+                except ChunkError as e:
+                    raise ValidationError({"detail": str(e)})
+        return Response(ChunkedUploadSerializer(upload, context=self.get_serializer_context()).data)
+
+    def perform_destroy(self, instance):
+        abort_upload(instance)
+
+
 
 